@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import AuthorizationCode, RPIUser, RPITestResult, RPIQuestion, RPIAnswer
+from .models import (
+    AuthorizationCode, RPIUser, RPITestResult, RPIQuestion, RPIAnswer,
+    RPIScoringProfile, RPIScoreLevel, RPICategoryWeight
+)
+from .aggregates import build_dashboard
+from .scoring import get_active_profile
+from .utils import create_auth_codes, get_questions
 
 # 注册授权码模型
 @admin.register(AuthorizationCode)
@@ -23,25 +29,16 @@ class AuthorizationCodeAdmin(admin.ModelAdmin):
     
     def generate_new_codes(self, request, queryset):
         """批量生成新授权码"""
-        import random
         from django.http import HttpResponseRedirect
         from django.urls import reverse
         
         # 默认生成10个授权码
         number = 10
         length = 8
-        chars = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
         
-        generated_count = 0
-        for _ in range(number):
-            # 生成随机授权码
-            code = ''.join(random.choices(chars, k=length))
-            # 检查是否已存在
-            if not AuthorizationCode.objects.filter(code=code).exists():
-                AuthorizationCode.objects.create(code=code, is_used=False)
-                generated_count += 1
+        codes = create_auth_codes(number, length)
         
-        self.message_user(request, f'成功生成 {generated_count} 个新授权码')
+        self.message_user(request, f'成功生成 {len(codes)} 个新授权码')
         return HttpResponseRedirect(reverse('admin:rpi_calculator_authorizationcode_changelist'))
     generate_new_codes.short_description = '生成新授权码'  
     
@@ -64,12 +61,40 @@ class RPIUserAdmin(admin.ModelAdmin):
 # 注册RPI测试结果模型
 @admin.register(RPITestResult)
 class RPITestResultAdmin(admin.ModelAdmin):
-    list_display = ('user', 'total_score', 'score_level', 'created_at')
-    list_filter = ('score_level', 'created_at')
+    list_display = ('user', 'total_score', 'score_level', 'scoring_version', 'created_at')
+    list_filter = ('score_level', 'scoring_version', 'created_at')
     search_fields = ('user__nickname',)
     ordering = ('-created_at',)
     # 显示关联的用户信息
     raw_id_fields = ('user',)
+    # 列表页顶部显示“统计面板”按钮
+    change_list_template = 'admin/rpi_calculator/rpitestresult/change_list.html'
+    
+    def get_urls(self):
+        from django.urls import path
+        urls = super().get_urls()
+        custom_urls = [
+            path('dashboard/', self.admin_site.admin_view(self.dashboard_view),
+                 name='rpi_calculator_rpitestresult_dashboard'),
+        ]
+        return custom_urls + urls
+    
+    def dashboard_view(self, request):
+        """统计面板（只读取增量维护的汇总表，需要时执行 rebuild_rpi_aggregates 重建）"""
+        from django.template.response import TemplateResponse
+        
+        try:
+            levels = get_active_profile().levels
+        except RPIScoringProfile.DoesNotExist:
+            levels = []
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'RPI测试统计面板',
+            'dashboard': build_dashboard(levels, get_questions()),
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/rpi_calculator/dashboard.html', context)
 
 # 注册RPI问题模型
 @admin.register(RPIQuestion)
@@ -90,3 +115,20 @@ class RPIAnswerAdmin(admin.ModelAdmin):
     ordering = ('user', 'question__question_order')
     # 显示关联的用户和问题
     raw_id_fields = ('user', 'question')
+
+# 注册RPI评分方案模型
+class RPIScoreLevelInline(admin.StackedInline):
+    model = RPIScoreLevel
+    extra = 0
+
+class RPICategoryWeightInline(admin.TabularInline):
+    model = RPICategoryWeight
+    extra = 0
+
+@admin.register(RPIScoringProfile)
+class RPIScoringProfileAdmin(admin.ModelAdmin):
+    list_display = ('version', 'name', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    ordering = ('-version',)
+    # 等级阈值、结果文案和类别权重在方案中编辑（已有结果按其版本显示文案，修改阈值建议新建版本）
+    inlines = [RPIScoreLevelInline, RPICategoryWeightInline]
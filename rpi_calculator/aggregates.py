@@ -0,0 +1,280 @@
+"""
+RPI测试统计汇总维护
+
+提交测试结果时在同一事务内用 F() 增量更新 RPIResultAggregate 和 RPIQuestionAggregate，
+删除测试结果、答案或用户时由信号反向扣减，统计面板只读取汇总表（行数与测试次数无关）；
+rebuild_rpi_aggregates 命令使用 build_aggregates 在数据库中分组全量重建。
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import RPIAnswer, RPIQuestionAggregate, RPIResultAggregate, RPITestResult, RPIUser
+
+
+BREAKDOWN_DIMENSIONS = [
+    RPIResultAggregate.DIMENSION_GENDER,
+    RPIResultAggregate.DIMENSION_AGE_RANGE,
+    RPIResultAggregate.DIMENSION_RELATIONSHIP_STATUS,
+]
+
+
+def _dimension_keys(user):
+    keys = [(RPIResultAggregate.DIMENSION_ALL, '')]
+    for dimension in BREAKDOWN_DIMENSIONS:
+        keys.append((dimension, getattr(user, dimension) or ''))
+    return keys
+
+
+def update_aggregates(user, total_score, score_level, scores):
+    """
+    增量更新统计（需在写入测试结果的事务内调用）
+
+    scores: {问题ID: 得分}
+    """
+    now = timezone.now()
+
+    # 确保汇总行存在，再用 F() 累加，并发提交不会互相覆盖
+    keys = _dimension_keys(user)
+    RPIResultAggregate.objects.bulk_create(
+        [RPIResultAggregate(dimension=dimension, dimension_value=value, score_level=score_level) for dimension, value in keys],
+        ignore_conflicts=True
+    )
+    condition = Q()
+    for dimension, value in keys:
+        condition |= Q(dimension=dimension, dimension_value=value)
+    RPIResultAggregate.objects.filter(condition, score_level=score_level).update(
+        test_count=F('test_count') + 1,
+        score_sum=F('score_sum') + total_score,
+        score_sq_sum=F('score_sq_sum') + total_score * total_score,
+        updated_at=now,
+    )
+
+    RPIQuestionAggregate.objects.bulk_create(
+        [RPIQuestionAggregate(question_id=question_id) for question_id in scores],
+        ignore_conflicts=True
+    )
+    # 得分相同的问题合并为一条UPDATE（每题得分只有几种取值）
+    questions_by_score = defaultdict(list)
+    for question_id, score in scores.items():
+        questions_by_score[score].append(question_id)
+    for score, question_ids in questions_by_score.items():
+        RPIQuestionAggregate.objects.filter(question_id__in=question_ids).update(
+            answer_count=F('answer_count') + 1,
+            score_sum=F('score_sum') + score,
+            score_sq_sum=F('score_sq_sum') + score * score,
+            updated_at=now,
+        )
+
+
+def _group_results(results):
+    """在数据库中按维度和得分等级分组统计测试结果，返回 {(维度, 维度取值, 得分等级): 结果统计}"""
+    result_aggregates = {}
+    for dimension in [RPIResultAggregate.DIMENSION_ALL] + BREAKDOWN_DIMENSIONS:
+        fields = ['score_level']
+        if dimension != RPIResultAggregate.DIMENSION_ALL:
+            fields.append(f'user__{dimension}')
+        rows = results.order_by().values(*fields).annotate(
+            test_count=Count('id'),
+            score_sum=Sum('total_score'),
+            score_sq_sum=Sum(F('total_score') * F('total_score')),
+        )
+        for row in rows:
+            # 未填写（NULL）和空字符串合并为同一行
+            key = (dimension, row.get(f'user__{dimension}') or '', row['score_level'])
+            aggregate = result_aggregates.get(key)
+            if aggregate is None:
+                aggregate = result_aggregates[key] = RPIResultAggregate(
+                    dimension=key[0], dimension_value=key[1], score_level=key[2]
+                )
+            aggregate.test_count += row['test_count']
+            aggregate.score_sum += row['score_sum'] or 0
+            aggregate.score_sq_sum += row['score_sq_sum'] or 0
+    return result_aggregates
+
+
+def _group_answers(answers):
+    """在数据库中按问题分组统计答案，返回问题统计列表"""
+    return [
+        RPIQuestionAggregate(
+            question_id=row['question_id'],
+            answer_count=row['answer_count'],
+            score_sum=row['score_sum'] or 0,
+            score_sq_sum=row['score_sq_sum'] or 0,
+        )
+        for row in answers.order_by().values('question_id').annotate(
+            answer_count=Count('id'),
+            score_sum=Sum('score'),
+            score_sq_sum=Sum(F('score') * F('score')),
+        )
+    ]
+
+
+def remove_results_from_aggregates(results):
+    """
+    从统计中扣减即将删除的测试结果（需在删除的事务内调用）
+
+    results: RPITestResult 查询集
+    """
+    now = timezone.now()
+    for aggregate in _group_results(results).values():
+        RPIResultAggregate.objects.filter(
+            dimension=aggregate.dimension, dimension_value=aggregate.dimension_value,
+            score_level=aggregate.score_level,
+        ).update(
+            test_count=F('test_count') - aggregate.test_count,
+            score_sum=F('score_sum') - aggregate.score_sum,
+            score_sq_sum=F('score_sq_sum') - aggregate.score_sq_sum,
+            updated_at=now,
+        )
+
+
+def remove_answers_from_aggregates(answers):
+    """
+    从统计中扣减即将删除的答案（需在删除的事务内调用）
+
+    answers: RPIAnswer 查询集
+    """
+    now = timezone.now()
+    for aggregate in _group_answers(answers):
+        RPIQuestionAggregate.objects.filter(question_id=aggregate.question_id).update(
+            answer_count=F('answer_count') - aggregate.answer_count,
+            score_sum=F('score_sum') - aggregate.score_sum,
+            score_sq_sum=F('score_sq_sum') - aggregate.score_sq_sum,
+            updated_at=now,
+        )
+
+
+def build_aggregates():
+    """在数据库中分组全量计算统计（不写入数据库），返回 (结果统计列表, 问题统计列表)"""
+    return list(_group_results(RPITestResult.objects.all()).values()), _group_answers(RPIAnswer.objects.all())
+
+
+def diff_aggregates(result_aggregates, question_aggregates):
+    """对比已保存的统计和重新计算的结果，返回 (不一致的结果统计数量, 不一致的问题统计数量)"""
+    def result_key(aggregate):
+        return (aggregate.dimension, aggregate.dimension_value, aggregate.score_level)
+
+    def values(aggregate, fields):
+        return tuple(getattr(aggregate, field) for field in fields)
+
+    def count_mismatched(stored, expected, fields):
+        mismatched = 0
+        for key in set(stored) | set(expected):
+            current, target = stored.get(key), expected.get(key)
+            if current is None or target is None:
+                if values(current or target, fields)[0]:
+                    mismatched += 1
+            elif values(current, fields) != values(target, fields):
+                mismatched += 1
+        return mismatched
+
+    result_fields = ['test_count', 'score_sum', 'score_sq_sum']
+    question_fields = ['answer_count', 'score_sum', 'score_sq_sum']
+    return (
+        count_mismatched(
+            {result_key(aggregate): aggregate for aggregate in RPIResultAggregate.objects.all()},
+            {result_key(aggregate): aggregate for aggregate in result_aggregates},
+            result_fields
+        ),
+        count_mismatched(
+            {aggregate.question_id: aggregate for aggregate in RPIQuestionAggregate.objects.all()},
+            {aggregate.question_id: aggregate for aggregate in question_aggregates},
+            question_fields
+        ),
+    )
+
+
+def rebuild_aggregates():
+    """全量重建统计，返回 (结果统计行数, 问题统计行数)"""
+    with transaction.atomic():
+        # 锁住现有汇总行，防止重建期间的增量更新被覆盖
+        list(RPIResultAggregate.objects.select_for_update())
+        list(RPIQuestionAggregate.objects.select_for_update())
+        result_aggregates, question_aggregates = build_aggregates()
+        RPIResultAggregate.objects.all().delete()
+        RPIQuestionAggregate.objects.all().delete()
+        RPIResultAggregate.objects.bulk_create(result_aggregates, batch_size=1000)
+        RPIQuestionAggregate.objects.bulk_create(question_aggregates, batch_size=1000)
+    return len(result_aggregates), len(question_aggregates)
+
+
+def _mean_variance(count, total, square_total):
+    """由次数、和、平方和计算平均值和（总体）方差"""
+    if not count:
+        return None, None
+    mean = total / count
+    return mean, max(square_total / count - mean * mean, 0.0)
+
+
+def build_dashboard(levels, questions):
+    """
+    统计面板数据（只读取汇总表）
+
+    levels: 评分方案的等级列表（决定等级顺序和名称）；questions: get_questions() 返回的问题列表
+    """
+    level_keys = [level.key for level in levels]
+    level_names = {level.key: level.name for level in levels}
+
+    rows = defaultdict(dict)
+    for aggregate in RPIResultAggregate.objects.all():
+        rows[aggregate.dimension].setdefault(aggregate.dimension_value, {})[aggregate.score_level] = aggregate
+    # 旧版本评分方案中已不存在的等级放在最后
+    for aggregates in rows[RPIResultAggregate.DIMENSION_ALL].values():
+        level_keys.extend(key for key in aggregates if key not in level_keys)
+
+    def summarize(aggregates):
+        count = sum(aggregate.test_count for aggregate in aggregates.values())
+        mean, variance = _mean_variance(
+            count,
+            sum(aggregate.score_sum for aggregate in aggregates.values()),
+            sum(aggregate.score_sq_sum for aggregate in aggregates.values()),
+        )
+        return {
+            'count': count,
+            'mean': mean,
+            'std': variance ** 0.5 if variance is not None else None,
+            'levels': [
+                {
+                    'key': key,
+                    'name': level_names.get(key, key),
+                    'count': aggregates[key].test_count if key in aggregates else 0,
+                    'percentage': (aggregates[key].test_count / count * 100) if key in aggregates and count else 0,
+                }
+                for key in level_keys
+            ],
+        }
+
+    overall = summarize(rows[RPIResultAggregate.DIMENSION_ALL].get('', {}))
+
+    breakdowns = []
+    for dimension in BREAKDOWN_DIMENSIONS:
+        labels = dict(RPIUser._meta.get_field(dimension).choices)
+        values = rows[dimension]
+        breakdowns.append({
+            'label': dict(RPIResultAggregate.DIMENSION_CHOICES)[dimension],
+            'rows': [
+                {'label': labels.get(value, value) if value else '未填写', **summarize(values[value])}
+                for value in list(labels) + [''] + sorted(set(values) - set(labels) - {''})
+                if value in values
+            ],
+        })
+
+    question_aggregates = {aggregate.question_id: aggregate for aggregate in RPIQuestionAggregate.objects.all()}
+    question_stats = []
+    for question in questions:
+        aggregate = question_aggregates.get(question['id'])
+        count = aggregate.answer_count if aggregate else 0
+        mean, variance = _mean_variance(
+            count, aggregate.score_sum if aggregate else 0, aggregate.score_sq_sum if aggregate else 0
+        )
+        question_stats.append({**question, 'count': count, 'mean': mean, 'variance': variance})
+
+    return {
+        'overall': overall,
+        'level_names': [level_names.get(key, key) for key in level_keys],
+        'breakdowns': breakdowns,
+        'questions': question_stats,
+    }
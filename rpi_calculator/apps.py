@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RpiCalculatorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rpi_calculator'
+
+    def ready(self):
+        # 注册模型信号（测试问题缓存失效）
+        from . import signals  # noqa: F401
@@ -4,9 +4,11 @@ Django管理命令：生成授权码
 支持按批次生成一定数量的授权码
 """
 
-import random
-from django.core.management.base import BaseCommand
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
 from rpi_calculator.models import AuthorizationCode
+from rpi_calculator.utils import create_auth_codes
 
 class Command(BaseCommand):
     """生成授权码的管理命令"""
@@ -32,46 +34,77 @@ class Command(BaseCommand):
             default='',
             help='授权码前缀'
         )
+        parser.add_argument(
+            '-o', '--output',
+            type=str,
+            help='将生成的授权码写入CSV文件，不在终端逐个输出'
+        )
+        parser.add_argument(
+            '-b', '--batch-size',
+            type=int,
+            default=5000,
+            help='每批生成并写入数据库的数量，默认5000'
+        )
     
     def handle(self, *args, **options):
         """命令处理逻辑"""
         number = options['number']
         length = options['length']
         prefix = options['prefix']
+        output = options['output']
+        batch_size = options['batch_size']
         
-        self.stdout.write(f'开始生成 {number} 个授权码，长度 {length} 位，前缀 "{prefix}"')
+        max_length = AuthorizationCode._meta.get_field('code').max_length
+        if number <= 0:
+            raise CommandError('生成数量必须大于0')
+        if length > max_length:
+            raise CommandError(f'授权码长度不能超过 {max_length} 位')
+        if batch_size <= 0:
+            raise CommandError('批次大小必须大于0')
         
-        # 生成字符集
-        chars = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        self.stdout.write(f'开始生成 {number} 个授权码，长度 {length} 位，前缀 "{prefix}"')
         
-        generated_codes = []
-        duplicate_count = 0
-        max_attempts = number * 5  # 最大尝试次数，防止死循环
-        attempts = 0
+        output_file = open(output, 'w', newline='', encoding='utf-8-sig') if output else None
+        writer = csv.writer(output_file) if output_file else None
+        if writer:
+            writer.writerow(['授权码'])
         
-        while len(generated_codes) < number and attempts < max_attempts:
-            attempts += 1
-            # 生成随机部分
-            random_part = ''.join(random.choices(chars, k=length - len(prefix)))
-            # 组合成完整授权码
-            code = f'{prefix}{random_part}'
-            
-            # 检查是否已存在
-            if not AuthorizationCode.objects.filter(code=code).exists():
-                # 创建授权码
-                auth_code = AuthorizationCode.objects.create(code=code, is_used=False)
-                generated_codes.append(code)
-                self.stdout.write(self.style.SUCCESS(f'生成授权码: {code}'))
-            else:
-                duplicate_count += 1
-                if duplicate_count % 100 == 0:
-                    self.stdout.write(self.style.WARNING(f'已尝试 {duplicate_count} 次重复，正在继续...'))
+        generated_count = 0
+        started = time.monotonic()
+        try:
+            while generated_count < number:
+                try:
+                    # 共享短代码分配器按序列分配，每批只需一次 IN 查询剔除已有授权码；
+                    # 只返回实际写入数据库的授权码
+                    codes = create_auth_codes(min(batch_size, number - generated_count), length, prefix)
+                except ValueError as e:
+                    raise CommandError(str(e))
+                
+                if writer:
+                    writer.writerows([code] for code in codes)
+                else:
+                    self.stdout.write('\n'.join(
+                        f'{i}. {code}' for i, code in enumerate(codes, generated_count + 1)
+                    ))
+                generated_count += len(codes)
+                
+                if writer:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'已生成 {generated_count}/{number} 个，'
+                        f'耗时 {elapsed:.1f} 秒，{self._rate(generated_count, elapsed)} 个/秒'
+                    )
+        finally:
+            if output_file:
+                output_file.close()
         
-        if len(generated_codes) < number:
-            self.stdout.write(self.style.ERROR(f'生成失败：只生成了 {len(generated_codes)} 个授权码，达到最大尝试次数'))
-        else:
-            self.stdout.write(self.style.SUCCESS(f'\n生成完成！共生成 {len(generated_codes)} 个授权码'))
-            self.stdout.write(f'已避免 {duplicate_count} 次重复')
-            self.stdout.write('\n生成的授权码：')
-            for i, code in enumerate(generated_codes, 1):
-                self.stdout.write(f'{i}. {code}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\n生成完成！共生成 {generated_count} 个授权码，'
+            f'耗时 {elapsed:.2f} 秒（{self._rate(generated_count, elapsed)} 个/秒）'
+        ))
+        if output:
+            self.stdout.write(f'授权码已写入 {output}')
+    
+    def _rate(self, count, elapsed):
+        return int(count / elapsed) if elapsed > 0 else count
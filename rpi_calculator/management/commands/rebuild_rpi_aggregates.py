@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""
+Django管理命令：重建RPI测试统计汇总
+从测试结果和答案全量重建统计面板使用的汇总数据，也可只检查汇总数据是否一致
+"""
+
+from django.core.management.base import BaseCommand
+from rpi_calculator.aggregates import build_aggregates, diff_aggregates, rebuild_aggregates
+
+class Command(BaseCommand):
+    """重建RPI测试统计汇总的管理命令"""
+    help = '从测试结果和答案重建RPI测试统计汇总'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='只检查汇总数据与测试结果是否一致，不写入'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        if options['check']:
+            result_mismatched, question_mismatched = diff_aggregates(*build_aggregates())
+            if result_mismatched or question_mismatched:
+                self.stdout.write(self.style.ERROR(
+                    f'统计不一致：{result_mismatched} 个结果统计、{question_mismatched} 个问题统计，请执行重建'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS('统计一致'))
+            return
+
+        result_count, question_count = rebuild_aggregates()
+        self.stdout.write(self.style.SUCCESS(
+            f'已重建 {result_count} 个结果统计、{question_count} 个问题统计'
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 10:00
+
+from django.db import migrations
+
+
+def uppercase_authorization_codes(apps, schema_editor):
+    """将已有授权码统一转换为大写，兑换时按大写精确匹配"""
+    AuthorizationCode = apps.get_model('rpi_calculator', 'AuthorizationCode')
+    
+    codes = list(AuthorizationCode.objects.values_list('pk', 'code'))
+    existing = {code for _, code in codes}
+    for pk, code in codes:
+        upper_code = code.strip().upper()
+        # 只差大小写的重复授权码保持原样，避免违反唯一约束
+        if upper_code == code or upper_code in existing:
+            continue
+        existing.add(upper_code)
+        AuthorizationCode.objects.filter(pk=pk).update(code=upper_code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_authorization_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2 on 2026-10-17 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0002_uppercase_authorization_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RPIScoringProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(unique=True, verbose_name='版本')),
+                ('name', models.CharField(blank=True, max_length=100, verbose_name='方案名称')),
+                ('is_active', models.BooleanField(default=False, help_text='同一时间只有一个启用的评分方案', verbose_name='是否启用')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': 'RPI评分方案',
+                'verbose_name_plural': 'RPI评分方案',
+                'db_table': 'rpi_scoring_profile',
+                'ordering': ['-version'],
+            },
+        ),
+        migrations.AddField(
+            model_name='rpitestresult',
+            name='category_scores',
+            field=models.JSONField(blank=True, default=dict, verbose_name='各类别得分'),
+        ),
+        migrations.AddField(
+            model_name='rpitestresult',
+            name='scoring_version',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='评分方案版本'),
+        ),
+        migrations.CreateModel(
+            name='RPIScoreLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=20, verbose_name='等级标识')),
+                ('name', models.CharField(max_length=50, verbose_name='等级名称')),
+                ('min_score', models.IntegerField(verbose_name='最低分')),
+                ('summary', models.TextField(verbose_name='结果总结')),
+                ('detailed_analysis', models.TextField(verbose_name='详细分析')),
+                ('suggestions', models.TextField(verbose_name='建议')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='levels', to='rpi_calculator.rpiscoringprofile', verbose_name='评分方案')),
+            ],
+            options={
+                'verbose_name': 'RPI得分等级',
+                'verbose_name_plural': 'RPI得分等级',
+                'db_table': 'rpi_score_level',
+                'ordering': ['profile', 'min_score'],
+                'unique_together': {('profile', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RPICategoryWeight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50, verbose_name='问题类别')),
+                ('weight', models.FloatField(default=1.0, verbose_name='权重')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_weights', to='rpi_calculator.rpiscoringprofile', verbose_name='评分方案')),
+            ],
+            options={
+                'verbose_name': 'RPI类别权重',
+                'verbose_name_plural': 'RPI类别权重',
+                'db_table': 'rpi_category_weight',
+                'unique_together': {('profile', 'category')},
+            },
+        ),
+    ]
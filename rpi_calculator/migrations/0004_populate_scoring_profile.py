@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-17 18:20
+
+from django.db import migrations
+from django.db.models import Sum
+
+
+DEFAULT_LEVELS = [
+    {
+        'key': 'low',
+        'name': '低占有欲',
+        'min_score': 0,
+        'summary': '您的关系占有欲指数较低，表现为对伴侣的信任度较高，给予对方充分的个人空间。',
+        'detailed_analysis': '您在关系中表现出较高的安全感和信任度，不会轻易怀疑伴侣。您尊重对方的个人边界，鼓励对方发展自己的兴趣爱好和社交圈。这种态度有助于维持健康、平等的伴侣关系。',
+        'suggestions': '继续保持这种信任和尊重的态度。但也要注意不要过度忽视伴侣的情感需求，适时表达关心和在意。',
+    },
+    {
+        'key': 'medium',
+        'name': '中等占有欲',
+        'min_score': 30,
+        'summary': '您的关系占有欲指数适中，既能表达对伴侣的关心，又能保持适当的距离。',
+        'detailed_analysis': '您在关系中保持着良好的平衡，既能表达对伴侣的关心和在意，又能理解对方需要个人空间。您会适度参与伴侣的生活，但不会过度干涉。这种态度有助于建立稳定、和谐的伴侣关系。',
+        'suggestions': '继续维持这种平衡的态度。在表达关心的同时，注意倾听伴侣的想法和感受，共同维护健康的伴侣关系。',
+    },
+    {
+        'key': 'high',
+        'name': '高占有欲',
+        'min_score': 60,
+        'summary': '您的关系占有欲指数较高，需要注意不要过度干涉伴侣的生活，给予对方足够的自由。',
+        'detailed_analysis': '您在关系中可能表现出较强的控制欲和占有欲，容易对伴侣的行为产生怀疑。您可能过度关注伴侣的行踪和社交圈，甚至限制对方的自由。这种态度可能会给伴侣带来压力，影响关系的健康发展。',
+        'suggestions': '建议您反思自己的行为模式，尝试给予伴侣更多的信任和自由。学会尊重对方的个人边界，培养自己的兴趣爱好和社交圈，减少对伴侣的过度依赖。如果情况严重，建议寻求专业心理咨询帮助。',
+    },
+]
+
+
+def create_default_profile(apps, schema_editor):
+    """创建与原硬编码阈值、文案一致的第1版评分方案，并补全已有测试结果的版本和各类别得分"""
+    RPIScoringProfile = apps.get_model('rpi_calculator', 'RPIScoringProfile')
+    RPIScoreLevel = apps.get_model('rpi_calculator', 'RPIScoreLevel')
+    RPITestResult = apps.get_model('rpi_calculator', 'RPITestResult')
+    RPIAnswer = apps.get_model('rpi_calculator', 'RPIAnswer')
+    
+    profile = RPIScoringProfile.objects.create(version=1, name='默认方案', is_active=True)
+    RPIScoreLevel.objects.bulk_create([RPIScoreLevel(profile=profile, **level) for level in DEFAULT_LEVELS])
+    
+    # 各类别得分由已保存的答案汇总
+    category_scores = {}
+    subtotals = RPIAnswer.objects.values('user_id', 'question__category').annotate(total=Sum('score'))
+    for row in subtotals:
+        category_scores.setdefault(row['user_id'], {})[row['question__category']] = row['total']
+    
+    results = list(RPITestResult.objects.all())
+    for result in results:
+        result.scoring_version = 1
+        result.category_scores = category_scores.get(result.user_id, {})
+    RPITestResult.objects.bulk_update(results, ['scoring_version', 'category_scores'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0003_scoring_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_profile, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 18:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0004_populate_scoring_profile'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='rpitestresult',
+            name='detailed_analysis',
+        ),
+        migrations.RemoveField(
+            model_name='rpitestresult',
+            name='suggestions',
+        ),
+        migrations.RemoveField(
+            model_name='rpitestresult',
+            name='summary',
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0005_remove_rpitestresult_texts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RPIQuestionAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_count', models.BigIntegerField(default=0, verbose_name='回答次数')),
+                ('score_sum', models.BigIntegerField(default=0, verbose_name='得分之和')),
+                ('score_sq_sum', models.BigIntegerField(default=0, verbose_name='得分平方和')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='aggregate', to='rpi_calculator.rpiquestion', verbose_name='问题')),
+            ],
+            options={
+                'verbose_name': 'RPI问题统计',
+                'verbose_name_plural': 'RPI问题统计',
+                'db_table': 'rpi_question_aggregate',
+            },
+        ),
+        migrations.CreateModel(
+            name='RPIResultAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('all', '全部'), ('gender', '性别'), ('age_range', '年龄段'), ('relationship_status', '恋爱状态')], max_length=30, verbose_name='统计维度')),
+                ('dimension_value', models.CharField(blank=True, help_text='用户未填写时为空', max_length=30, verbose_name='维度取值')),
+                ('score_level', models.CharField(max_length=20, verbose_name='得分等级')),
+                ('test_count', models.BigIntegerField(default=0, verbose_name='测试次数')),
+                ('score_sum', models.BigIntegerField(default=0, verbose_name='总分之和')),
+                ('score_sq_sum', models.BigIntegerField(default=0, verbose_name='总分平方和')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': 'RPI结果统计',
+                'verbose_name_plural': 'RPI结果统计',
+                'db_table': 'rpi_result_aggregate',
+                'unique_together': {('dimension', 'dimension_value', 'score_level')},
+            },
+        ),
+    ]
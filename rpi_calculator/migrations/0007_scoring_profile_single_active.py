@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 18:47
+
+from django.db import migrations
+
+
+def keep_latest_active_profile(apps, schema_editor):
+    """已有多个启用的评分方案时只保留最新版本为启用"""
+    RPIScoringProfile = apps.get_model('rpi_calculator', 'RPIScoringProfile')
+    latest = RPIScoringProfile.objects.filter(is_active=True).order_by('-version').first()
+    if latest is not None:
+        RPIScoringProfile.objects.filter(is_active=True).exclude(pk=latest.pk).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0006_rpi_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_active_profile, migrations.RunPython.noop),
+    ]
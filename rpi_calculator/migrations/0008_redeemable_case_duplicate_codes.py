@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 20:10
+
+from django.db import migrations
+
+
+def make_case_duplicates_redeemable(apps, schema_editor):
+    """
+    0002 中与其他授权码只差大小写的旧授权码未能转换为大写，兑换时按大写精确匹配查不到
+
+    大写授权码已使用、旧授权码未使用时，把测试用户和使用状态转到旧授权码上，
+    大写授权码重新变为未使用（同一组有多个未使用的旧授权码时只能恢复一个）
+    """
+    AuthorizationCode = apps.get_model('rpi_calculator', 'AuthorizationCode')
+    RPIUser = apps.get_model('rpi_calculator', 'RPIUser')
+
+    codes = {}
+    for pk, code, is_used in AuthorizationCode.objects.values_list('pk', 'code', 'is_used'):
+        codes.setdefault(code.strip().upper(), []).append((pk, code, is_used))
+
+    for upper_code, group in codes.items():
+        if len(group) < 2:
+            continue
+        canonical = next((item for item in group if item[1] == upper_code), None)
+        legacy = next((item for item in group if item[1] != upper_code and not item[2]), None)
+        if canonical is None or legacy is None or not canonical[2]:
+            continue
+        RPIUser.objects.filter(authorization_code_id=canonical[0]).update(authorization_code_id=legacy[0])
+        AuthorizationCode.objects.filter(pk=legacy[0]).update(is_used=True)
+        AuthorizationCode.objects.filter(pk=canonical[0]).update(is_used=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi_calculator', '0007_scoring_profile_single_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_case_duplicates_redeemable, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 # Create your models here.
 
@@ -20,6 +20,16 @@ class AuthorizationCode(models.Model):
     def __str__(self):
         return self.code
 
+    def save(self, *args, **kwargs):
+        # 授权码统一保存为大写，兑换时按唯一索引精确匹配
+        self.code = normalize_code(self.code)
+        super().save(*args, **kwargs)
+
+
+def normalize_code(code):
+    """规范化授权码：去除首尾空白并转换为大写"""
+    return (code or '').strip().upper()
+
 
 class RPIUser(models.Model):
     """
@@ -85,9 +95,8 @@ class RPITestResult(models.Model):
     user = models.OneToOneField(RPIUser, on_delete=models.CASCADE, related_name="test_result", verbose_name="用户")
     total_score = models.IntegerField(verbose_name="总分")
     score_level = models.CharField(max_length=20, verbose_name="得分等级")
-    summary = models.TextField(verbose_name="结果总结")
-    detailed_analysis = models.TextField(verbose_name="详细分析")
-    suggestions = models.TextField(verbose_name="建议")
+    category_scores = models.JSONField(default=dict, blank=True, verbose_name="各类别得分")
+    scoring_version = models.PositiveIntegerField(null=True, blank=True, verbose_name="评分方案版本")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
 
     class Meta:
@@ -98,6 +107,105 @@ class RPITestResult(models.Model):
     def __str__(self):
         return f"Test Result for User {self.user.id}"
 
+    @property
+    def level(self):
+        """得分等级（结果文案按评分方案版本读取，不保存在结果中）"""
+        from .scoring import get_profile
+
+        return get_profile(self.scoring_version).get_level_by_key(self.score_level)
+
+    @property
+    def level_name(self):
+        level = self.level
+        return level.name if level else self.score_level
+
+    @property
+    def summary(self):
+        level = self.level
+        return level.summary if level else ''
+
+    @property
+    def detailed_analysis(self):
+        level = self.level
+        return level.detailed_analysis if level else ''
+
+    @property
+    def suggestions(self):
+        level = self.level
+        return level.suggestions if level else ''
+
+
+class RPIScoringProfile(models.Model):
+    """
+    RPI评分方案模型
+    按版本保存得分等级阈值、类别权重和结果文案
+    """
+    version = models.PositiveIntegerField(unique=True, verbose_name="版本")
+    name = models.CharField(max_length=100, blank=True, verbose_name="方案名称")
+    is_active = models.BooleanField(default=False, verbose_name="是否启用", help_text="同一时间只有一个启用的评分方案")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    class Meta:
+        verbose_name = "RPI评分方案"
+        verbose_name_plural = "RPI评分方案"
+        db_table = "rpi_scoring_profile"
+        ordering = ['-version']
+
+    def __str__(self):
+        return f"v{self.version} {self.name}".strip()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # MySQL 不支持条件唯一约束，启用方案时锁住全部方案（数量很少），并发启用依次执行；
+            # 绕过 save() 产生多个启用方案时，get_active_profile() 取版本最高的一个
+            if self.is_active:
+                list(RPIScoringProfile.objects.select_for_update().values_list('pk', flat=True))
+                RPIScoringProfile.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+            super().save(*args, **kwargs)
+
+
+class RPIScoreLevel(models.Model):
+    """
+    RPI得分等级模型
+    总分不低于 min_score 时属于该等级（取满足条件的最高等级）
+    """
+    profile = models.ForeignKey(RPIScoringProfile, on_delete=models.CASCADE, related_name="levels", verbose_name="评分方案")
+    key = models.CharField(max_length=20, verbose_name="等级标识")
+    name = models.CharField(max_length=50, verbose_name="等级名称")
+    min_score = models.IntegerField(verbose_name="最低分")
+    summary = models.TextField(verbose_name="结果总结")
+    detailed_analysis = models.TextField(verbose_name="详细分析")
+    suggestions = models.TextField(verbose_name="建议")
+
+    class Meta:
+        verbose_name = "RPI得分等级"
+        verbose_name_plural = "RPI得分等级"
+        db_table = "rpi_score_level"
+        unique_together = ('profile', 'key')
+        ordering = ['profile', 'min_score']
+
+    def __str__(self):
+        return f"{self.name} (≥{self.min_score})"
+
+
+class RPICategoryWeight(models.Model):
+    """
+    RPI类别权重模型
+    总分为各类别得分乘以权重之和，未配置的类别权重为1
+    """
+    profile = models.ForeignKey(RPIScoringProfile, on_delete=models.CASCADE, related_name="category_weights", verbose_name="评分方案")
+    category = models.CharField(max_length=50, verbose_name="问题类别")
+    weight = models.FloatField(default=1.0, verbose_name="权重")
+
+    class Meta:
+        verbose_name = "RPI类别权重"
+        verbose_name_plural = "RPI类别权重"
+        db_table = "rpi_category_weight"
+        unique_together = ('profile', 'category')
+
+    def __str__(self):
+        return f"{self.category}: {self.weight}"
+
 
 class RPIQuestion(models.Model):
     """
@@ -134,4 +242,58 @@ class RPIAnswer(models.Model):
         db_table = "rpi_answer"
 
     def __str__(self):
-        return f"Answer from User {self.user.id} to Question {self.question.question_order}"
\ No newline at end of file
+        return f"Answer from User {self.user.id} to Question {self.question.question_order}"
+
+class RPIResultAggregate(models.Model):
+    """
+    RPI测试结果统计汇总模型
+    按维度（全部/性别/年龄段/恋爱状态）和得分等级在提交时增量维护
+    """
+    DIMENSION_ALL = 'all'
+    DIMENSION_GENDER = 'gender'
+    DIMENSION_AGE_RANGE = 'age_range'
+    DIMENSION_RELATIONSHIP_STATUS = 'relationship_status'
+
+    DIMENSION_CHOICES = (
+        (DIMENSION_ALL, '全部'),
+        (DIMENSION_GENDER, '性别'),
+        (DIMENSION_AGE_RANGE, '年龄段'),
+        (DIMENSION_RELATIONSHIP_STATUS, '恋爱状态'),
+    )
+
+    dimension = models.CharField(max_length=30, choices=DIMENSION_CHOICES, verbose_name="统计维度")
+    dimension_value = models.CharField(max_length=30, blank=True, verbose_name="维度取值", help_text="用户未填写时为空")
+    score_level = models.CharField(max_length=20, verbose_name="得分等级")
+    test_count = models.BigIntegerField(default=0, verbose_name="测试次数")
+    score_sum = models.BigIntegerField(default=0, verbose_name="总分之和")
+    score_sq_sum = models.BigIntegerField(default=0, verbose_name="总分平方和")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "RPI结果统计"
+        verbose_name_plural = "RPI结果统计"
+        db_table = "rpi_result_aggregate"
+        unique_together = ('dimension', 'dimension_value', 'score_level')
+
+    def __str__(self):
+        return f"{self.dimension}={self.dimension_value} {self.score_level}: {self.test_count}"
+
+
+class RPIQuestionAggregate(models.Model):
+    """
+    RPI问题得分统计汇总模型
+    在提交时增量维护，用于计算每题得分的平均值和方差
+    """
+    question = models.OneToOneField(RPIQuestion, on_delete=models.CASCADE, related_name="aggregate", verbose_name="问题")
+    answer_count = models.BigIntegerField(default=0, verbose_name="回答次数")
+    score_sum = models.BigIntegerField(default=0, verbose_name="得分之和")
+    score_sq_sum = models.BigIntegerField(default=0, verbose_name="得分平方和")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "RPI问题统计"
+        verbose_name_plural = "RPI问题统计"
+        db_table = "rpi_question_aggregate"
+
+    def __str__(self):
+        return f"Question {self.question_id}: {self.answer_count}"
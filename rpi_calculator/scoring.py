@@ -0,0 +1,130 @@
+"""
+RPI评分引擎
+
+得分等级阈值、类别权重和结果文案保存在按版本区分的评分方案（RPIScoringProfile）中，
+每个进程按版本载入一次后缓存在内存里（评分方案变更时由信号清除本进程缓存，
+其他进程最多延迟 RPI_SCORING_CACHE_TTL 秒重新载入；每个缓存的方案各自计时过期，
+不会同时失效后集中回源）。
+测试结果只保存等级标识、各类别得分和评分方案版本，文案在展示时按版本读取。
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import RPIScoringProfile
+
+
+ScoreLevel = namedtuple('ScoreLevel', ['key', 'name', 'min_score', 'summary', 'detailed_analysis', 'suggestions'])
+
+# {版本: (评分方案, 载入时间)}
+_profiles = {}
+# (当前启用的评分方案, 载入时间)
+_active = None
+_lock = threading.Lock()
+
+
+class ScoringProfile:
+    """载入内存的评分方案"""
+
+    def __init__(self, version, levels, weights):
+        self.version = version
+        # 按最低分从低到高排列
+        self.levels = sorted(levels, key=lambda level: level.min_score)
+        self.weights = weights
+        self._levels_by_key = {level.key: level for level in self.levels}
+
+    def get_weight(self, category):
+        return self.weights.get(category, 1.0)
+
+    def get_level(self, total_score):
+        """总分对应的等级：最低分不超过总分的最高等级，低于所有等级时取最低等级"""
+        matched = self.levels[0]
+        for level in self.levels:
+            if level.min_score > total_score:
+                break
+            matched = level
+        return matched
+
+    def get_level_by_key(self, key):
+        return self._levels_by_key.get(key)
+
+    def score(self, questions, scores):
+        """
+        计算得分
+
+        questions: get_questions() 返回的问题列表；scores: {问题ID: 得分}
+        返回 (总分, 等级, {类别: 类别得分})，总分为各类别得分乘以权重之和
+        """
+        category_scores = {}
+        for question in questions:
+            category = question['category']
+            category_scores[category] = category_scores.get(category, 0) + scores[question['id']]
+        total_score = round(sum(
+            subtotal * self.get_weight(category) for category, subtotal in category_scores.items()
+        ))
+        return total_score, self.get_level(total_score), category_scores
+
+
+def _load_profile(**filters):
+    profile = RPIScoringProfile.objects.filter(**filters).prefetch_related(
+        'levels', 'category_weights'
+    ).order_by('-version').first()
+    if profile is None:
+        return None
+    levels = [
+        ScoreLevel(level.key, level.name, level.min_score, level.summary, level.detailed_analysis, level.suggestions)
+        for level in profile.levels.all()
+    ]
+    if not levels:
+        return None
+    weights = {weight.category: weight.weight for weight in profile.category_weights.all()}
+    return ScoringProfile(profile.version, levels, weights)
+
+
+def _is_fresh(loaded_at):
+    return time.monotonic() - loaded_at <= getattr(settings, 'RPI_SCORING_CACHE_TTL', 300)
+
+
+def get_active_profile():
+    """当前启用的评分方案（有多个启用的方案时取版本最高的，没有启用的方案时使用最新版本）"""
+    global _active
+    with _lock:
+        active = _active
+    if active is not None and _is_fresh(active[1]):
+        return active[0]
+
+    profile = _load_profile(is_active=True) or _load_profile()
+    if profile is None:
+        raise RPIScoringProfile.DoesNotExist('没有可用的RPI评分方案')
+    loaded_at = time.monotonic()
+    with _lock:
+        _profiles[profile.version] = (profile, loaded_at)
+        _active = (profile, loaded_at)
+    return profile
+
+
+def get_profile(version):
+    """指定版本的评分方案，版本为空或不存在时使用当前启用的方案"""
+    if version is None:
+        return get_active_profile()
+    with _lock:
+        entry = _profiles.get(version)
+    if entry is not None and _is_fresh(entry[1]):
+        return entry[0]
+
+    profile = _load_profile(version=version)
+    if profile is None:
+        return get_active_profile()
+    with _lock:
+        _profiles[version] = (profile, time.monotonic())
+    return profile
+
+
+def clear_profiles():
+    """清除本进程缓存的评分方案"""
+    global _active
+    with _lock:
+        _profiles.clear()
+        _active = None
@@ -0,0 +1,80 @@
+"""
+模型信号处理
+
+测试问题变更时清除问题列表缓存，评分方案变更时清除本进程缓存的评分方案；
+删除测试结果或答案（包括随用户级联删除）时从统计汇总中扣减。
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .aggregates import remove_answers_from_aggregates, remove_results_from_aggregates
+from .models import (
+    RPIQuestion, RPIScoringProfile, RPIScoreLevel, RPICategoryWeight, RPIUser, RPITestResult, RPIAnswer,
+)
+from .scoring import clear_profiles
+from .utils import invalidate_questions
+
+
+@receiver(post_save, sender=RPIQuestion)
+@receiver(post_delete, sender=RPIQuestion)
+def question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_questions()
+
+
+@receiver(post_save, sender=RPIScoringProfile)
+@receiver(post_delete, sender=RPIScoringProfile)
+@receiver(post_save, sender=RPIScoreLevel)
+@receiver(post_delete, sender=RPIScoreLevel)
+@receiver(post_save, sender=RPICategoryWeight)
+@receiver(post_delete, sender=RPICategoryWeight)
+def scoring_profile_changed(sender, raw=False, **kwargs):
+    if not raw:
+        clear_profiles()
+
+
+def _origin_model(origin):
+    """删除操作的发起对象（模型实例或查询集）对应的模型"""
+    if isinstance(origin, QuerySet):
+        return origin.model
+    return type(origin) if origin is not None else None
+
+
+def _deleting(model, instance, origin):
+    """
+    即将删除的对象查询集；同一次删除只需扣减一次时返回None
+
+    直接删除或随用户级联删除时，对整个删除操作（查询集或用户）只统计一次
+    """
+    origin_model = _origin_model(origin)
+    if origin_model not in (model, RPIUser):
+        return model.objects.filter(pk=instance.pk)
+    removed = getattr(origin, '_rpi_aggregates_removed', set())
+    if model in removed:
+        return None
+    origin._rpi_aggregates_removed = removed | {model}
+    if origin_model is RPIUser:
+        users = origin.values('pk') if isinstance(origin, QuerySet) else [origin.pk]
+        return model.objects.filter(user__in=users)
+    if isinstance(origin, QuerySet):
+        return model.objects.filter(pk__in=origin.values('pk'))
+    return model.objects.filter(pk=instance.pk)
+
+
+# 删除前记录仍在数据库中
+@receiver(pre_delete, sender=RPITestResult)
+def test_result_deleting(sender, instance, origin=None, **kwargs):
+    results = _deleting(RPITestResult, instance, origin)
+    if results is not None:
+        remove_results_from_aggregates(results)
+
+
+# 随问题删除的答案其汇总行也会级联删除
+@receiver(pre_delete, sender=RPIAnswer)
+def answer_deleting(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is RPIQuestion:
+        return
+    answers = _deleting(RPIAnswer, instance, origin)
+    if answers is not None:
+        remove_answers_from_aggregates(answers)
@@ -1,3 +1,336 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from survey.utils.short_codes import AUTH_CODE_ALPHABET, ShortCodeAllocator
+
+from . import scoring, utils
+from .aggregates import build_aggregates, build_dashboard, diff_aggregates
+from .models import (
+    AuthorizationCode, RPIUser, RPIQuestion, RPIAnswer, RPITestResult, RPIResultAggregate, RPIQuestionAggregate,
+    RPIScoringProfile, RPIScoreLevel,
+)
+
+
+def create_questions():
+    """创建两个类别、每类两道题的测试问题"""
+    return [
+        RPIQuestion.objects.create(question_text=f'问题{order}', question_order=order, category=category)
+        for order, category in enumerate(['信任', '信任', '控制', '控制'], 1)
+    ]
+
+
+def login_rpi_user(client, **kwargs):
+    """创建测试用户并写入会话"""
+    rpi_user = RPIUser.objects.create(**kwargs)
+    session = client.session
+    session['rpi_user_id'] = rpi_user.pk
+    session.save()
+    return rpi_user
+
+
+def submit_scores(client, questions, scores):
+    """按顺序提交每道题的得分"""
+    return client.post(reverse('rpi_calculator:rpi_question'), {
+        f'question_{question.pk}': score for question, score in zip(questions, scores)
+    })
+
+
+class GenerateAuthCodesTests(TestCase):
+    """生成授权码命令：只输出实际写入数据库的授权码"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def read_codes(self, path):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            return [row[0] for row in csv.reader(f)][1:]
+
+    def test_conflicting_codes_are_not_reported(self):
+        allocator = ShortCodeAllocator('auth_code', AUTH_CODE_ALPHABET, 8)
+        taken = AuthorizationCode.objects.create(code=allocator.encode(allocator.permute(0))).code
+
+        # 模拟并发：分配时授权码尚不存在，写入时已被其他进程写入
+        existing_auth_codes = utils._existing_auth_codes
+        calls = []
+
+        def racing_existing_auth_codes(codes):
+            calls.append(codes)
+            return set() if len(calls) == 1 else existing_auth_codes(codes)
+
+        path = os.path.join(self.directory, 'codes.csv')
+        with mock.patch.object(utils, '_existing_auth_codes', side_effect=racing_existing_auth_codes):
+            call_command('generate_auth_codes', number=5, output=path, stdout=io.StringIO())
+
+        self.assertGreater(len(calls), 1)
+        codes = self.read_codes(path)
+        self.assertEqual(len(set(codes)), 5)
+        self.assertNotIn(taken, codes)
+        self.assertEqual(AuthorizationCode.objects.filter(code__in=codes).count(), 5)
+        self.assertEqual(AuthorizationCode.objects.count(), 6)
+
+    def test_batches(self):
+        output = io.StringIO()
+        call_command('generate_auth_codes', number=7, batch_size=3, length=6, stdout=output)
+        self.assertIn('共生成 7 个授权码', output.getvalue())
+        codes = list(AuthorizationCode.objects.values_list('code', flat=True))
+        self.assertEqual(len(codes), 7)
+        self.assertTrue(all(len(code) == 6 and set(code) <= set(AUTH_CODE_ALPHABET) for code in codes))
+
+
+class RPIAuthTests(TestCase):
+    """授权码兑换：按大写精确匹配，兑换后创建测试用户"""
+
+    def redeem(self, code):
+        return self.client.post(reverse('rpi_calculator:rpi_auth'), {'code': code})
+
+    def test_code_generated_with_lowercase_prefix(self):
+        call_command('generate_auth_codes', number=1, prefix='ab', stdout=io.StringIO())
+        code = AuthorizationCode.objects.get().code
+        self.assertTrue(code.startswith('AB'))
+
+        response = self.redeem(f' {code.lower()} ')
+        self.assertRedirects(response, reverse('rpi_calculator:rpi_question'), fetch_redirect_response=False)
+        self.assertTrue(AuthorizationCode.objects.get().is_used)
+        self.assertEqual(self.client.session['rpi_user_id'], RPIUser.objects.get(authorization_code__code=code).pk)
+
+        self.assertContains(self.redeem(code), '该授权码已被使用')
+        self.assertEqual(RPIUser.objects.count(), 1)
+
+    def test_invalid_code(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.redeem('NOPE1234'), '无效的授权码')
+        # 按唯一索引精确匹配，不做大小写不敏感的查询
+        self.assertFalse([query for query in queries if 'LIKE' in query['sql']])
+        self.assertContains(self.redeem(''), '请输入授权码')
+
+    def test_legacy_code_differing_only_by_case(self):
+        # 0002 迁移时与其他授权码只差大小写、未能转换为大写的旧授权码
+        AuthorizationCode.objects.bulk_create([
+            AuthorizationCode(code='LEGACY01', is_used=True),
+            AuthorizationCode(code='legacy01', is_used=False),
+        ])
+        rpi_user = RPIUser.objects.create(authorization_code=AuthorizationCode.objects.get(code='LEGACY01'))
+        migration = importlib.import_module('rpi_calculator.migrations.0008_redeemable_case_duplicate_codes')
+        migration.make_case_duplicates_redeemable(apps, None)
+
+        rpi_user.refresh_from_db()
+        self.assertEqual(rpi_user.authorization_code.code, 'legacy01')
+        response = self.redeem('legacy01')
+        self.assertRedirects(response, reverse('rpi_calculator:rpi_question'), fetch_redirect_response=False)
+        self.assertTrue(AuthorizationCode.objects.get(code='LEGACY01').is_used)
+        self.assertContains(self.redeem('Legacy01'), '该授权码已被使用')
+
+
+class RPISubmitTests(TestCase):
+    """测试提交：问题列表缓存，答案、结果和统计在同一事务中写入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.questions = create_questions()
+
+    def setUp(self):
+        cache.clear()
+        scoring.clear_profiles()
+        self.rpi_user = login_rpi_user(self.client, gender='female')
+
+    def submit(self, scores):
+        return submit_scores(self.client, self.questions, scores)
+
+    def test_questions_are_cached(self):
+        with self.assertNumQueries(1):
+            utils.get_questions()
+        with self.assertNumQueries(0):
+            questions = utils.get_questions()
+        self.assertEqual([question['category'] for question in questions], ['信任', '信任', '控制', '控制'])
+
+        self.questions[0].save()
+        with self.assertNumQueries(1):
+            utils.get_questions()
+
+    def test_submit(self):
+        response = self.submit([5, 4, 3, 2])
+        self.assertRedirects(response, reverse('rpi_calculator:rpi_result'))
+
+        result = RPITestResult.objects.get(user=self.rpi_user)
+        self.assertEqual((result.total_score, result.score_level, result.scoring_version), (14, 'low', 1))
+        self.assertEqual(result.category_scores, {'信任': 9, '控制': 5})
+        self.assertEqual(self.rpi_user.answers.count(), 4)
+        self.assertEqual(
+            sorted(RPIResultAggregate.objects.values_list('dimension', 'dimension_value', 'test_count')),
+            [('age_range', '', 1), ('all', '', 1), ('gender', 'female', 1), ('relationship_status', '', 1)]
+        )
+        self.assertEqual(RPIQuestionAggregate.objects.get(question=self.questions[0]).score_sum, 5)
+
+        # 重复提交不会重复写入
+        self.assertRedirects(self.submit([1, 1, 1, 1]), reverse('rpi_calculator:rpi_result'))
+        self.assertEqual(RPIAnswer.objects.count(), 4)
+        self.assertEqual(RPIResultAggregate.objects.get(dimension='all').test_count, 1)
+
+    def test_invalid_answers_write_nothing(self):
+        self.assertEqual(self.submit([5, 4, 3]).status_code, 400)
+        self.assertEqual(self.submit([5, 4, 3, 6]).status_code, 400)
+        self.assertEqual(self.submit([5, 4, 3, 'x']).status_code, 400)
+        self.assertFalse(RPIAnswer.objects.exists())
+        self.assertFalse(RPITestResult.objects.exists())
+
+    def test_failed_submit_is_rolled_back(self):
+        # 不是重复提交的完整性错误不会被当作重复提交跳转到结果页
+        with mock.patch('rpi_calculator.views.update_aggregates', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            self.submit([5, 4, 3, 2])
+        self.assertIsNone(cache.get(utils.QUESTIONS_CACHE_KEY))
+        self.assertFalse(RPIAnswer.objects.exists())
+        self.assertFalse(RPITestResult.objects.exists())
+
+
+class ScoringProfileTests(TestCase):
+    """评分方案：只有一个启用的方案，进程内缓存按方案各自过期"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.questions = create_questions()
+
+    def setUp(self):
+        cache.clear()
+        scoring.clear_profiles()
+        self.addCleanup(scoring.clear_profiles)
+
+    def create_profile(self, version, is_active=True):
+        profile = RPIScoringProfile.objects.create(version=version, is_active=is_active)
+        RPIScoreLevel.objects.create(
+            profile=profile, key='all', name='全部', min_score=0, summary='', detailed_analysis='', suggestions=''
+        )
+        return profile
+
+    def test_single_active_profile(self):
+        self.create_profile(2)
+        self.assertEqual(list(RPIScoringProfile.objects.filter(is_active=True).values_list('version', flat=True)), [2])
+
+        # 绕过 save() 启用多个方案时取版本最高的
+        RPIScoringProfile.objects.update(is_active=True)
+        self.create_profile(3, is_active=False)
+        self.assertEqual(scoring.get_active_profile().version, 2)
+        self.create_profile(4)
+        self.assertEqual(list(RPIScoringProfile.objects.filter(is_active=True).values_list('version', flat=True)), [4])
+
+    def test_missing_profile_shows_error(self):
+        RPIScoringProfile.objects.all().delete()
+        login_rpi_user(self.client)
+        response = submit_scores(self.client, self.questions, [3, 3, 3, 3])
+        self.assertContains(response, '测试暂时无法计算结果', status_code=503)
+        self.assertFalse(RPIAnswer.objects.exists())
+
+    @override_settings(RPI_SCORING_CACHE_TTL=300)
+    def test_cached_profiles_expire_independently(self):
+        self.create_profile(2)
+        with mock.patch.object(scoring.time, 'monotonic', return_value=1000.0):
+            self.assertEqual(scoring.get_active_profile().version, 2)
+        with mock.patch.object(scoring.time, 'monotonic', return_value=1200.0):
+            self.assertEqual(scoring.get_profile(1).version, 1)
+
+        with mock.patch.object(scoring.time, 'monotonic', return_value=1350.0):
+            # 第1版载入不久，仍使用缓存；当前方案已过期，重新载入
+            with self.assertNumQueries(0):
+                scoring.get_profile(1)
+            with self.assertNumQueries(3):
+                scoring.get_active_profile()
+            with self.assertNumQueries(0):
+                scoring.get_profile(2)
+
+
+class RPIAggregateTests(TestCase):
+    """统计汇总：提交时增量维护，统计面板只读取汇总表，可全量检查和重建"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.questions = create_questions()
+
+    def setUp(self):
+        cache.clear()
+        scoring.clear_profiles()
+        for gender, scores in [('male', [5, 5, 5, 5]), ('female', [1, 2, 3, 4])]:
+            self.client.logout()
+            login_rpi_user(self.client, gender=gender)
+            submit_scores(self.client, self.questions, scores)
+
+    def test_dashboard(self):
+        dashboard = build_dashboard(scoring.get_active_profile().levels, utils.get_questions())
+        overall = dashboard['overall']
+        self.assertEqual((overall['count'], overall['mean'], overall['std']), (2, 15.0, 5.0))
+        self.assertEqual(
+            [(level['key'], level['count'], level['percentage']) for level in overall['levels']],
+            [('low', 2, 100.0), ('medium', 0, 0), ('high', 0, 0)]
+        )
+        gender = dashboard['breakdowns'][0]
+        self.assertEqual([(row['label'], row['count']) for row in gender['rows']], [('男', 1), ('女', 1)])
+        self.assertEqual(
+            [(question['count'], question['mean'], question['variance']) for question in dashboard['questions']],
+            [(2, 3.0, 4.0), (2, 3.5, 2.25), (2, 4.0, 1.0), (2, 4.5, 0.25)]
+        )
+
+    def test_admin_dashboard(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('admin:rpi_calculator_rpitestresult_dashboard'))
+        self.assertContains(response, 'RPI测试统计面板')
+
+    def test_check_and_rebuild(self):
+        output = io.StringIO()
+        call_command('rebuild_rpi_aggregates', check=True, stdout=output)
+        self.assertIn('统计一致', output.getvalue())
+
+        expected = sorted(RPIResultAggregate.objects.values_list('dimension', 'dimension_value', 'test_count', 'score_sum'))
+        RPIResultAggregate.objects.filter(dimension='all').update(test_count=5)
+        RPIQuestionAggregate.objects.filter(question=self.questions[0]).delete()
+        output = io.StringIO()
+        call_command('rebuild_rpi_aggregates', check=True, stdout=output)
+        self.assertIn('统计不一致：1 个结果统计、1 个问题统计', output.getvalue())
+
+        call_command('rebuild_rpi_aggregates', stdout=io.StringIO())
+        self.assertEqual(
+            sorted(RPIResultAggregate.objects.values_list('dimension', 'dimension_value', 'test_count', 'score_sum')),
+            expected
+        )
+        self.assertEqual(RPIQuestionAggregate.objects.get(question=self.questions[0]).score_sum, 6)
+
+    def assert_aggregates_consistent(self):
+        self.assertEqual(diff_aggregates(*build_aggregates()), (0, 0))
+
+    def test_delete_results_and_answers(self):
+        male = RPIUser.objects.get(gender='male')
+        male.test_result.delete()
+        self.assert_aggregates_consistent()
+        self.assertEqual(RPIResultAggregate.objects.get(dimension='all', score_level='low').test_count, 1)
+
+        RPIAnswer.objects.filter(user=male, score=5).exclude(question=self.questions[0]).delete()
+        self.assert_aggregates_consistent()
+        self.assertEqual(RPIQuestionAggregate.objects.get(question=self.questions[1]).answer_count, 1)
+
+        self.questions[0].delete()
+        self.assert_aggregates_consistent()
+
+    def test_delete_users(self):
+        RPIUser.objects.get(gender='male').delete()
+        self.assert_aggregates_consistent()
+        self.assertEqual(
+            list(RPIQuestionAggregate.objects.order_by('question_id').values_list('answer_count', 'score_sum')),
+            [(1, 1), (1, 2), (1, 3), (1, 4)]
+        )
+
+        RPIUser.objects.all().delete()
+        self.assert_aggregates_consistent()
+        self.assertFalse(RPIResultAggregate.objects.exclude(test_count=0).exists())
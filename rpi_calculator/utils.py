@@ -0,0 +1,75 @@
+"""
+RPI授权码、测试问题工具函数
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from survey.utils.short_codes import ShortCodeAllocator, AUTH_CODE_ALPHABET
+
+from .models import AuthorizationCode, RPIQuestion, normalize_code
+
+
+QUESTIONS_CACHE_KEY = 'rpi:questions'
+
+
+def _existing_auth_codes(codes):
+    return set(AuthorizationCode.objects.filter(code__in=codes).values_list('code', flat=True))
+
+
+def allocate_auth_codes(number, length=8, prefix=''):
+    """分配 number 个不重复的授权码（大写字母和数字，总长度 length，含前缀）"""
+    # 前缀同样转换为大写，兑换时按大写精确匹配（bulk_create 不会调用 save() 规范化）
+    prefix = normalize_code(prefix)
+    if len(prefix) >= length:
+        raise ValueError('授权码前缀长度必须小于授权码长度')
+    allocator = ShortCodeAllocator('auth_code', AUTH_CODE_ALPHABET, length - len(prefix), prefix)
+    return allocator.allocate(number, _existing_auth_codes)
+
+
+def create_auth_codes(number, length=8, prefix='', batch_size=1000):
+    """
+    分配并写入 number 个授权码，返回实际写入的授权码列表
+
+    与并发写入的授权码冲突时剔除冲突的授权码，重新分配补足数量
+    """
+    created = []
+    while len(created) < number:
+        codes = allocate_auth_codes(number - len(created), length, prefix)
+        created.extend(_insert_auth_codes(codes, batch_size))
+    return created
+
+
+def _insert_auth_codes(codes, batch_size):
+    while codes:
+        try:
+            with transaction.atomic():
+                AuthorizationCode.objects.bulk_create(
+                    [AuthorizationCode(code=code, is_used=False) for code in codes],
+                    batch_size=batch_size
+                )
+            return codes
+        except IntegrityError:
+            existing = _existing_auth_codes(codes)
+            if not existing:
+                raise
+            codes = [code for code in codes if code not in existing]
+    return codes
+
+
+def get_questions():
+    """
+    获取按顺序排列的测试问题列表（缓存，问题变更时由信号清除）
+
+    每一项结构：{'id', 'question_text', 'question_order', 'category'}
+    """
+    questions = cache.get(QUESTIONS_CACHE_KEY)
+    if questions is None:
+        questions = list(RPIQuestion.objects.values('id', 'question_text', 'question_order', 'category'))
+        cache.set(QUESTIONS_CACHE_KEY, questions, getattr(settings, 'RPI_QUESTION_CACHE_TIMEOUT', 3600))
+    return questions
+
+
+def invalidate_questions():
+    """清除测试问题缓存"""
+    cache.delete(QUESTIONS_CACHE_KEY)
@@ -5,9 +5,10 @@ from django.urls import reverse
 from django.template.response import TemplateResponse
 from django.http import HttpResponseRedirect, HttpResponse
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch
 
-from ..models import Answer
+from ..models import Answer, Option
+from .base import CappedCountPaginator
 
 
 @admin.register(Answer)
@@ -16,7 +17,17 @@ class AnswerAdmin(admin.ModelAdmin):
     list_display = ['question_preview', 'survey_preview', 'response', 'answer_preview']
     list_filter = ['response__survey', 'question__question_type']
     search_fields = ['answer_text', 'question__text', 'response__wechat_nickname']
-    list_select_related = ['question', 'response__survey']
+    list_select_related = ['question', 'response__survey', 'response__respondent']
+    # 模型默认排序需要连接问卷问题表，列表改为按主键倒序（最新的答案在前）
+    ordering = ['-id']
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        """优化查询集，当前页所有问题的选项一次预加载"""
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('question__options', queryset=Option.objects.only('question_id', 'value', 'label').order_by())
+        )
     
     def question_preview(self, obj):
         return obj.question.text[:50] + '...' if len(obj.question.text) > 50 else obj.question.text
@@ -34,7 +45,7 @@ class AnswerAdmin(admin.ModelAdmin):
             if obj.question.question_type in ['single_choice', 'multiple_choice']:
                 choices = obj.answer_choice if isinstance(obj.answer_choice, list) else [obj.answer_choice]
                 
-                # 创建选项映射
+                # 创建选项映射（选项已预加载）
                 option_map = {option.value: option.label for option in obj.question.options.all()}
                 
                 # 转换值为标签
@@ -1,5 +1,8 @@
 # survey/admin/base.py
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 
@@ -32,3 +35,19 @@ class CustomAdminSite(admin.AdminSite):
 
 # 替换默认的admin.site
 admin.site.__class__ = CustomAdminSite
+
+
+class CappedCountPaginator(Paginator):
+    """
+    大表分页器：总数最多统计到 SURVEY_ADMIN_COUNT_LIMIT 条
+
+    COUNT 在只取主键、带 LIMIT 的子查询上执行，扫描行数有上限，不会对百万级数据做全表 COUNT(*)；
+    超过上限时列表只显示上限数量的分页，可通过筛选或搜索缩小范围。
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'SURVEY_ADMIN_COUNT_LIMIT', 10000)
+        if not limit or not hasattr(self.object_list, 'order_by'):
+            return super().count
+        return self.object_list.order_by().values('pk')[:limit].count()
@@ -6,20 +6,19 @@ from django.template.response import TemplateResponse
 from django.http import HttpResponseRedirect, HttpResponse
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Q, Count
-import random
-import string
-import uuid
 
 from ..models import QRCode
+from ..services.scan_counter import scan_counter
+from ..utils.short_codes import allocate_qrcode_short_codes
 
 
 @admin.register(QRCode)
 class QRCodeAdmin(admin.ModelAdmin):
     """二维码管理"""
-    list_display = ['name', 'survey', 'short_code', 'scan_count', 'created_at', 'qr_code_preview']
+    list_display = ['name', 'survey', 'short_code', 'live_scan_count', 'created_at', 'qr_code_preview']
     list_filter = ['survey', 'created_at']
     search_fields = ['name', 'short_code', 'survey__title']
-    readonly_fields = ['scan_count', 'created_at', 'qr_code_preview', 'download_qrcode']
+    readonly_fields = ['live_scan_count', 'created_at', 'qr_code_preview', 'download_qrcode']
     list_select_related = ['survey']
     
     fieldsets = (
@@ -27,7 +26,7 @@ class QRCodeAdmin(admin.ModelAdmin):
             'fields': ('survey', 'name', 'short_code')
         }),
         ('统计信息', {
-            'fields': ('scan_count', 'created_at'),
+            'fields': ('live_scan_count', 'created_at'),
             'classes': ('collapse',)
         }),
         ('二维码', {
@@ -68,13 +67,13 @@ class QRCodeAdmin(admin.ModelAdmin):
     
     def _generate_unique_short_code(self, length=8):
         """生成唯一的短代码"""
-        max_attempts = 10
-        for _ in range(max_attempts):
-            code = ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
-            if not QRCode.objects.filter(short_code=code).exists():
-                return code
-        # 如果多次尝试失败，使用UUID
-        return str(uuid.uuid4())[:8]
+        return allocate_qrcode_short_codes(1, length)[0]
+    
+    def live_scan_count(self, obj):
+        """扫描次数（包含尚未写入数据库的计数）"""
+        return scan_counter.get_live_count(obj)
+    live_scan_count.short_description = '扫描次数'
+    live_scan_count.admin_order_field = 'scan_count'
     
     def qr_code_preview(self, obj):
         """二维码预览"""
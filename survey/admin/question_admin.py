@@ -10,12 +10,12 @@ from django import forms
 from django.shortcuts import render, redirect
 import csv
 import os
-import re
 import random
 import string
 import uuid
 
 from ..models import Survey, Question, Response, Answer, QRCode, Option, SurveyQuestion, Category
+from ..services.question_import import import_questions
 
 
 class OptionInline(admin.TabularInline):
@@ -291,50 +291,13 @@ class QuestionAdmin(admin.ModelAdmin):
                 try:
                     file = request.FILES['file']
                     is_public = form.cleaned_data['is_public']
-                    rows = self._read_import_file(file)
-                    
-                    created_count = 0
-                    error_count = 0
-                    error_messages = []
-                    
-                    for i, row in enumerate(rows, 2):  # 从第2行开始计数（表头是第1行）
-                        try:
-                            # 处理分类
-                            category_name = row.get('分类', '').strip()
-                            category = None
-                            if category_name:
-                                category, _ = Category.objects.get_or_create(
-                                    name=category_name, 
-                                    defaults={'slug': category_name}
-                                )
-                            
-                            # 处理问题类型
-                            question_type = self._parse_question_type(row.get('问题类型', 'text').strip())
-                            
-                            # 创建问题
-                            question = Question.objects.create(
-                                text=row.get('问题文本', '').strip(),
-                                question_type=question_type,
-                                category=category,
-                                created_by=request.user,
-                                is_public=is_public
-                            )
-                            created_count += 1
-                            
-                            # 处理选项
-                            options_str = self._get_options_string(row)
-                            if options_str and question_type in ['single_choice', 'multiple_choice']:
-                                self._create_options(question, options_str)
-                                
-                        except Exception as e:
-                            error_count += 1
-                            error_messages.append(f'第{i}行导入失败: {str(e)}')
+                    result = import_questions(file, request.user, is_public=is_public)
                     
                     # 显示结果消息
-                    if created_count > 0:
-                        self.message_user(request, f'成功导入 {created_count} 个问题')
-                    if error_count > 0:
-                        self.message_user(request, f'有 {error_count} 个问题导入失败: {"; ".join(error_messages[:5])}', 'warning')
+                    if result.created_count > 0:
+                        self.message_user(request, f'成功导入 {result.created_count} 个问题')
+                    if result.error_count > 0:
+                        self.message_user(request, f'有 {result.error_count} 个问题导入失败: {"; ".join(result.error_messages(5))}', 'warning')
                     
                     return redirect(reverse('admin:survey_question_changelist'))
                     
@@ -349,96 +312,6 @@ class QuestionAdmin(admin.ModelAdmin):
             'opts': self.model._meta,
         })
     
-    def _read_import_file(self, file):
-        """读取导入文件"""
-        ext = os.path.splitext(file.name)[1].lower()
-        
-        if ext == '.csv':
-            # 读取CSV文件
-            decoded_file = file.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-            return list(reader)
-        else:
-            # 读取Excel文件
-            try:
-                from openpyxl import load_workbook
-            except ImportError:
-                raise Exception('请安装 openpyxl 库以支持Excel导入')
-            
-            wb = load_workbook(file)
-            ws = wb.active
-            
-            # 获取表头
-            header_row = []
-            for cell in ws[1]:
-                header_row.append(str(cell.value).strip())
-            
-            # 读取数据行
-            rows = []
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if all(cell is None for cell in row):
-                    continue
-                
-                row_dict = {}
-                for i, cell_value in enumerate(row):
-                    if i < len(header_row):
-                        row_dict[header_row[i]] = str(cell_value).strip() if cell_value is not None else ''
-                rows.append(row_dict)
-            
-            return rows
-    
-    def _parse_question_type(self, question_type):
-        """解析问题类型"""
-        question_type_mapping = {
-            '文本题': 'text',
-            '单选题': 'single_choice',
-            '多选题': 'multiple_choice',
-            '评分题': 'rating',
-            '日期题': 'date',
-            'text': 'text',
-            'single_choice': 'single_choice',
-            'multiple_choice': 'multiple_choice',
-            'rating': 'rating',
-            'date': 'date'
-        }
-        
-        return question_type_mapping.get(question_type, 'text')
-    
-    def _get_options_string(self, row):
-        """从行数据中获取选项字符串"""
-        possible_fields = ['选项', '选项(格式: 值|标签;值|标签)', 
-                          '选项(格式: 值|标签)', '选项(格式: 标签1;标签2;标签3)']
-        for field in possible_fields:
-            if field in row:
-                return row[field].strip()
-        return ''
-    
-    def _create_options(self, question, options_str):
-        """创建问题选项"""
-        options = options_str.split(';')
-        for i, option in enumerate(options):
-            if '|' in option:
-                # 格式: 值|标签
-                value, label = option.split('|', 1)
-                value = value.strip()
-                label = label.strip()
-            else:
-                # 格式: 标签
-                label = option.strip()
-                # 生成值：移除特殊字符，转为小写，空格替换为下划线
-                value = re.sub(r'[^\w\s]', '', label)
-                value = value.lower().replace(' ', '_')
-                if not value:
-                    value = f'option_{i+1}'
-            
-            if value and label:
-                Option.objects.create(
-                    question=question,
-                    value=value,
-                    label=label,
-                    order=i
-                )
-    
     def export_template_view(self, request):
         """导出问题模板"""
         export_format = request.GET.get('format', 'csv')
@@ -5,9 +5,11 @@ from django.urls import reverse
 from django.template.response import TemplateResponse
 from django.http import HttpResponseRedirect, HttpResponse
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Count
+from django.db.models import Q, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from ..models import Response
+from ..models import Response, Answer
+from .base import CappedCountPaginator
 
 
 @admin.register(Response)
@@ -17,11 +19,23 @@ class ResponseAdmin(admin.ModelAdmin):
     list_filter = ['submit_time', 'survey']
     search_fields = ['wechat_nickname', 'wechat_openid', 'survey__title']
     readonly_fields = ['submit_time']
-    list_select_related = ['survey']
+    list_select_related = ['survey', 'respondent']
+    paginator = CappedCountPaginator
+    show_full_result_count = False
     
     def has_add_permission(self, request):
         return False
     
+    def get_queryset(self, request):
+        """优化查询集，以相关子查询统计答案数量（只对当前页的回答执行，不对答案表整体分组）"""
+        answer_count = Answer.objects.filter(response=OuterRef('pk')).order_by().values('response').annotate(
+            total=Count('pk')
+        ).values('total')
+        return super().get_queryset(request).annotate(
+            _answer_count=Coalesce(Subquery(answer_count), 0)
+        )
+    
     def answer_count(self, obj):
-        return obj.answers.count()
+        return obj._answer_count if hasattr(obj, '_answer_count') else obj.answers.count()
     answer_count.short_description = '答案数量'
+    answer_count.admin_order_field = '_answer_count'
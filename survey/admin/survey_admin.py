@@ -3,13 +3,19 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.template.response import TemplateResponse
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, StreamingHttpResponse, FileResponse
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Q, Count
 from django import forms
 from django.shortcuts import render, redirect
+import tempfile
 
 from ..models import Survey, SurveyQuestion
+from ..services.statistics import build_survey_statistics, count_answers
+from ..services.qrcode_batch import create_qrcodes, stream_zip, write_pdf_sheet
+from ..services.exporters import (
+    ResponseExporter, stream_csv, stream_jsonl, write_xlsx_tempfile, write_columnar_tempfile,
+)
 
 
 class SurveyQuestionInline(admin.TabularInline):
@@ -51,6 +57,8 @@ class SurveyAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at', 'statistics']
     inlines = [SurveyQuestionInline]
     list_select_related = ['created_by']
+    actions = ['export_responses_csv', 'export_responses_excel', 'export_responses_jsonl', 'export_responses_parquet',
+               'generate_qrcodes']
     
     # 优化查询集
     def get_queryset(self, request):
@@ -81,15 +89,91 @@ class SurveyAdmin(admin.ModelAdmin):
         
         survey_questions = obj.survey_questions.select_related('question').all()
         if survey_questions:
+            answer_counts = count_answers(obj)
             html += "<h4>问题详情：</h4><ul>"
             for sq in survey_questions:
-                answer_count = sq.question.answers.count()
+                answer_count = answer_counts.get(sq.question_id, 0)
                 html += f"<li><strong>{sq.question.text}</strong> ({sq.question.get_question_type_display()})：{answer_count} 个回答</li>"
             html += "</ul>"
         
         return format_html(html)
     statistics.short_description = '统计信息'
     
+    def export_responses_csv(self, request, queryset):
+        """导出问卷回答（CSV格式，流式输出）"""
+        survey = self._get_export_survey(request, queryset)
+        if survey is None:
+            return None
+        response = StreamingHttpResponse(
+            stream_csv(ResponseExporter(survey)), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="survey_{survey.pk}_responses.csv"'
+        return response
+    export_responses_csv.short_description = '导出回答为CSV'
+    
+    def export_responses_excel(self, request, queryset):
+        """导出问卷回答（Excel格式，只写模式写入临时文件后分块发送）"""
+        survey = self._get_export_survey(request, queryset)
+        if survey is None:
+            return None
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            return HttpResponse('请先安装 openpyxl 库：pip install openpyxl', status=500)
+        return FileResponse(
+            write_xlsx_tempfile(ResponseExporter(survey)),
+            as_attachment=True,
+            filename=f'survey_{survey.pk}_responses.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    export_responses_excel.short_description = '导出回答为Excel'
+    
+    def export_responses_jsonl(self, request, queryset):
+        """导出问卷回答（JSON Lines格式，流式输出）"""
+        survey = self._get_export_survey(request, queryset)
+        if survey is None:
+            return None
+        response = StreamingHttpResponse(
+            stream_jsonl(ResponseExporter(survey)), content_type='application/x-ndjson; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="survey_{survey.pk}_responses.jsonl"'
+        return response
+    export_responses_jsonl.short_description = '导出回答为JSON Lines'
+    
+    def export_responses_parquet(self, request, queryset):
+        """导出问卷回答（Parquet格式，保留列类型，供数据分析使用）"""
+        survey = self._get_export_survey(request, queryset)
+        if survey is None:
+            return None
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return HttpResponse('请先安装 pyarrow 库：pip install pyarrow', status=500)
+        return FileResponse(
+            write_columnar_tempfile(ResponseExporter(survey), 'parquet'),
+            as_attachment=True,
+            filename=f'survey_{survey.pk}_responses.parquet',
+            content_type='application/vnd.apache.parquet'
+        )
+    export_responses_parquet.short_description = '导出回答为Parquet'
+    
+    def generate_qrcodes(self, request, queryset):
+        """批量生成二维码"""
+        survey = self._get_export_survey(request, queryset)
+        if survey is None:
+            return None
+        return HttpResponseRedirect(reverse('admin:survey_generate_qrcodes', args=[survey.pk]))
+    generate_qrcodes.short_description = '批量生成二维码'
+    
+    def _get_export_survey(self, request, queryset):
+        """导出回答、批量生成二维码时只允许选择一个问卷"""
+        # 不加载列表页预取的全部回答
+        surveys = list(queryset.prefetch_related(None).order_by()[:2])
+        if len(surveys) != 1:
+            self.message_user(request, '请只选择一个问卷', 'error')
+            return None
+        return surveys[0]
+    
     # 自定义URL和视图
     def get_urls(self):
         from django.urls import path
@@ -97,6 +181,8 @@ class SurveyAdmin(admin.ModelAdmin):
         custom_urls = [
             path('<uuid:pk>/statistics/', self.admin_site.admin_view(self.statistics_view), 
                  name='survey_statistics'),
+            path('<uuid:pk>/generate_qrcodes/', self.admin_site.admin_view(self.generate_qrcodes_view),
+                 name='survey_generate_qrcodes'),
         ]
         return custom_urls + urls
     
@@ -107,18 +193,9 @@ class SurveyAdmin(admin.ModelAdmin):
             self.message_user(request, '问卷不存在', 'error')
             return redirect(reverse('admin:survey_survey_changelist'))
         
-        # 计算统计数据
+        # 计算统计数据（在数据库中分组统计，只统计该问卷的回答）
         total_responses = survey.responses.count()
-        survey_questions = survey.survey_questions.select_related('question').prefetch_related(
-            'question__options', 'question__answers'
-        ).all().order_by('order')
-        
-        questions_stats = []
-        for sq in survey_questions:
-            question = sq.question
-            answers = question.answers.all()
-            stats = self._calculate_question_stats(question, answers)
-            questions_stats.append(stats)
+        questions_stats = build_survey_statistics(survey)
         
         context = {
             **self.admin_site.each_context(request),
@@ -131,67 +208,49 @@ class SurveyAdmin(admin.ModelAdmin):
         
         return TemplateResponse(request, 'admin/survey/statistics.html', context)
     
-    def _calculate_question_stats(self, question, answers):
-        """计算问题统计数据"""
-        stats = {
-            'question': question,
-            'answer_count': answers.count(),
-            'type': question.question_type,
-            'data': {},
-            'options': []
-        }
+    def generate_qrcodes_view(self, request, pk):
+        """批量生成二维码并下载"""
+        survey = self.get_object(request, pk)
+        if not survey:
+            self.message_user(request, '问卷不存在', 'error')
+            return redirect(reverse('admin:survey_survey_changelist'))
         
-        if question.question_type in ['single_choice', 'multiple_choice']:
-            # 选择题统计
-            option_stats = {}
-            for option in question.options.all():
-                option_stats[option.value] = {
-                    'label': option.label,
-                    'count': 0,
-                    'percentage': 0.0
-                }
-            
-            for answer in answers:
-                choices = answer.answer_choice
-                if isinstance(choices, list):
-                    for choice in choices:
-                        if choice in option_stats:
-                            option_stats[choice]['count'] += 1
-                elif isinstance(choices, str) and choices in option_stats:
-                    option_stats[choices]['count'] += 1
-            
-            total = answers.count() or 1
-            for option_data in option_stats.values():
-                option_data['percentage'] = (option_data['count'] / total) * 100
-            
-            stats['data'] = option_stats
-            stats['options'] = list(question.options.all().values('value', 'label'))
-            
-        elif question.question_type == 'rating':
-            # 评分题统计
-            ratings = {}
-            for i in range(1, 6):
-                ratings[str(i)] = {'count': 0, 'percentage': 0.0}
-            
-            for answer in answers:
-                rating = answer.answer_choice
-                if isinstance(rating, list) and rating:
-                    rating = rating[0]
-                if isinstance(rating, str) and rating in ratings:
-                    ratings[rating]['count'] += 1
-            
-            total = answers.count() or 1
-            for rating_data in ratings.values():
-                rating_data['percentage'] = (rating_data['count'] / total) * 100
-            
-            stats['data'] = ratings
-            
-        elif question.question_type == 'text':
-            # 文本题统计
-            text_answers = []
-            for answer in answers[:10]:
-                text = answer.answer_text[:100] + ('...' if len(answer.answer_text) > 100 else '')
-                text_answers.append(text)
-            stats['data'] = text_answers
+        class GenerateQRCodesForm(forms.Form):
+            count = forms.IntegerField(label='生成数量', min_value=1, max_value=1000, initial=50)
+            prefix = forms.CharField(
+                label='名称前缀', max_length=80, required=False,
+                help_text='二维码名称为"前缀-编号"，默认使用问卷标题'
+            )
+            output_format = forms.ChoiceField(
+                label='下载格式',
+                choices=[('zip', 'ZIP压缩包（PNG图片）'), ('pdf', '可打印PDF（每页12个）')],
+                initial='zip'
+            )
+        
+        if request.method == 'POST':
+            form = GenerateQRCodesForm(request.POST)
+            if form.is_valid():
+                qrcodes = create_qrcodes(survey, form.cleaned_data['count'], form.cleaned_data['prefix'])
+                base_url = request.build_absolute_uri('/')
+                
+                if form.cleaned_data['output_format'] == 'pdf':
+                    tmp = tempfile.TemporaryFile(suffix='.pdf')
+                    write_pdf_sheet(tmp, qrcodes, base_url)
+                    tmp.seek(0)
+                    return FileResponse(tmp, as_attachment=True, filename=f'qrcodes_{survey.pk}.pdf',
+                                        content_type='application/pdf')
+                
+                response = StreamingHttpResponse(stream_zip(qrcodes, base_url),
+                                                 content_type='application/zip')
+                response['Content-Disposition'] = f'attachment; filename="qrcodes_{survey.pk}.zip"'
+                return response
+        else:
+            form = GenerateQRCodesForm()
         
-        return stats
+        return render(request, 'admin/survey/generate_qrcodes.html', {
+            **self.admin_site.each_context(request),
+            'form': form,
+            'survey': survey,
+            'title': '批量生成二维码',
+            'opts': self.model._meta,
+        })
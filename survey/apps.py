@@ -6,3 +6,7 @@ class SurveyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'survey'
     verbose_name = _('问卷')
+
+    def ready(self):
+        # 注册模型信号（问卷快照失效等）
+        from . import signals  # noqa: F401
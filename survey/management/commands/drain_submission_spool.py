@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Django管理命令：写入提交缓冲队列
+将本地缓冲队列中的问卷提交批量写入数据库，启动时会自动重放上次未完成的批次，
+无法写入的提交移入死信文件
+"""
+
+import os
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from django.core.management.base import BaseCommand, CommandError
+from survey.services.spool import SubmissionSpool, write_dead_letters
+from survey.services.submission import TRANSIENT_DB_ERRORS, persist_spooled_batch
+
+class Command(BaseCommand):
+    """写入提交缓冲队列的管理命令"""
+    help = '将问卷提交缓冲队列中的数据批量写入数据库'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            '-b', '--batch-size',
+            type=int,
+            default=500,
+            help='每批写入的提交数量，默认500'
+        )
+        parser.add_argument(
+            '-i', '--interval',
+            type=float,
+            default=1.0,
+            help='队列为空时的轮询间隔（秒），默认1秒'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='写完当前队列后退出，不持续运行'
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='只显示队列深度和写入延迟'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        spool = SubmissionSpool(settings.SURVEY_SPOOL_PATH)
+        dead_letter_path = getattr(
+            settings, 'SURVEY_SPOOL_DEAD_LETTER_PATH', os.path.join(os.path.dirname(spool.path), 'dead_letter.jsonl')
+        )
+
+        if options['status']:
+            self._write_status(spool)
+            return
+
+        batch_size = options['batch_size']
+        self.stdout.write(f'开始写入提交缓冲队列: {spool.path}')
+        self._write_status(spool)
+
+        try:
+            while True:
+                entries = spool.fetch(batch_size)
+                if not entries:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                started = time.time()
+                try:
+                    created, failures = persist_spooled_batch(entries)
+                except TRANSIENT_DB_ERRORS as e:
+                    # 数据库暂时不可用，保留队列记录稍后重试
+                    if options['once']:
+                        raise CommandError(f'写入数据库失败：{e}')
+                    self.stderr.write(self.style.WARNING(f'写入数据库失败，{options["interval"]} 秒后重试：{e}'))
+                    close_old_connections()
+                    time.sleep(options['interval'])
+                    continue
+
+                # 先写死信文件，数据库事务提交后再从队列删除，崩溃时该批次会被重放
+                write_dead_letters(dead_letter_path, failures)
+                spool.remove([entry['seq'] for entry in entries])
+                for entry, error in failures:
+                    self.stderr.write(self.style.ERROR(
+                        f'提交 {entry["response_id"]} 无法写入，已移入死信文件 {dead_letter_path}：{error}'
+                    ))
+
+                stats = spool.stats()
+                self.stdout.write(
+                    f'写入 {created}/{len(entries)} 条提交，用时 {time.time() - started:.2f} 秒，'
+                    f'剩余 {stats["depth"]} 条，延迟 {stats["lag"]:.1f} 秒'
+                )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('已停止，未写入的提交将在下次启动时继续处理'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('队列已全部写入'))
+
+    def _write_status(self, spool):
+        """输出队列状态"""
+        stats = spool.stats()
+        self.stdout.write(f'队列深度: {stats["depth"]}')
+        self.stdout.write(f'写入延迟: {stats["lag"]:.1f} 秒')
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Django管理命令：批量生成二维码
+为问卷批量创建二维码，并将图片导出为ZIP压缩包或可打印的PDF
+"""
+
+import os
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from survey.models import Survey
+from survey.services.qrcode_batch import create_qrcodes, write_zip, write_pdf_sheet
+
+class Command(BaseCommand):
+    """批量生成二维码的管理命令"""
+    help = '为问卷批量生成二维码并导出为ZIP或PDF'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            'survey_id',
+            help='问卷ID'
+        )
+        parser.add_argument(
+            '-n', '--count',
+            type=int,
+            default=100,
+            help='生成数量，默认100'
+        )
+        parser.add_argument(
+            '-p', '--prefix',
+            default='',
+            help='二维码名称前缀，默认使用问卷标题'
+        )
+        parser.add_argument(
+            '-f', '--format',
+            choices=['zip', 'pdf'],
+            default='zip',
+            help='导出格式，默认zip'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='输出文件路径，默认 qrcodes_<问卷ID>.<格式>'
+        )
+        parser.add_argument(
+            '--base-url',
+            default=getattr(settings, 'BASE_URL', 'http://localhost:8000'),
+            help='二维码链接的站点地址，如 https://your-domain.com'
+        )
+        parser.add_argument(
+            '--columns',
+            type=int,
+            default=3,
+            help='PDF每行的二维码数量，默认3'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=4,
+            help='PDF每页的行数，默认4'
+        )
+        parser.add_argument(
+            '-w', '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='渲染图片的进程数，默认为CPU核数（1为不使用进程池）'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        try:
+            survey = Survey.objects.get(pk=options['survey_id'])
+        except (Survey.DoesNotExist, ValidationError):
+            raise CommandError('指定的问卷不存在')
+
+        count = options['count']
+        if count <= 0 or count > 10000:
+            raise CommandError('生成数量必须在1到10000之间')
+
+        start = time.monotonic()
+        qrcodes = create_qrcodes(survey, count, options['prefix'])
+        self.stdout.write(f'已创建 {len(qrcodes)} 个二维码')
+
+        fmt = options['format']
+        output = options['output'] or f'qrcodes_{survey.pk}.{fmt}'
+        with open(output, 'w+b') as f:
+            if fmt == 'pdf':
+                pages = write_pdf_sheet(
+                    f, qrcodes, options['base_url'],
+                    columns=options['columns'], rows=options['rows'], workers=options['workers']
+                )
+                self.stdout.write(f'共 {pages} 页')
+            else:
+                write_zip(f, qrcodes, options['base_url'], workers=options['workers'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'已导出到 {output}，耗时 {time.monotonic() - start:.1f} 秒'
+        ))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Django管理命令：重建问题统计汇总
+从答案数据全量重建 QuestionAggregate，也可只检查汇总数据是否一致
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from survey.models import Survey
+from survey.services.aggregates import (
+    build_survey_aggregates, diff_survey_aggregates, rebuild_survey_aggregates,
+)
+
+class Command(BaseCommand):
+    """重建问题统计汇总的管理命令"""
+    help = '从答案数据重建问卷的问题统计汇总'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            '-s', '--survey',
+            action='append',
+            default=[],
+            help='只处理指定问卷（问卷ID，可重复指定），默认处理全部问卷'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='只检查汇总数据与答案是否一致，不写入'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='读取答案时每批的数量，默认2000'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        surveys = Survey.objects.order_by('created_at')
+        if options['survey']:
+            surveys = surveys.filter(pk__in=options['survey'])
+            if not surveys.exists():
+                raise CommandError('指定的问卷不存在')
+
+        chunk_size = options['chunk_size']
+        inconsistent_count = 0
+
+        for survey in surveys.iterator():
+            if options['check']:
+                expected = build_survey_aggregates(survey, chunk_size=chunk_size)
+                mismatched = diff_survey_aggregates(survey, expected)
+                if mismatched:
+                    inconsistent_count += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{survey.title} ({survey.pk}): {len(mismatched)} 个问题统计不一致，问题ID: '
+                        f'{", ".join(map(str, sorted(mismatched)))}'
+                    ))
+                else:
+                    self.stdout.write(f'{survey.title} ({survey.pk}): 一致')
+            else:
+                count = rebuild_survey_aggregates(survey, chunk_size=chunk_size)
+                self.stdout.write(self.style.SUCCESS(f'{survey.title} ({survey.pk}): 已重建 {count} 个问题统计'))
+
+        if options['check']:
+            if inconsistent_count:
+                self.stdout.write(self.style.ERROR(f'\n共 {inconsistent_count} 个问卷的统计不一致，请执行重建'))
+            else:
+                self.stdout.write(self.style.SUCCESS('\n所有问卷统计一致'))
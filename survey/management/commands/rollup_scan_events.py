@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Django管理命令：汇总二维码扫描记录
+将扫描记录汇总为按分钟/小时/天的扫描次数，建议通过定时任务每分钟执行一次
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from survey.services.scan_analytics import rollup_scan_events, prune_scan_events
+
+class Command(BaseCommand):
+    """汇总二维码扫描记录的管理命令"""
+    help = '将二维码扫描记录汇总为按分钟/小时/天的扫描次数'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            '--since',
+            help='从该时间开始重新汇总（如 2025-01-01T08:00:00），默认从上次汇总位置继续'
+        )
+        parser.add_argument(
+            '--prune-days',
+            type=int,
+            help='删除早于该天数且已汇总的扫描记录（删除后无法再用 --since 重算这段时间）'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='读取扫描记录时每批的数量，默认5000'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('--since 格式不正确，请使用 YYYY-MM-DDTHH:MM:SS')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        counts = rollup_scan_events(since=since, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"已更新 分钟 {counts['minute']} / 小时 {counts['hour']} / 天 {counts['day']} 个时间段"
+        ))
+
+        if options['prune_days'] is not None:
+            deleted = prune_scan_events(timezone.now() - timedelta(days=options['prune_days']))
+            self.stdout.write(f'已删除 {deleted} 条扫描记录')
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Django管理命令：二维码扫描转化报告
+按时间段对比问卷所有二维码的扫描次数和问卷提交数量
+"""
+
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from survey.models import Survey, ScanRollup
+from survey.services.scan_analytics import rollup_scan_events, build_conversion_report
+
+class Command(BaseCommand):
+    """二维码扫描转化报告的管理命令"""
+    help = '按时间段输出问卷的扫描次数、提交数量和转化率'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            'survey_id',
+            help='问卷ID'
+        )
+        parser.add_argument(
+            '-g', '--granularity',
+            choices=[value for value, _ in ScanRollup.GRANULARITIES],
+            default=ScanRollup.GRANULARITY_HOUR,
+            help='时间粒度，默认hour'
+        )
+        parser.add_argument(
+            '-d', '--days',
+            type=int,
+            default=7,
+            help='统计最近多少天，默认7天'
+        )
+        parser.add_argument(
+            '--no-rollup',
+            action='store_true',
+            help='不在报告前汇总最新的扫描记录'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        try:
+            survey = Survey.objects.get(pk=options['survey_id'])
+        except (Survey.DoesNotExist, ValidationError):
+            raise CommandError('指定的问卷不存在')
+
+        if not options['no_rollup']:
+            rollup_scan_events()
+
+        until = timezone.now()
+        report = build_conversion_report(
+            survey,
+            granularity=options['granularity'],
+            since=until - timedelta(days=options['days']),
+            until=until,
+        )
+
+        time_format = '%Y-%m-%d' if options['granularity'] == ScanRollup.GRANULARITY_DAY else '%Y-%m-%d %H:%M'
+        self.stdout.write(f'{survey.title} - 最近 {options["days"]} 天扫描转化')
+        self.stdout.write(f'{"时间":<18}{"扫描":>8}{"微信内":>8}{"提交":>8}{"转化率":>10}')
+        for row in report['rows']:
+            self.stdout.write(
+                f'{row["bucket_start"].strftime(time_format):<18}{row["scans"]:>8}{row["wechat_scans"]:>8}'
+                f'{row["responses"]:>8}{self._format_rate(row["conversion_rate"]):>10}'
+            )
+
+        self.stdout.write('\n各二维码扫描次数：')
+        for item in report['qrcodes']:
+            self.stdout.write(f'  {item["name"]} ({item["short_code"]}): {item["scans"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n合计：扫描 {report["total_scans"]} 次，提交 {report["total_responses"]} 份，'
+            f'转化率 {self._format_rate(report["conversion_rate"])}'
+        ))
+
+    def _format_rate(self, rate):
+        return '-' if rate is None else f'{rate:.1f}%'
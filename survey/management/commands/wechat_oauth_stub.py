@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Django管理命令：启动微信授权接口模拟服务
+本地联调时代替 api.weixin.qq.com，需将 WECHAT_API_BASE_URL 设置为模拟服务地址
+"""
+
+from django.core.management.base import BaseCommand
+from survey.services.wechat_stub import WeChatStubServer
+
+class Command(BaseCommand):
+    """启动微信授权接口模拟服务的管理命令"""
+    help = '启动模拟微信网页授权接口的本地HTTP服务'
+
+    def add_arguments(self, parser):
+        """添加命令行参数"""
+        parser.add_argument(
+            '--host',
+            type=str,
+            default='127.0.0.1',
+            help='监听地址，默认127.0.0.1'
+        )
+        parser.add_argument(
+            '-p', '--port',
+            type=int,
+            default=8765,
+            help='监听端口，默认8765'
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.0,
+            help='每个请求的响应延迟（秒），用于模拟微信接口变慢'
+        )
+
+    def handle(self, *args, **options):
+        """命令处理逻辑"""
+        server = WeChatStubServer(options['host'], options['port'], delay=options['delay'], verbose=True)
+        self.stdout.write(self.style.SUCCESS(f'微信授权模拟服务已启动：{server.url}'))
+        self.stdout.write(f'请设置 WECHAT_API_BASE_URL={server.url}，按 Ctrl+C 停止')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write('模拟服务已停止')
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0014_alter_answer_options_alter_option_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_count', models.IntegerField(default=0, verbose_name='回答数量')),
+                ('option_counts', models.JSONField(blank=True, default=dict, help_text='选择题各选项值被选择的次数（JSON格式）', verbose_name='选项计数')),
+                ('rating_histogram', models.JSONField(blank=True, default=dict, help_text='评分题各分值的次数（JSON格式）', verbose_name='评分分布')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='survey.question', verbose_name='问题')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_aggregates', to='survey.survey', verbose_name='问卷')),
+            ],
+            options={
+                'verbose_name': '问题统计',
+                'verbose_name_plural': '问题统计',
+                'unique_together': {('survey', 'question')},
+            },
+        ),
+    ]
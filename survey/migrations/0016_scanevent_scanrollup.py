@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-17 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0015_questionaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_code', models.CharField(max_length=20, verbose_name='短代码')),
+                ('scanned_at', models.DateTimeField(db_index=True, verbose_name='扫描时间')),
+                ('is_wechat', models.BooleanField(default=False, verbose_name='微信内扫描')),
+                ('ip_bucket', models.CharField(blank=True, help_text='IPv4按/24、IPv6按/48记录，不保存完整IP', max_length=50, verbose_name='IP网段')),
+                ('qrcode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_events', to='survey.qrcode', verbose_name='二维码')),
+            ],
+            options={
+                'verbose_name': '扫描记录',
+                'verbose_name_plural': '扫描记录',
+                'indexes': [models.Index(fields=['qrcode', 'scanned_at'], name='survey_scan_qrcode__6b2d87_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScanRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', '分钟'), ('hour', '小时'), ('day', '天')], max_length=10, verbose_name='时间粒度')),
+                ('bucket_start', models.DateTimeField(verbose_name='时间段开始')),
+                ('scan_count', models.IntegerField(default=0, verbose_name='扫描次数')),
+                ('wechat_count', models.IntegerField(default=0, verbose_name='微信内扫描次数')),
+                ('qrcode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_rollups', to='survey.qrcode', verbose_name='二维码')),
+            ],
+            options={
+                'verbose_name': '扫描汇总',
+                'verbose_name_plural': '扫描汇总',
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='survey_scan_granula_86e3c0_idx')],
+                'unique_together': {('qrcode', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
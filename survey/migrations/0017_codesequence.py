@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0016_scanevent_scanrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='序列名称')),
+                ('next_value', models.BigIntegerField(default=0, verbose_name='下一个序号')),
+            ],
+            options={
+                'verbose_name': '短代码序列',
+                'verbose_name_plural': '短代码序列',
+            },
+        ),
+    ]
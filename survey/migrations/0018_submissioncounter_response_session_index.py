@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 18:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0017_codesequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identity', models.CharField(help_text='user:<用户ID>、openid:<微信OpenID> 或 session:<会话标识>', max_length=150, verbose_name='提交者标识')),
+                ('count', models.IntegerField(default=0, verbose_name='已提交次数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '提交次数计数',
+                'verbose_name_plural': '提交次数计数',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['survey', 'session_key'], name='survey_resp_survey__99b9e8_idx'),
+        ),
+        migrations.AddField(
+            model_name='submissioncounter',
+            name='survey',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_counters', to='survey.survey', verbose_name='问卷'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='submissioncounter',
+            unique_together={('survey', 'identity')},
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_submit_time(apps, schema_editor):
+    """已有回答的入库时间取提交时间"""
+    Response = apps.get_model('survey', 'Response')
+    Response.objects.update(created_at=models.F('submit_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0018_submissioncounter_response_session_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, help_text='写入数据库的时间；经缓冲队列写入时晚于提交时间，增量导出按此时间进行', verbose_name='入库时间'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_submit_time, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['survey', 'created_at'], name='survey_resp_survey__2768b9_idx'),
+        ),
+    ]
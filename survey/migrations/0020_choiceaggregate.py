@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-17 18:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_choice_counts(apps, schema_editor):
+    """将原来保存在JSON字段中的选项计数、评分分布拆分为选项统计行"""
+    QuestionAggregate = apps.get_model('survey', 'QuestionAggregate')
+    ChoiceAggregate = apps.get_model('survey', 'ChoiceAggregate')
+
+    rows = []
+    for aggregate in QuestionAggregate.objects.iterator():
+        for counts in (aggregate.option_counts, aggregate.rating_histogram):
+            for value, count in (counts or {}).items():
+                rows.append(ChoiceAggregate(
+                    survey_id=aggregate.survey_id,
+                    question_id=aggregate.question_id,
+                    value=str(value)[:100],
+                    count=count,
+                ))
+        if len(rows) >= 1000:
+            ChoiceAggregate.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    ChoiceAggregate.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0019_response_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(help_text='选择题为选项值，评分题为分值', max_length=100, verbose_name='选项值')),
+                ('count', models.IntegerField(default=0, verbose_name='次数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_aggregates', to='survey.question', verbose_name='问题')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_aggregates', to='survey.survey', verbose_name='问卷')),
+            ],
+            options={
+                'verbose_name': '选项统计',
+                'verbose_name_plural': '选项统计',
+                'unique_together': {('survey', 'question', 'value')},
+            },
+        ),
+        migrations.RunPython(copy_choice_counts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='questionaggregate',
+            name='option_counts',
+        ),
+        migrations.RemoveField(
+            model_name='questionaggregate',
+            name='rating_histogram',
+        ),
+    ]
@@ -8,6 +8,10 @@ from .survey_question import SurveyQuestion
 from .response import Response
 from .answer import Answer
 from .qrcode import QRCode
+from .aggregate import QuestionAggregate, ChoiceAggregate
+from .scan import ScanEvent, ScanRollup
+from .code_sequence import CodeSequence
+from .submission_counter import SubmissionCounter
 
 __all__ = [
     'Survey',
@@ -18,4 +22,10 @@ __all__ = [
     'Response',
     'Answer',
     'QRCode',
+    'QuestionAggregate',
+    'ChoiceAggregate',
+    'ScanEvent',
+    'ScanRollup',
+    'CodeSequence',
+    'SubmissionCounter',
 ]
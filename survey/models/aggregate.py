@@ -0,0 +1,65 @@
+from django.db import models
+
+
+class QuestionAggregate(models.Model):
+    """问题统计汇总 - 按问卷、问题在提交时用 F() 增量维护回答数量"""
+    survey = models.ForeignKey(
+        'Survey',
+        on_delete=models.CASCADE,
+        related_name='question_aggregates',
+        verbose_name="问卷",
+        db_index=True
+    )
+    question = models.ForeignKey(
+        'Question',
+        on_delete=models.CASCADE,
+        related_name='aggregates',
+        verbose_name="问题"
+    )
+    answer_count = models.IntegerField(
+        default=0,
+        verbose_name="回答数量"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "问题统计"
+        verbose_name_plural = "问题统计"
+        unique_together = ('survey', 'question')
+
+    def __str__(self):
+        return f"{self.survey_id} - {self.question_id}: {self.answer_count}"
+
+
+class ChoiceAggregate(models.Model):
+    """选项统计汇总 - 选择题每个选项、评分题每个分值一行，提交时用 F() 增量维护"""
+    survey = models.ForeignKey(
+        'Survey',
+        on_delete=models.CASCADE,
+        related_name='choice_aggregates',
+        verbose_name="问卷"
+    )
+    question = models.ForeignKey(
+        'Question',
+        on_delete=models.CASCADE,
+        related_name='choice_aggregates',
+        verbose_name="问题"
+    )
+    value = models.CharField(
+        max_length=100,
+        verbose_name="选项值",
+        help_text="选择题为选项值，评分题为分值"
+    )
+    count = models.IntegerField(
+        default=0,
+        verbose_name="次数"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "选项统计"
+        verbose_name_plural = "选项统计"
+        unique_together = ('survey', 'question', 'value')
+
+    def __str__(self):
+        return f"{self.survey_id} - {self.question_id} [{self.value}]: {self.count}"
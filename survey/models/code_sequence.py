@@ -0,0 +1,22 @@
+# survey/models/code_sequence.py
+from django.db import models
+
+
+class CodeSequence(models.Model):
+    """短代码序列 - 短代码分配器按批预留序号，序号经置换后编码为短代码"""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="序列名称"
+    )
+    next_value = models.BigIntegerField(
+        default=0,
+        verbose_name="下一个序号"
+    )
+
+    class Meta:
+        verbose_name = "短代码序列"
+        verbose_name_plural = "短代码序列"
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
@@ -85,6 +85,12 @@ class Question(models.Model):
     
     def get_option_label(self, value):
         """根据选项值获取标签"""
+        if 'options' in getattr(self, '_prefetched_objects_cache', {}):
+            # 选项已预加载（如后台列表），直接在内存中查找
+            for option in self.options.all():
+                if option.value == value:
+                    return option.label
+            return value
         try:
             option = self.options.get(value=value)
             return option.label
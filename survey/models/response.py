@@ -56,6 +56,11 @@ class Response(models.Model):
         verbose_name="提交时间",
         db_index=True
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="入库时间",
+        help_text="写入数据库的时间；经缓冲队列写入时晚于提交时间，增量导出按此时间进行"
+    )
     ip_address = models.GenericIPAddressField(
         null=True,
         blank=True,
@@ -79,6 +84,8 @@ class Response(models.Model):
         indexes = [
             models.Index(fields=['survey', 'submit_time']),
             models.Index(fields=['wechat_openid', 'survey']),
+            models.Index(fields=['survey', 'session_key']),
+            models.Index(fields=['survey', 'created_at']),
         ]
     
     def __str__(self):
@@ -0,0 +1,79 @@
+# survey/models/scan.py
+from django.db import models
+
+
+class ScanEvent(models.Model):
+    """二维码扫描记录 - 只追加，由扫描缓冲批量写入"""
+    qrcode = models.ForeignKey(
+        'QRCode',
+        on_delete=models.CASCADE,
+        related_name='scan_events',
+        verbose_name="二维码"
+    )
+    short_code = models.CharField(
+        max_length=20,
+        verbose_name="短代码"
+    )
+    scanned_at = models.DateTimeField(
+        verbose_name="扫描时间",
+        db_index=True
+    )
+    is_wechat = models.BooleanField(
+        default=False,
+        verbose_name="微信内扫描"
+    )
+    ip_bucket = models.CharField(
+        max_length=50,
+        blank=True,
+        verbose_name="IP网段",
+        help_text="IPv4按/24、IPv6按/48记录，不保存完整IP"
+    )
+
+    class Meta:
+        verbose_name = "扫描记录"
+        verbose_name_plural = "扫描记录"
+        indexes = [
+            models.Index(fields=['qrcode', 'scanned_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.short_code} - {self.scanned_at}"
+
+
+class ScanRollup(models.Model):
+    """扫描次数按分钟/小时/天汇总"""
+    GRANULARITY_MINUTE = 'minute'
+    GRANULARITY_HOUR = 'hour'
+    GRANULARITY_DAY = 'day'
+
+    GRANULARITIES = (
+        (GRANULARITY_MINUTE, '分钟'),
+        (GRANULARITY_HOUR, '小时'),
+        (GRANULARITY_DAY, '天'),
+    )
+
+    qrcode = models.ForeignKey(
+        'QRCode',
+        on_delete=models.CASCADE,
+        related_name='scan_rollups',
+        verbose_name="二维码"
+    )
+    granularity = models.CharField(
+        max_length=10,
+        choices=GRANULARITIES,
+        verbose_name="时间粒度"
+    )
+    bucket_start = models.DateTimeField(verbose_name="时间段开始")
+    scan_count = models.IntegerField(default=0, verbose_name="扫描次数")
+    wechat_count = models.IntegerField(default=0, verbose_name="微信内扫描次数")
+
+    class Meta:
+        verbose_name = "扫描汇总"
+        verbose_name_plural = "扫描汇总"
+        unique_together = ('qrcode', 'granularity', 'bucket_start')
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.qrcode_id} {self.granularity} {self.bucket_start}: {self.scan_count}"
@@ -0,0 +1,30 @@
+# survey/models/submission_counter.py
+from django.db import models
+
+
+class SubmissionCounter(models.Model):
+    """提交次数计数 - 缓存不在进程间共享或不可用时，每人提交限制使用该表计数"""
+    survey = models.ForeignKey(
+        'Survey',
+        on_delete=models.CASCADE,
+        related_name='submission_counters',
+        verbose_name="问卷"
+    )
+    identity = models.CharField(
+        max_length=150,
+        verbose_name="提交者标识",
+        help_text="user:<用户ID>、openid:<微信OpenID> 或 session:<会话标识>"
+    )
+    count = models.IntegerField(
+        default=0,
+        verbose_name="已提交次数"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "提交次数计数"
+        verbose_name_plural = "提交次数计数"
+        unique_together = ('survey', 'identity')
+
+    def __str__(self):
+        return f"{self.survey_id} - {self.identity}: {self.count}"
@@ -3,7 +3,7 @@ from rest_framework import serializers
 from ..models import Answer
 
 class AnswerSerializer(serializers.ModelSerializer):
-    question_id = serializers.UUIDField(write_only=True)
+    question_id = serializers.IntegerField(write_only=True)
     
     class Meta:
         model = Answer
@@ -1,10 +1,12 @@
 # survey/serializers/qrcode_serializer.py
 from rest_framework import serializers
 from ..models import QRCode
+from ..services.scan_counter import scan_counter
 
 class QRCodeSerializer(serializers.ModelSerializer):
     survey_url = serializers.SerializerMethodField()
     qr_code_url = serializers.SerializerMethodField()
+    scan_count = serializers.SerializerMethodField()
     
     class Meta:
         model = QRCode
@@ -15,6 +17,9 @@ class QRCodeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         return request.build_absolute_uri(f'/survey/{obj.survey.id}/')
     
+    def get_scan_count(self, obj):
+        return scan_counter.get_live_count(obj)
+    
     def get_qr_code_url(self, obj):
         request = self.context.get('request')
         return request.build_absolute_uri(f'/qrcode/{obj.short_code}/image/')
@@ -1,6 +1,7 @@
 # survey/serializers/response_serializer.py
 from rest_framework import serializers
-from ..models import Response, Question
+from ..models import Response
+from ..services.submission import create_submission
 from .answer_serializer import AnswerSerializer
 
 class ResponseSerializer(serializers.ModelSerializer):
@@ -14,15 +15,15 @@ class ResponseSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         answers_data = validated_data.pop('answers')
-        response = Response.objects.create(**validated_data)
+        survey = validated_data.pop('survey')
+        answers = [
+            {
+                'question_id': answer_data['question_id'],
+                'answer_text': answer_data.get('answer_text', ''),
+                'answer_choice': answer_data.get('answer_choice', []),
+            }
+            for answer_data in answers_data
+        ]
         
-        for answer_data in answers_data:
-            question_id = answer_data.pop('question_id')
-            question = Question.objects.get(id=question_id)
-            Answer.objects.create(
-                response=response,
-                question=question,
-                **answer_data
-            )
-        
-        return response
+        # 回答和全部答案在一个事务内批量写入
+        return create_submission(survey, validated_data, answers)
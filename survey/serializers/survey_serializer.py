@@ -1,10 +1,9 @@
-# survey/serializers/survey_serializer.py
 from rest_framework import serializers
 from ..models import Survey
-from .question_serializer import QuestionSerializer
+from ..services.compiled_survey import get_compiled_survey
 
 class SurveySerializer(serializers.ModelSerializer):
-    questions = QuestionSerializer(many=True, read_only=True)
+    questions = serializers.SerializerMethodField()
     response_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -13,5 +12,21 @@ class SurveySerializer(serializers.ModelSerializer):
                  'questions', 'response_count', 'is_active',
                  'start_date', 'end_date']
     
+    def get_questions(self, obj):
+        """从问卷编译快照获取问题列表"""
+        return [
+            {
+                'id': item['id'],
+                'question_id': item['question']['id'],
+                'text': item['question']['text'],
+                'question_type': item['question']['question_type'],
+                'order': item['order'],
+                'is_required': item['is_required'],
+                'category': item['category'],
+                'options': item['question']['options'],
+            }
+            for item in get_compiled_survey(obj).questions
+        ]
+    
     def get_response_count(self, obj):
         return obj.responses.count()
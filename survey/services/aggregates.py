@@ -0,0 +1,185 @@
+# survey/services/aggregates.py
+"""
+问题统计汇总维护
+
+提交时在同一事务内用 F() 增量更新 QuestionAggregate（每题回答数）和
+ChoiceAggregate（每个选项/分值的次数），只更新本次提交涉及的行，
+同一问卷的并发提交不会互相等待整份问卷的汇总行；删除回答时反向扣减。
+统计接口只需读取汇总表；rebuild_survey_aggregates 命令使用 build_survey_aggregates 从答案全量重建。
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import Question, Answer, QuestionAggregate, ChoiceAggregate
+
+
+CHOICE_QUESTION_TYPES = (
+    Question.QUESTION_TYPE_SINGLE_CHOICE,
+    Question.QUESTION_TYPE_MULTIPLE_CHOICE,
+)
+
+VALUE_MAX_LENGTH = ChoiceAggregate._meta.get_field('value').max_length
+
+# 每条UPDATE最多合并的选项条件数
+UPDATE_BATCH_SIZE = 200
+
+
+def count_answers(question_types, answers):
+    """
+    统计一组答案，返回 (Counter{问题ID: 回答数}, Counter{(问题ID, 选项值): 次数})
+
+    answers: [(问题ID, answer_choice), ...]
+    """
+    question_counts = Counter()
+    value_counts = Counter()
+    for question_id, answer_choice in answers:
+        question_counts[question_id] += 1
+        question_type = question_types.get(question_id)
+        choices = answer_choice if isinstance(answer_choice, list) else [answer_choice]
+        if question_type in CHOICE_QUESTION_TYPES:
+            for choice in choices:
+                value_counts[(question_id, str(choice)[:VALUE_MAX_LENGTH])] += 1
+        elif question_type == Question.QUESTION_TYPE_RATING and choices:
+            value_counts[(question_id, str(choices[0])[:VALUE_MAX_LENGTH])] += 1
+    return question_counts, value_counts
+
+
+def _group_by_amount(counts):
+    """按增量分组（一次提交中增量都是1，每组合并为一条UPDATE）"""
+    groups = defaultdict(list)
+    for key, amount in counts.items():
+        groups[amount].append(key)
+    return groups.items()
+
+
+def apply_counts(survey_id, question_counts, value_counts, sign=1):
+    """
+    将计数累加（sign=1）或扣减（sign=-1）到问卷的汇总行（需在写入/删除答案的事务内调用）
+
+    汇总行不存在时先创建，再用 F() 原子更新，并发提交不会互相覆盖
+    """
+    now = timezone.now()
+    if sign > 0:
+        QuestionAggregate.objects.bulk_create(
+            [QuestionAggregate(survey_id=survey_id, question_id=question_id) for question_id in question_counts],
+            ignore_conflicts=True
+        )
+        ChoiceAggregate.objects.bulk_create(
+            [
+                ChoiceAggregate(survey_id=survey_id, question_id=question_id, value=value)
+                for question_id, value in value_counts
+            ],
+            ignore_conflicts=True
+        )
+
+    for amount, question_ids in _group_by_amount(question_counts):
+        QuestionAggregate.objects.filter(survey_id=survey_id, question_id__in=question_ids).update(
+            answer_count=F('answer_count') + sign * amount,
+            updated_at=now,
+        )
+
+    for amount, keys in _group_by_amount(value_counts):
+        for start in range(0, len(keys), UPDATE_BATCH_SIZE):
+            condition = Q()
+            for question_id, value in keys[start:start + UPDATE_BATCH_SIZE]:
+                condition |= Q(question_id=question_id, value=value)
+            ChoiceAggregate.objects.filter(condition, survey_id=survey_id).update(
+                count=F('count') + sign * amount,
+                updated_at=now,
+            )
+
+
+def update_question_aggregates(survey_answers):
+    """
+    增量更新问题统计（需在写入答案的事务内调用）
+
+    survey_answers: {问卷ID: [答案字典, ...]}，答案字典包含 question_id 和 answer_choice
+    """
+    question_ids = {answer['question_id'] for answers in survey_answers.values() for answer in answers}
+    if not question_ids:
+        return
+    question_types = dict(
+        Question.objects.filter(pk__in=question_ids).values_list('pk', 'question_type')
+    )
+
+    for survey_id, answers in survey_answers.items():
+        question_counts, value_counts = count_answers(
+            question_types, [(answer['question_id'], answer['answer_choice']) for answer in answers]
+        )
+        apply_counts(survey_id, question_counts, value_counts)
+
+
+def remove_answers_from_aggregates(answers):
+    """
+    从统计中扣减即将删除的答案（需在删除答案的事务内调用）
+
+    answers: Answer 查询集
+    """
+    survey_answers = defaultdict(list)
+    question_types = {}
+    for survey_id, question_id, question_type, answer_choice in answers.order_by().values_list(
+        'response__survey_id', 'question_id', 'question__question_type', 'answer_choice'
+    ):
+        survey_answers[survey_id].append((question_id, answer_choice))
+        question_types[question_id] = question_type
+
+    for survey_id, survey_answer_list in survey_answers.items():
+        question_counts, value_counts = count_answers(question_types, survey_answer_list)
+        apply_counts(survey_id, question_counts, value_counts, sign=-1)
+
+
+def build_survey_aggregates(survey, chunk_size=2000):
+    """
+    从答案全量计算问卷的问题统计（不写入数据库）
+
+    返回 (Counter{问题ID: 回答数}, Counter{(问题ID, 选项值): 次数})
+    """
+    question_types = dict(
+        survey.survey_questions.values_list('question_id', 'question__question_type')
+    )
+    answers = Answer.objects.filter(
+        response__survey=survey, question_id__in=list(question_types)
+    ).order_by().values_list('question_id', 'answer_choice')
+    return count_answers(question_types, answers.iterator(chunk_size=chunk_size))
+
+
+def diff_survey_aggregates(survey, expected):
+    """对比已保存的统计和重新计算的结果，返回不一致的问题ID列表"""
+    expected_questions, expected_values = expected
+    stored_questions = dict(survey.question_aggregates.values_list('question_id', 'answer_count'))
+    stored_values = {
+        (question_id, value): count
+        for question_id, value, count in survey.choice_aggregates.values_list('question_id', 'value', 'count')
+    }
+
+    mismatched = set()
+    for question_id in set(stored_questions) | set(expected_questions):
+        if stored_questions.get(question_id, 0) != expected_questions.get(question_id, 0):
+            mismatched.add(question_id)
+    for key in set(stored_values) | set(expected_values):
+        if stored_values.get(key, 0) != expected_values.get(key, 0):
+            mismatched.add(key[0])
+    return list(mismatched)
+
+
+def rebuild_survey_aggregates(survey, chunk_size=2000):
+    """重建问卷的问题统计，返回重建的问题数量"""
+    with transaction.atomic():
+        # 锁住现有汇总行，防止重建期间的增量更新被覆盖
+        list(QuestionAggregate.objects.select_for_update().filter(survey=survey))
+        list(ChoiceAggregate.objects.select_for_update().filter(survey=survey))
+        question_counts, value_counts = build_survey_aggregates(survey, chunk_size=chunk_size)
+        QuestionAggregate.objects.filter(survey=survey).delete()
+        ChoiceAggregate.objects.filter(survey=survey).delete()
+        QuestionAggregate.objects.bulk_create([
+            QuestionAggregate(survey=survey, question_id=question_id, answer_count=count)
+            for question_id, count in question_counts.items()
+        ], batch_size=1000)
+        ChoiceAggregate.objects.bulk_create([
+            ChoiceAggregate(survey=survey, question_id=question_id, value=value, count=count)
+            for (question_id, value), count in value_counts.items()
+        ], batch_size=1000)
+    return len(question_counts)
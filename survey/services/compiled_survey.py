@@ -0,0 +1,102 @@
+# survey/services/compiled_survey.py
+"""
+问卷编译快照
+
+将问卷的问题、选项、分类、必填标记按顺序编译为纯数据结构并存入缓存，
+详情页和API直接读取快照，避免每次访问逐题查询数据库。
+
+快照以 Survey.updated_at 作为版本号：问卷、问卷问题、问题、选项变更时，
+信号处理函数会刷新所属问卷的 updated_at，旧版本快照自然失效。
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+SNAPSHOT_KEY_PREFIX = 'survey:compiled'
+
+
+class CompiledSurvey:
+    """编译后的问卷快照（仅包含可序列化的基础数据）"""
+
+    def __init__(self, survey_id, version, questions):
+        self.survey_id = survey_id
+        self.version = version
+        # 每一项结构：
+        # {
+        #     'id': 问卷问题ID, 'order': 排序, 'is_required': 是否必填,
+        #     'category': {'id', 'name'} 或 None,
+        #     'question': {'id', 'text', 'question_type', 'options': [{'value', 'label'}]},
+        # }
+        self.questions = questions
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def categories(self):
+        """问卷中出现的分类（按首次出现顺序去重）"""
+        categories = []
+        category_ids = set()
+        for item in self.questions:
+            category = item['category']
+            if category and category['id'] not in category_ids:
+                category_ids.add(category['id'])
+                categories.append(category)
+        return categories
+
+
+def get_survey_version(survey):
+    """获取问卷快照版本号"""
+    if survey.updated_at is None:
+        return '0'
+    return survey.updated_at.strftime('%Y%m%d%H%M%S%f')
+
+
+def get_snapshot_key(survey):
+    """获取问卷快照的缓存键"""
+    return f'{SNAPSHOT_KEY_PREFIX}:{survey.pk}:{get_survey_version(survey)}'
+
+
+def compile_survey(survey):
+    """从数据库编译问卷快照"""
+    survey_questions = survey.survey_questions.select_related(
+        'question', 'question__category', 'category'
+    ).prefetch_related('question__options').order_by('order')
+
+    questions = []
+    for sq in survey_questions:
+        question = sq.question
+        category = sq.category or question.category
+        questions.append({
+            'id': sq.id,
+            'order': sq.order,
+            'is_required': sq.is_required,
+            'category': {'id': category.id, 'name': category.name} if category else None,
+            'question': {
+                'id': question.id,
+                'text': question.text,
+                'question_type': question.question_type,
+                'options': [
+                    {'value': option.value, 'label': option.label}
+                    for option in question.options.all()
+                ],
+            },
+        })
+
+    return CompiledSurvey(str(survey.pk), get_survey_version(survey), questions)
+
+
+def get_compiled_survey(survey):
+    """获取问卷快照，缓存未命中时重新编译"""
+    key = get_snapshot_key(survey)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_survey(survey)
+        timeout = getattr(settings, 'SURVEY_SNAPSHOT_TIMEOUT', 3600)
+        cache.set(key, compiled, timeout)
+    return compiled
+
+
+def invalidate_compiled_survey(survey):
+    """删除问卷当前版本的快照"""
+    cache.delete(get_snapshot_key(survey))
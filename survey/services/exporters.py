@@ -0,0 +1,284 @@
+# survey/services/exporters.py
+"""
+问卷回答导出
+
+每个回答一行、每个问卷问题一列（按问卷顺序），选项值转换为选项标签。
+回答按 (created_at, id) 键集分页读取（入库时间单调递增，缓冲队列晚写入的回答
+也不会落在增量导出的水位之前），每批只加载本批回答的答案，
+无论回答数量多少内存占用都是有界的；CSV/JSONL 以流的方式输出，
+Excel 使用 openpyxl 只写模式写入临时文件；Parquet/Feather（需安装 pyarrow）
+按批转换为 Arrow RecordBatch 写出，保留列类型，便于 pandas 直接读取。
+"""
+import csv
+import json
+import tempfile
+
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Question, Answer
+from .compiled_survey import get_compiled_survey
+
+
+CHOICE_QUESTION_TYPES = (
+    Question.QUESTION_TYPE_SINGLE_CHOICE,
+    Question.QUESTION_TYPE_MULTIPLE_CHOICE,
+)
+
+RESPONSE_FIELDS = ['id', 'submit_time', 'wechat_nickname', 'wechat_openid', 'completion_time', 'ip_address']
+RESPONSE_HEADERS = ['回答ID', '提交时间', '微信昵称', '微信OpenID', '完成用时（秒）', 'IP地址']
+
+
+class Echo:
+    """只实现 write 的伪文件对象，供 csv.writer 逐行输出"""
+
+    def write(self, value):
+        return value
+
+
+class ResponseExporter:
+    """按批读取问卷回答及答案"""
+
+    def __init__(self, survey, chunk_size=2000, since=None, until=None):
+        self.survey = survey
+        self.chunk_size = chunk_size
+        # 按入库时间筛选：since 之后（不含），until 之前（含）
+        self.since = since
+        self.until = until
+        self.questions = get_compiled_survey(survey).questions
+        # 已读取的最后一个回答的入库时间，可作为下次增量导出的 since 水位
+        self.watermark = None
+
+    @property
+    def headers(self):
+        """表头：回答基本信息 + 每个问题一列"""
+        return RESPONSE_HEADERS + [
+            f"{index}. {item['question']['text'][:50]}"
+            for index, item in enumerate(self.questions, 1)
+        ]
+
+    def iter_batches(self):
+        """按 (created_at, id) 键集分页，yield [(回答字典, {问题ID: (answer_text, answer_choice)}), ...]"""
+        responses = self.survey.responses.order_by('created_at', 'id')
+        if self.since is not None:
+            responses = responses.filter(created_at__gt=self.since)
+        if self.until is not None:
+            responses = responses.filter(created_at__lte=self.until)
+
+        last = None
+        while True:
+            page = responses
+            if last is not None:
+                page = page.filter(
+                    Q(created_at__gt=last['created_at']) |
+                    Q(created_at=last['created_at'], id__gt=last['id'])
+                )
+            rows = list(page.values(*RESPONSE_FIELDS, 'created_at')[:self.chunk_size])
+            if not rows:
+                return
+
+            answers = {}
+            for response_id, question_id, answer_text, answer_choice in Answer.objects.filter(
+                response_id__in=[row['id'] for row in rows]
+            ).order_by().values_list('response_id', 'question_id', 'answer_text', 'answer_choice'):
+                answers.setdefault(response_id, {})[question_id] = (answer_text, answer_choice)
+
+            last = rows[-1]
+            self.watermark = last['created_at']
+            yield [(row, answers.get(row['id'], {})) for row in rows]
+
+    def iter_records(self):
+        """逐条 yield (回答字典, {问题ID: (answer_text, answer_choice)})"""
+        for batch in self.iter_batches():
+            yield from batch
+
+    def iter_rows(self):
+        """逐行 yield 导出用的显示值列表（不含表头）"""
+        option_labels = {
+            item['question']['id']: {option['value']: option['label'] for option in item['question']['options']}
+            for item in self.questions
+        }
+        for response, answers in self.iter_records():
+            row = [
+                str(response['id']),
+                timezone.localtime(response['submit_time']).strftime('%Y-%m-%d %H:%M:%S'),
+                response['wechat_nickname'],
+                response['wechat_openid'],
+                response['completion_time'],
+                response['ip_address'] or '',
+            ]
+            for item in self.questions:
+                question = item['question']
+                answer = answers.get(question['id'])
+                row.append(format_answer(question, answer, option_labels[question['id']]) if answer else '')
+            yield row
+
+
+def format_answer(question, answer, labels):
+    """将答案转换为显示文本"""
+    answer_text, answer_choice = answer
+    if answer_text:
+        return answer_text
+    choices = answer_choice if isinstance(answer_choice, list) else [answer_choice]
+    if question['question_type'] in CHOICE_QUESTION_TYPES:
+        return '; '.join(labels.get(choice, str(choice)) for choice in choices)
+    return '; '.join(str(choice) for choice in choices)
+
+
+def stream_csv(exporter):
+    """逐行生成CSV内容（带BOM，便于Excel打开中文）"""
+    writer = csv.writer(Echo())
+    yield '\ufeff'
+    yield writer.writerow(exporter.headers)
+    for row in exporter.iter_rows():
+        yield writer.writerow(row)
+
+
+def stream_jsonl(exporter):
+    """逐行生成JSON Lines内容，键为表头"""
+    headers = exporter.headers
+    for row in exporter.iter_rows():
+        yield json.dumps(dict(zip(headers, row)), ensure_ascii=False) + '\n'
+
+
+def write_xlsx(exporter, fileobj):
+    """使用 openpyxl 只写模式写入Excel"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='回答导出')
+    ws.append(exporter.headers)
+    for row in exporter.iter_rows():
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def write_xlsx_tempfile(exporter):
+    """写入临时文件并返回已定位到开头的文件对象（关闭后自动删除）"""
+    tmp = tempfile.TemporaryFile(suffix='.xlsx')
+    write_xlsx(exporter, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def build_arrow_schema(exporter):
+    """
+    Arrow 列定义：单选题为字典（categorical）类型、多选题为字符串列表、
+    评分题为整数、提交时间为带时区的时间戳，其余为字符串
+    """
+    import pyarrow as pa
+
+    fields = [
+        pa.field('response_id', pa.string()),
+        pa.field('submit_time', pa.timestamp('us', tz='UTC')),
+        pa.field('wechat_openid', pa.string()),
+        pa.field('completion_time', pa.int32()),
+    ]
+    for name, item in zip(exporter.headers[len(RESPONSE_HEADERS):], exporter.questions):
+        question_type = item['question']['question_type']
+        if question_type == Question.QUESTION_TYPE_SINGLE_CHOICE:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        elif question_type == Question.QUESTION_TYPE_MULTIPLE_CHOICE:
+            arrow_type = pa.list_(pa.string())
+        elif question_type == Question.QUESTION_TYPE_RATING:
+            arrow_type = pa.int8()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _answer_choices(answer):
+    if answer is None:
+        return []
+    answer_choice = answer[1]
+    return answer_choice if isinstance(answer_choice, list) else [answer_choice]
+
+
+def _build_question_array(item, records):
+    """将一批回答中某个问题的答案转换为 Arrow 数组"""
+    import pyarrow as pa
+
+    question = item['question']
+    answers = [answers.get(question['id']) for _, answers in records]
+    question_type = question['question_type']
+
+    if question_type == Question.QUESTION_TYPE_SINGLE_CHOICE:
+        # 字典固定为全部选项标签，各批次共用同一字典
+        values = [option['value'] for option in question['options']]
+        index = {value: i for i, value in enumerate(values)}
+        indices = []
+        for answer in answers:
+            choices = _answer_choices(answer)
+            indices.append(index.get(str(choices[0])) if choices else None)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()),
+            pa.array([option['label'] for option in question['options']], type=pa.string())
+        )
+
+    if question_type == Question.QUESTION_TYPE_MULTIPLE_CHOICE:
+        labels = {option['value']: option['label'] for option in question['options']}
+        return pa.array([
+            [labels.get(str(choice), str(choice)) for choice in _answer_choices(answer)] if answer else None
+            for answer in answers
+        ], type=pa.list_(pa.string()))
+
+    if question_type == Question.QUESTION_TYPE_RATING:
+        ratings = []
+        for answer in answers:
+            choices = _answer_choices(answer)
+            ratings.append(int(choices[0]) if choices and str(choices[0]).isdigit() else None)
+        return pa.array(ratings, type=pa.int8())
+
+    return pa.array([
+        format_answer(question, answer, {}) if answer else None
+        for answer in answers
+    ], type=pa.string())
+
+
+def iter_arrow_batches(exporter, schema):
+    """按批 yield Arrow RecordBatch"""
+    import pyarrow as pa
+
+    for records in exporter.iter_batches():
+        columns = [
+            pa.array([str(response['id']) for response, _ in records], type=pa.string()),
+            pa.array([response['submit_time'] for response, _ in records], type=pa.timestamp('us', tz='UTC')),
+            pa.array([response['wechat_openid'] for response, _ in records], type=pa.string()),
+            pa.array([response['completion_time'] for response, _ in records], type=pa.int32()),
+        ]
+        columns += [_build_question_array(item, records) for item in exporter.questions]
+        yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def write_columnar(exporter, fileobj, fmt='parquet'):
+    """
+    按批写出 Parquet 或 Feather（Arrow IPC）文件
+
+    返回 (写入的回答数量, 最后一个回答的入库时间)，入库时间可作为下次增量导出的 since 水位
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = build_arrow_schema(exporter)
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(fileobj, schema)
+    else:
+        writer = pa.ipc.new_file(fileobj, schema)
+
+    count = 0
+    try:
+        for batch in iter_arrow_batches(exporter, schema):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    finally:
+        writer.close()
+    return count, exporter.watermark
+
+
+def write_columnar_tempfile(exporter, fmt='parquet'):
+    """写入临时文件并返回已定位到开头的文件对象（关闭后自动删除）"""
+    tmp = tempfile.TemporaryFile(suffix=f'.{fmt}')
+    write_columnar(exporter, tmp, fmt)
+    tmp.seek(0)
+    return tmp
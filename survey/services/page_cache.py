@@ -0,0 +1,47 @@
+# survey/services/page_cache.py
+"""
+问卷填写页整页缓存
+
+问卷页面对所有填写者几乎相同，只有CSRF令牌、开始填写时间和提交令牌不同。
+渲染时先写入占位符，缓存按问卷版本和微信/非微信两种页面分别存储，
+每次请求只需把占位符替换为当前请求的值。
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .compiled_survey import get_survey_version
+
+
+PAGE_KEY_PREFIX = 'survey:page'
+
+CSRF_TOKEN_PLACEHOLDER = '__SURVEY_CSRF_TOKEN__'
+START_TIME_PLACEHOLDER = '__SURVEY_START_TIME__'
+SUBMIT_TOKEN_PLACEHOLDER = '__SURVEY_SUBMIT_TOKEN__'
+
+
+def get_page_key(survey, is_wechat):
+    """获取问卷页面的缓存键"""
+    variant = 'wechat' if is_wechat else 'browser'
+    return f'{PAGE_KEY_PREFIX}:{survey.pk}:{get_survey_version(survey)}:{variant}'
+
+
+def get_cached_page(survey, is_wechat):
+    """获取缓存的页面模板（含占位符），未命中返回None"""
+    return cache.get(get_page_key(survey, is_wechat))
+
+
+def set_cached_page(survey, is_wechat, html):
+    """缓存渲染好的页面模板"""
+    timeout = getattr(settings, 'SURVEY_PAGE_CACHE_TIMEOUT', 600)
+    cache.set(get_page_key(survey, is_wechat), html, timeout)
+
+
+def fill_page(html, csrf_token, start_time, submit_token=''):
+    """将占位符替换为当前请求的值"""
+    return html.replace(
+        CSRF_TOKEN_PLACEHOLDER, csrf_token
+    ).replace(
+        START_TIME_PLACEHOLDER, str(int(start_time))
+    ).replace(
+        SUBMIT_TOKEN_PLACEHOLDER, submit_token
+    )
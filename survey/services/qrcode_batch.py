@@ -0,0 +1,148 @@
+# survey/services/qrcode_batch.py
+"""
+批量生成二维码
+
+在一个事务中为问卷批量创建二维码（短代码由共享的短代码分配器批量分配），
+逐个渲染图片写入流式ZIP，或逐页追加到可打印的多格PDF中，不会把全部图片同时保存在内存里。
+后台请求在当前线程中渲染；管理命令可指定多个进程并行渲染，
+进程池使用 spawn 方式启动（不 fork 已有数据库连接和线程的进程）。
+"""
+import io
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import transaction
+
+from ..models import QRCode
+from ..utils.short_codes import allocate_qrcode_short_codes
+from .qrcode_images import DEFAULT_STYLE, render_qrcode_png
+
+
+# A4纸 150dpi
+PAGE_SIZE = (1240, 1754)
+PAGE_RESOLUTION = 150.0
+PAGE_MARGIN = 60
+
+
+def create_qrcodes(survey, count, name_prefix=''):
+    """在一个事务中批量创建二维码，返回按名称编号排序的二维码列表"""
+    name_prefix = name_prefix or survey.title[:80]
+    with transaction.atomic():
+        short_codes = allocate_qrcode_short_codes(count)
+        QRCode.objects.bulk_create([
+            QRCode(survey=survey, name=f'{name_prefix}-{index:04d}'[:100], short_code=short_code)
+            for index, short_code in enumerate(short_codes, 1)
+        ], batch_size=500)
+    # MySQL批量插入不返回主键，按短代码重新读取
+    qrcodes = {qrcode.short_code: qrcode for qrcode in QRCode.objects.filter(short_code__in=short_codes)}
+    return [qrcodes[short_code] for short_code in short_codes]
+
+
+def get_redirect_url(base_url, short_code):
+    """二维码中编码的跳转链接（与 QRCodeImageView 生成的一致）"""
+    return f'{base_url.rstrip("/")}/qrcode/{short_code}/redirect/'
+
+
+def _render(args):
+    data, style = args
+    return render_qrcode_png(data, style)
+
+
+def iter_rendered_images(qrcodes, base_url, style=None, workers=1):
+    """渲染图片，按顺序 yield (二维码, PNG字节)；workers 大于1时使用进程池（仅用于管理命令）"""
+    style = style or DEFAULT_STYLE
+    jobs = [(get_redirect_url(base_url, qrcode.short_code), style) for qrcode in qrcodes]
+    if not workers or workers <= 1 or len(jobs) <= 1:
+        for qrcode, job in zip(qrcodes, jobs):
+            yield qrcode, _render(job)
+        return
+
+    # spawn 启动的子进程需要重新初始化Django才能导入本模块
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    ) as executor:
+        yield from zip(qrcodes, executor.map(_render, jobs, chunksize=16))
+
+
+class _StreamBuffer:
+    """只写缓冲区，zipfile 写入后由生成器取出已写入的数据"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _image_filename(qrcode):
+    return f'{qrcode.short_code}.png'
+
+
+def stream_zip(qrcodes, base_url, style=None, workers=1):
+    """逐个渲染并生成ZIP数据块（PNG已压缩，使用存储模式）"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for qrcode, content in iter_rendered_images(qrcodes, base_url, style, workers):
+            archive.writestr(_image_filename(qrcode), content)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def write_zip(fileobj, qrcodes, base_url, style=None, workers=1):
+    """写入ZIP文件"""
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_STORED) as archive:
+        for qrcode, content in iter_rendered_images(qrcodes, base_url, style, workers):
+            archive.writestr(_image_filename(qrcode), content)
+
+
+def write_pdf_sheet(fileobj, qrcodes, base_url, columns=3, rows=4, style=None, workers=1):
+    """
+    生成可打印的多格PDF（A4，每页 columns x rows 个二维码，下方标注短代码）
+
+    每排满一页就追加写入，fileobj 需可读写（如 tempfile.TemporaryFile()）
+    """
+    from PIL import Image, ImageDraw
+
+    cell_width = (PAGE_SIZE[0] - PAGE_MARGIN * 2) // columns
+    cell_height = (PAGE_SIZE[1] - PAGE_MARGIN * 2) // rows
+    label_height = 30
+    qr_size = min(cell_width, cell_height - label_height) - 20
+    per_page = columns * rows
+
+    page = None
+    draw = None
+    page_count = 0
+
+    def save_page():
+        page.save(fileobj, format='PDF', resolution=PAGE_RESOLUTION, append=page_count > 0)
+
+    for index, (qrcode, content) in enumerate(iter_rendered_images(qrcodes, base_url, style, workers)):
+        slot = index % per_page
+        if slot == 0:
+            if page is not None:
+                save_page()
+                page_count += 1
+            page = Image.new('L', PAGE_SIZE, 255)
+            draw = ImageDraw.Draw(page)
+
+        x = PAGE_MARGIN + (slot % columns) * cell_width + (cell_width - qr_size) // 2
+        y = PAGE_MARGIN + (slot // columns) * cell_height
+        with Image.open(io.BytesIO(content)) as image:
+            page.paste(image.convert('L').resize((qr_size, qr_size), Image.NEAREST), (x, y))
+        draw.text((x, y + qr_size + 5), qrcode.short_code, fill=0)
+
+    if page is not None:
+        save_page()
+        page_count += 1
+    return page_count
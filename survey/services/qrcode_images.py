@@ -0,0 +1,178 @@
+# survey/services/qrcode_images.py
+"""
+二维码图片渲染与缓存
+
+样式参数先规范化为固定的可选值（颜色只能选调色板中的颜色，尺寸取最接近的档位），
+图片按 (二维码链接, 样式) 的摘要缓存在内存缓存和 MEDIA_ROOT 下的磁盘目录中，
+每个二维码的磁盘缓存文件数有上限，超出时删除最久未使用的图片。
+图片内容只由链接和样式决定，摘要同时作为 ETag，浏览器和 nginx 可以长期缓存。
+"""
+import hashlib
+import io
+import os
+import tempfile
+
+import qrcode
+from django.conf import settings
+from django.core.cache import cache
+
+
+IMAGE_KEY_PREFIX = 'survey:qrcode'
+
+ERROR_CORRECTION_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+NAMED_COLORS = {
+    'black': '#000000',
+    'white': '#ffffff',
+    'red': '#ff0000',
+    'green': '#008000',
+    'blue': '#0000ff',
+    'yellow': '#ffff00',
+    'orange': '#ffa500',
+    'purple': '#800080',
+    'gray': '#808080',
+    'grey': '#808080',
+    'navy': '#000080',
+}
+
+# 允许的颜色值（调色板颜色的 #rrggbb 形式）
+PALETTE_COLORS = set(NAMED_COLORS.values())
+
+# 允许的尺寸档位，其他数值取最接近的档位
+VERSIONS = (1, 2, 3, 4, 5, 6, 8, 10)
+BOX_SIZES = (4, 6, 8, 10, 12, 16, 20)
+BORDERS = (0, 1, 2, 4, 6, 8)
+
+DEFAULT_STYLE = {
+    'version': 1,
+    'error_correction': 'L',
+    'box_size': 10,
+    'border': 4,
+    'fill_color': '#000000',
+    'back_color': '#ffffff',
+}
+
+
+def _nearest_choice(value, default, choices):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(choices, key=lambda choice: abs(choice - value))
+
+
+def _normalize_color(value, default):
+    """颜色名称或十六进制值（可省略#、可简写），不在调色板中时使用默认值"""
+    if not value:
+        return default
+    value = value.strip().lower()
+    if value in NAMED_COLORS:
+        return NAMED_COLORS[value]
+    digits = value.lstrip('#')
+    if len(digits) == 3:
+        digits = ''.join(c * 2 for c in digits)
+    color = f'#{digits}'
+    return color if color in PALETTE_COLORS else default
+
+
+def normalize_style(params):
+    """规范化样式参数（如 request.GET），非法值使用默认值，数值取最接近的档位"""
+    error_correction = str(params.get('error_correction', '')).upper()
+    return {
+        'version': _nearest_choice(params.get('version'), DEFAULT_STYLE['version'], VERSIONS),
+        'error_correction': error_correction if error_correction in ERROR_CORRECTION_LEVELS else DEFAULT_STYLE['error_correction'],
+        'box_size': _nearest_choice(params.get('box_size'), DEFAULT_STYLE['box_size'], BOX_SIZES),
+        'border': _nearest_choice(params.get('border'), DEFAULT_STYLE['border'], BORDERS),
+        'fill_color': _normalize_color(params.get('fill_color'), DEFAULT_STYLE['fill_color']),
+        'back_color': _normalize_color(params.get('back_color'), DEFAULT_STYLE['back_color']),
+    }
+
+
+def get_image_digest(data, style):
+    """图片摘要（用作缓存键、文件名和ETag）"""
+    raw = '|'.join([data] + [f'{key}={style[key]}' for key in sorted(style)])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def render_qrcode_png(data, style):
+    """生成二维码PNG图片，返回字节内容"""
+    qr = qrcode.QRCode(
+        version=style['version'],
+        error_correction=ERROR_CORRECTION_LEVELS[style['error_correction']],
+        box_size=style['box_size'],
+        border=style['border'],
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color=style['fill_color'], back_color=style['back_color'])
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _get_disk_path(short_code, digest):
+    cache_dir = getattr(settings, 'SURVEY_QRCODE_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'qrcodes'))
+    return os.path.join(cache_dir, short_code, f'{digest}.png')
+
+
+def _read_disk(path):
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        # 更新修改时间，淘汰时按最久未使用的顺序删除
+        os.utime(path)
+        return content
+    except OSError:
+        return None
+
+
+def _write_disk(path, content):
+    """先写临时文件再原子替换，避免并发请求读到不完整的图片"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        _evict_disk(os.path.dirname(path))
+    except OSError:
+        # 磁盘缓存写入失败不影响返回图片
+        pass
+
+
+def _evict_disk(directory):
+    """单个二维码的缓存图片超过上限时，删除最久未使用的图片"""
+    limit = getattr(settings, 'SURVEY_QRCODE_DISK_CACHE_LIMIT', 32)
+    entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.png')]
+    if len(entries) <= limit:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - limit]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def get_qrcode_image(short_code, data, style, digest=None):
+    """获取二维码图片：内存缓存 -> 磁盘缓存 -> 重新生成"""
+    digest = digest or get_image_digest(data, style)
+    key = f'{IMAGE_KEY_PREFIX}:{digest}'
+    content = cache.get(key)
+    if content is not None:
+        return content
+
+    path = _get_disk_path(short_code, digest)
+    content = _read_disk(path)
+    if content is None:
+        content = render_qrcode_png(data, style)
+        _write_disk(path, content)
+
+    cache.set(key, content, getattr(settings, 'SURVEY_QRCODE_CACHE_TIMEOUT', 86400))
+    return content
@@ -0,0 +1,273 @@
+# survey/services/question_import.py
+"""
+问题库批量导入
+
+逐行读取上传的 CSV（增量解码）或 Excel（openpyxl 只读模式），
+分类在开始时一次查询加载、缺失的分类按批批量创建，
+问题和选项按批在事务中 bulk_create，整批写入失败时逐行重试，
+每行的错误单独记录，不影响其他行；分类标识冲突无法创建分类的行记为错误。
+"""
+import csv
+import io
+import os
+import re
+from collections import deque
+
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Max
+
+from ..models import Question, Option, Category
+
+
+QUESTION_TYPE_MAPPING = {
+    '文本题': Question.QUESTION_TYPE_TEXT,
+    '单选题': Question.QUESTION_TYPE_SINGLE_CHOICE,
+    '多选题': Question.QUESTION_TYPE_MULTIPLE_CHOICE,
+    '评分题': Question.QUESTION_TYPE_RATING,
+    '日期题': Question.QUESTION_TYPE_DATE,
+    **{question_type: question_type for question_type, _ in Question.QUESTION_TYPES},
+}
+
+OPTION_FIELDS = ['选项', '选项(格式: 值|标签;值|标签)', '选项(格式: 值|标签)', '选项(格式: 标签1;标签2;标签3)']
+
+CHOICE_QUESTION_TYPES = (
+    Question.QUESTION_TYPE_SINGLE_CHOICE,
+    Question.QUESTION_TYPE_MULTIPLE_CHOICE,
+)
+
+OPTION_VALUE_MAX_LENGTH = Option._meta.get_field('value').max_length
+OPTION_LABEL_MAX_LENGTH = Option._meta.get_field('label').max_length
+
+
+class ImportResult:
+    """导入结果：成功数量和每行的错误"""
+
+    def __init__(self):
+        self.created_count = 0
+        self.errors = []
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def error_messages(self, limit=None):
+        errors = self.errors if limit is None else self.errors[:limit]
+        return [f'第{row_number}行导入失败: {message}' for row_number, message in errors]
+
+
+def iter_import_rows(file):
+    """逐行读取导入文件，yield (行号, {表头: 值})，行号从2开始（表头是第1行）"""
+    ext = os.path.splitext(file.name)[1].lower()
+    if ext == '.csv':
+        yield from _iter_csv_rows(file)
+    else:
+        yield from _iter_excel_rows(file)
+
+
+def _iter_csv_rows(file):
+    # 增量解码，兼容带BOM的UTF-8（导出模板使用 utf-8-sig）
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {
+                (key or '').strip(): (value or '').strip() if isinstance(value, str) else ''
+                for key, value in row.items()
+            }
+    finally:
+        # 不随包装对象关闭上传文件
+        text.detach()
+
+
+def _iter_excel_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise Exception('请安装 openpyxl 库以支持Excel导入')
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header_row = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        for row_number, row in enumerate(rows, 2):
+            if all(value is None for value in row):
+                continue
+            yield row_number, {
+                header: str(value).strip() if value is not None else ''
+                for header, value in zip(header_row, row)
+            }
+    finally:
+        wb.close()
+
+
+def get_options_string(row):
+    """从行数据中获取选项字符串"""
+    for field in OPTION_FIELDS:
+        if field in row:
+            return row[field].strip()
+    return ''
+
+
+def parse_options(options_str):
+    """解析选项字符串（标签1;标签2 或 值|标签;值|标签），返回 [(值, 标签), ...]"""
+    options = []
+    for i, option in enumerate(options_str.split(';')):
+        if '|' in option:
+            value, label = option.split('|', 1)
+            value = value.strip()
+            label = label.strip()
+        else:
+            label = option.strip()
+            # 生成值：移除特殊字符，转为小写，空格替换为下划线
+            value = re.sub(r'[^\w\s]', '', label)
+            value = value.lower().replace(' ', '_')
+            if not value:
+                value = f'option_{i+1}'
+
+        if value and label:
+            options.append((value, label))
+    return options
+
+
+def parse_row(row):
+    """校验并解析一行，返回 (问题文本, 问题类型, 分类名称, [(值, 标签), ...])，不合法时抛出 ValueError"""
+    text = row.get('问题文本', '').strip()
+    if not text:
+        raise ValueError('问题文本不能为空')
+
+    question_type = QUESTION_TYPE_MAPPING.get(row.get('问题类型', '').strip(), Question.QUESTION_TYPE_TEXT)
+    category_name = row.get('分类', '').strip()
+    if len(category_name) > Category._meta.get_field('name').max_length:
+        raise ValueError('分类名称过长')
+
+    options = []
+    if question_type in CHOICE_QUESTION_TYPES:
+        options = parse_options(get_options_string(row))
+        values = [value for value, _ in options]
+        if len(set(values)) != len(values):
+            raise ValueError('选项值重复')
+        for value, label in options:
+            if len(value) > OPTION_VALUE_MAX_LENGTH or len(label) > OPTION_LABEL_MAX_LENGTH:
+                raise ValueError(f'选项过长: {label[:20]}')
+
+    return text, question_type, category_name, options
+
+
+class QuestionImporter:
+    """按批导入问题及选项"""
+
+    def __init__(self, created_by, is_public=True, batch_size=1000):
+        self.created_by = created_by
+        self.is_public = is_public
+        self.batch_size = batch_size
+        self.result = ImportResult()
+        # 分类名称 -> ID，开始时一次查询加载
+        self.categories = dict(Category.objects.values_list('name', 'pk'))
+
+    def run(self, rows):
+        """导入 (行号, 行数据) 序列，返回 ImportResult"""
+        batch = []
+        for row_number, row in rows:
+            try:
+                batch.append((row_number, parse_row(row)))
+            except ValueError as e:
+                self.result.add_error(row_number, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self.result
+
+    def _resolve_categories(self, names):
+        """批量创建缺失的分类，返回未能创建的分类名称（分类标识与已有分类冲突）"""
+        missing = {name for name in names if name and name not in self.categories}
+        if not missing:
+            return set()
+        Category.objects.bulk_create(
+            [Category(name=name, slug=name) for name in missing],
+            ignore_conflicts=True
+        )
+        # 被 ignore_conflicts 跳过的分类不会出现在查询结果中
+        self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'pk'))
+        return {name for name in missing if name not in self.categories}
+
+    def _import_batch(self, batch):
+        try:
+            with transaction.atomic():
+                unresolved = self._resolve_categories(category_name for _, (_, _, category_name, _) in batch)
+        except DatabaseError as e:
+            for row_number, _ in batch:
+                self.result.add_error(row_number, str(e))
+            return
+
+        rows = []
+        for row_number, parsed in batch:
+            category_name = parsed[2]
+            if category_name in unresolved:
+                self.result.add_error(row_number, f'无法创建分类"{category_name}"：分类标识与已有分类冲突')
+            else:
+                rows.append((row_number, parsed))
+
+        try:
+            with transaction.atomic():
+                self._insert_rows(rows)
+        except DatabaseError:
+            # 整批失败时逐行重试，只记录出错的行
+            for row_number, parsed in rows:
+                try:
+                    with transaction.atomic():
+                        self._insert_rows([(row_number, parsed)])
+                except DatabaseError as e:
+                    self.result.add_error(row_number, str(e))
+                else:
+                    self.result.created_count += 1
+            return
+        self.result.created_count += len(rows)
+
+    def _insert_rows(self, rows):
+        questions = [
+            Question(
+                text=text,
+                question_type=question_type,
+                category_id=self.categories.get(category_name),
+                created_by=self.created_by,
+                is_public=self.is_public,
+            )
+            for _, (text, question_type, category_name, _) in rows
+        ]
+        options_list = [options for _, (_, _, _, options) in rows]
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            Question.objects.bulk_create(questions)
+        else:
+            # 数据库（如MySQL）不返回批量插入的主键时，批量插入后用一次查询按插入顺序读回主键
+            last_pk = Question.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+            Question.objects.bulk_create(questions)
+            if any(options_list):
+                self._read_back_pks(questions, last_pk)
+
+        Option.objects.bulk_create([
+            Option(question=question, value=value, label=label, order=i)
+            for question, options in zip(questions, options_list)
+            for i, (value, label) in enumerate(options)
+        ], batch_size=self.batch_size)
+
+    def _read_back_pks(self, questions, last_pk):
+        """按 (问题文本, 类型, 分类) 和插入顺序为刚插入的问题设置主键（同一语句插入的主键递增）"""
+        inserted = {}
+        for pk, *key in Question.objects.filter(
+            pk__gt=last_pk, created_by=self.created_by
+        ).order_by('pk').values_list('pk', 'text', 'question_type', 'category_id'):
+            inserted.setdefault(tuple(key), deque()).append(pk)
+        for question in questions:
+            question.pk = inserted[(question.text, question.question_type, question.category_id)].popleft()
+
+
+def import_questions(file, created_by, is_public=True, batch_size=1000):
+    """导入上传的问题文件，返回 ImportResult"""
+    return QuestionImporter(created_by, is_public=is_public, batch_size=batch_size).run(iter_import_rows(file))
@@ -0,0 +1,184 @@
+# survey/services/scan_analytics.py
+"""
+扫描数据汇总与转化分析
+
+扫描记录（ScanEvent）按本地时间汇总到分钟桶，小时桶由分钟桶汇总、天桶由小时桶汇总，
+每次只重算上次汇总位置附近的时间段（幂等，可重复执行），结果以 upsert 写入 ScanRollup
+（MySQL 不支持指定冲突字段，按唯一索引 ON DUPLICATE KEY UPDATE）。
+转化报告把问卷所有二维码的扫描汇总和 Response.submit_time 放到同样的时间桶中对比。
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ..models import ScanEvent, ScanRollup
+
+
+GRANULARITIES = [
+    ScanRollup.GRANULARITY_MINUTE,
+    ScanRollup.GRANULARITY_HOUR,
+    ScanRollup.GRANULARITY_DAY,
+]
+
+# 扫描记录由各进程缓冲后写入，重算最近一段时间以包含迟到的记录
+ROLLUP_SAFETY_WINDOW = timedelta(minutes=10)
+
+
+def truncate(value, granularity):
+    """按本地时间截断到时间桶开始"""
+    value = timezone.localtime(value)
+    if granularity == ScanRollup.GRANULARITY_MINUTE:
+        return value.replace(second=0, microsecond=0)
+    if granularity == ScanRollup.GRANULARITY_HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_rollup_start():
+    """本次汇总的起始时间：上次汇总的最后一个分钟桶往前推安全窗口，首次为最早的扫描记录"""
+    latest = ScanRollup.objects.filter(
+        granularity=ScanRollup.GRANULARITY_MINUTE
+    ).aggregate(latest=Max('bucket_start'))['latest']
+    if latest is not None:
+        return latest - ROLLUP_SAFETY_WINDOW
+    return ScanEvent.objects.aggregate(earliest=Min('scanned_at'))['earliest']
+
+
+def _save_rollups(granularity, scans, wechat_scans):
+    conflict_options = {'update_conflicts': True, 'update_fields': ['scan_count', 'wechat_count']}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_options['unique_fields'] = ['qrcode', 'granularity', 'bucket_start']
+    ScanRollup.objects.bulk_create(
+        [
+            ScanRollup(
+                qrcode_id=qrcode_id,
+                granularity=granularity,
+                bucket_start=bucket_start,
+                scan_count=count,
+                wechat_count=wechat_scans.get((qrcode_id, bucket_start), 0),
+            )
+            for (qrcode_id, bucket_start), count in scans.items()
+        ],
+        batch_size=1000,
+        **conflict_options,
+    )
+    return len(scans)
+
+
+def _rollup_from_events(start, chunk_size):
+    scans = Counter()
+    wechat_scans = Counter()
+    events = ScanEvent.objects.filter(scanned_at__gte=start).order_by().values_list(
+        'qrcode_id', 'scanned_at', 'is_wechat'
+    )
+    for qrcode_id, scanned_at, is_wechat in events.iterator(chunk_size=chunk_size):
+        key = (qrcode_id, truncate(scanned_at, ScanRollup.GRANULARITY_MINUTE))
+        scans[key] += 1
+        if is_wechat:
+            wechat_scans[key] += 1
+    return _save_rollups(ScanRollup.GRANULARITY_MINUTE, scans, wechat_scans)
+
+
+def _rollup_from_rollups(granularity, source_granularity, start):
+    scans = Counter()
+    wechat_scans = Counter()
+    rollups = ScanRollup.objects.filter(
+        granularity=source_granularity, bucket_start__gte=start
+    ).values_list('qrcode_id', 'bucket_start', 'scan_count', 'wechat_count')
+    for qrcode_id, bucket_start, scan_count, wechat_count in rollups.iterator():
+        key = (qrcode_id, truncate(bucket_start, granularity))
+        scans[key] += scan_count
+        wechat_scans[key] += wechat_count
+    return _save_rollups(granularity, scans, wechat_scans)
+
+
+def rollup_scan_events(since=None, chunk_size=5000):
+    """汇总扫描记录，返回 {时间粒度: 更新的时间桶数量}"""
+    since = since or get_rollup_start()
+    if since is None:
+        return {granularity: 0 for granularity in GRANULARITIES}
+
+    return {
+        ScanRollup.GRANULARITY_MINUTE: _rollup_from_events(
+            truncate(since, ScanRollup.GRANULARITY_MINUTE), chunk_size
+        ),
+        ScanRollup.GRANULARITY_HOUR: _rollup_from_rollups(
+            ScanRollup.GRANULARITY_HOUR, ScanRollup.GRANULARITY_MINUTE,
+            truncate(since, ScanRollup.GRANULARITY_HOUR)
+        ),
+        ScanRollup.GRANULARITY_DAY: _rollup_from_rollups(
+            ScanRollup.GRANULARITY_DAY, ScanRollup.GRANULARITY_HOUR,
+            truncate(since, ScanRollup.GRANULARITY_DAY)
+        ),
+    }
+
+
+def prune_scan_events(before):
+    """删除已汇总的、早于 before 的扫描记录，返回删除数量"""
+    rollup_start = get_rollup_start()
+    if rollup_start is None:
+        return 0
+    deleted, _ = ScanEvent.objects.filter(scanned_at__lt=min(before, rollup_start)).delete()
+    return deleted
+
+
+def build_conversion_report(survey, granularity=ScanRollup.GRANULARITY_HOUR, since=None, until=None, chunk_size=5000):
+    """
+    问卷扫描到提交的转化报告
+
+    返回 {'rows': [{'bucket_start', 'scans', 'wechat_scans', 'responses', 'conversion_rate'}],
+          'qrcodes': [{'name', 'short_code', 'scans'}], 'total_scans', 'total_responses', 'conversion_rate'}
+    """
+    until = until or timezone.now()
+    since = truncate(since or (until - timedelta(days=7)), granularity)
+
+    qrcodes = {
+        pk: {'name': name, 'short_code': short_code, 'scans': 0}
+        for pk, name, short_code in survey.qrcodes.values_list('pk', 'name', 'short_code')
+    }
+
+    scans = Counter()
+    wechat_scans = Counter()
+    rollups = ScanRollup.objects.filter(
+        qrcode_id__in=list(qrcodes), granularity=granularity,
+        bucket_start__gte=since, bucket_start__lt=until
+    ).values_list('qrcode_id', 'bucket_start', 'scan_count', 'wechat_count')
+    for qrcode_id, bucket_start, scan_count, wechat_count in rollups:
+        bucket_start = timezone.localtime(bucket_start)
+        scans[bucket_start] += scan_count
+        wechat_scans[bucket_start] += wechat_count
+        qrcodes[qrcode_id]['scans'] += scan_count
+
+    responses = Counter()
+    submit_times = survey.responses.filter(
+        submit_time__gte=since, submit_time__lt=until
+    ).order_by().values_list('submit_time', flat=True)
+    for submit_time in submit_times.iterator(chunk_size=chunk_size):
+        responses[truncate(submit_time, granularity)] += 1
+
+    rows = []
+    for bucket_start in sorted(set(scans) | set(responses)):
+        rows.append({
+            'bucket_start': bucket_start,
+            'scans': scans[bucket_start],
+            'wechat_scans': wechat_scans[bucket_start],
+            'responses': responses[bucket_start],
+            'conversion_rate': _rate(responses[bucket_start], scans[bucket_start]),
+        })
+
+    total_scans = sum(scans.values())
+    total_responses = sum(responses.values())
+    return {
+        'rows': rows,
+        'qrcodes': sorted(qrcodes.values(), key=lambda item: -item['scans']),
+        'total_scans': total_scans,
+        'total_responses': total_responses,
+        'conversion_rate': _rate(total_responses, total_scans),
+    }
+
+
+def _rate(responses, scans):
+    return (responses / scans) * 100 if scans else None
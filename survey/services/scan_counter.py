@@ -0,0 +1,180 @@
+# survey/services/scan_counter.py
+"""
+二维码扫描计数缓冲
+
+扫描时只在进程内累加计数并暂存扫描记录，由后台线程定期（或待写入数量达到阈值时被唤醒）批量写入数据库：
+增量相同的二维码合并为一条 UPDATE ... SET scan_count = scan_count + N，
+扫描记录（ScanEvent）使用 bulk_create 批量插入，只由后台线程写入，跳转请求本身不访问写库。
+待写入的扫描记录最多保留 max_pending_events 条，超出时丢弃最早的记录。
+
+进程退出时会写入剩余计数；写入失败的计数会放回缓冲区，下次重试。
+实时计数 = 数据库中的计数 + 本进程尚未写入的计数（其他进程的未写入部分最多延迟一个写入周期）。
+"""
+import atexit
+import ipaddress
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import QRCode, ScanEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_ip_bucket(ip):
+    """IP所在网段（IPv4为/24，IPv6为/48），无法解析时返回空字符串"""
+    try:
+        address = ipaddress.ip_address((ip or '').strip())
+    except ValueError:
+        return ''
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+class ScanCounter:
+    """进程内扫描计数缓冲"""
+
+    def __init__(self, flush_interval=5.0, flush_threshold=100, max_pending_events=100000):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_pending_events = max_pending_events
+        self._pending = Counter()
+        self._pending_total = 0
+        self._events = deque(maxlen=max_pending_events)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        # 待写入数量达到阈值时唤醒后台线程提前写入
+        self._wakeup = threading.Event()
+
+    def increment(self, qrcode_id, amount=1):
+        """累加扫描计数"""
+        self._add(qrcode_id, amount)
+
+    def record_scan(self, qrcode_id, short_code, is_wechat=False, ip_bucket=''):
+        """累加扫描计数并暂存一条扫描记录"""
+        self._add(qrcode_id, 1, (qrcode_id, short_code, timezone.now(), is_wechat, ip_bucket))
+
+    def _add(self, qrcode_id, amount, event=None):
+        with self._lock:
+            self._pending[qrcode_id] += amount
+            self._pending_total += amount
+            if event is not None:
+                self._events.append(event)
+            total = self._pending_total
+            if self._thread is None:
+                self._start()
+        if total >= self.flush_threshold:
+            self._wakeup.set()
+
+    def pending(self, qrcode_id):
+        """本进程中尚未写入数据库的计数"""
+        with self._lock:
+            return self._pending.get(qrcode_id, 0)
+
+    def get_live_count(self, qrcode):
+        """实时扫描次数（数据库计数 + 本进程未写入的计数）"""
+        return qrcode.scan_count + self.pending(qrcode.pk)
+
+    def flush(self):
+        """将缓冲的计数和扫描记录写入数据库，返回写入的扫描次数"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                events, self._events = list(self._events), deque(maxlen=self.max_pending_events)
+                self._pending_total = 0
+            self._write_events(events)
+            if not pending:
+                return 0
+
+            # 增量相同的二维码合并为一条UPDATE
+            by_amount = defaultdict(list)
+            for qrcode_id, amount in pending.items():
+                by_amount[amount].append(qrcode_id)
+
+            written = 0
+            for amount, qrcode_ids in by_amount.items():
+                try:
+                    QRCode.objects.filter(pk__in=qrcode_ids).update(scan_count=F('scan_count') + amount)
+                except DatabaseError:
+                    logger.exception('写入二维码扫描计数失败，稍后重试')
+                    with self._lock:
+                        for qrcode_id in qrcode_ids:
+                            self._pending[qrcode_id] += amount
+                        self._pending_total += amount * len(qrcode_ids)
+                    continue
+                written += amount * len(qrcode_ids)
+            return written
+
+    def _write_events(self, events):
+        if not events:
+            return
+        objs = [
+            ScanEvent(
+                qrcode_id=qrcode_id,
+                short_code=short_code,
+                scanned_at=scanned_at,
+                is_wechat=is_wechat,
+                ip_bucket=ip_bucket,
+            )
+            for qrcode_id, short_code, scanned_at, is_wechat, ip_bucket in events
+        ]
+        try:
+            try:
+                with transaction.atomic():
+                    ScanEvent.objects.bulk_create(objs, batch_size=1000)
+            except IntegrityError:
+                # 期间有二维码被删除，丢弃其扫描记录后重试
+                existing = set(QRCode.objects.filter(
+                    pk__in={obj.qrcode_id for obj in objs}
+                ).values_list('pk', flat=True))
+                ScanEvent.objects.bulk_create(
+                    [obj for obj in objs if obj.qrcode_id in existing], batch_size=1000
+                )
+        except DatabaseError:
+            logger.exception('写入二维码扫描记录失败，稍后重试')
+            with self._lock:
+                # 放回缓冲区（在新记录之前），数据库长时间不可用时只保留最近的记录
+                restored = deque(events, maxlen=self.max_pending_events)
+                restored.extend(self._events)
+                self._events = restored
+
+    def _start(self):
+        """启动定期写入线程并注册退出时写入（首次计数时调用，保证在uWSGI fork之后）"""
+        self._thread = threading.Thread(target=self._run, name='scan-counter-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                # 剩余计数由 stop() 写入
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('定期写入二维码扫描计数失败')
+            finally:
+                # 后台线程不在请求周期内，需自行关闭过期连接
+                close_old_connections()
+
+    def stop(self):
+        """停止定期写入并写入剩余计数"""
+        self._stopped.set()
+        self._wakeup.set()
+        self.flush()
+
+
+scan_counter = ScanCounter(
+    flush_interval=getattr(settings, 'SURVEY_SCAN_FLUSH_INTERVAL', 5.0),
+    flush_threshold=getattr(settings, 'SURVEY_SCAN_FLUSH_THRESHOLD', 100),
+)
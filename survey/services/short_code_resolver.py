@@ -0,0 +1,116 @@
+# survey/services/short_code_resolver.py
+"""
+二维码短代码解析表
+
+扫码跳转只需要 short_code 对应的 (二维码ID, 问卷ID, 是否要求微信打开)，
+解析结果保存在进程内字典中（带过期时间），未命中时再查共享缓存和数据库，
+常见情况下跳转不访问数据库。
+
+二维码、问卷变更时由信号清除本进程和共享缓存中的记录；
+其他进程的本地记录最多延迟 SURVEY_SHORT_CODE_LOCAL_TTL 秒失效。
+uWSGI 使用 lazy-apps 时，每个 worker 启动加载应用后调用 warm_up 预先载入。
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import QRCode
+
+
+SHORT_CODE_KEY_PREFIX = 'survey:short_code'
+
+ShortCodeTarget = namedtuple('ShortCodeTarget', ['qrcode_id', 'survey_id', 'require_wechat'])
+
+_local = {}
+_lock = threading.Lock()
+
+
+def _local_ttl():
+    return getattr(settings, 'SURVEY_SHORT_CODE_LOCAL_TTL', 60)
+
+
+def _use_shared_cache():
+    return getattr(settings, 'SURVEY_SHORT_CODE_SHARED_CACHE', True)
+
+
+def _get_key(short_code):
+    return f'{SHORT_CODE_KEY_PREFIX}:{short_code}'
+
+
+def _remember(short_code, target, expires_at=None):
+    with _lock:
+        _local[short_code] = (target, expires_at or time.monotonic() + _local_ttl())
+
+
+def resolve_short_code(short_code):
+    """解析短代码，不存在时返回None"""
+    entry = _local.get(short_code)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+
+    target = None
+    if _use_shared_cache():
+        cached = cache.get(_get_key(short_code))
+        if cached is not None:
+            target = ShortCodeTarget(*cached)
+
+    if target is None:
+        row = QRCode.objects.filter(short_code=short_code).values_list(
+            'pk', 'survey_id', 'survey__require_wechat'
+        ).first()
+        if row is None:
+            # 不缓存不存在的短代码，避免任意请求撑大解析表
+            return None
+        target = ShortCodeTarget(row[0], str(row[1]), row[2])
+        if _use_shared_cache():
+            cache.set(_get_key(short_code), tuple(target), getattr(settings, 'SURVEY_SHORT_CODE_CACHE_TIMEOUT', 3600))
+
+    _remember(short_code, target)
+    return target
+
+
+def invalidate_short_codes(short_codes=(), qrcode_ids=(), survey_ids=()):
+    """清除指定短代码、二维码或问卷对应的解析记录"""
+    short_codes = set(short_codes)
+    qrcode_ids = set(qrcode_ids)
+    survey_ids = {str(survey_id) for survey_id in survey_ids}
+
+    with _lock:
+        for short_code, (target, _) in list(_local.items()):
+            if target.qrcode_id in qrcode_ids or target.survey_id in survey_ids:
+                short_codes.add(short_code)
+        for short_code in short_codes:
+            _local.pop(short_code, None)
+
+    if _use_shared_cache():
+        if survey_ids:
+            short_codes.update(
+                QRCode.objects.filter(survey_id__in=survey_ids).values_list('short_code', flat=True)
+            )
+        cache.delete_many([_get_key(short_code) for short_code in short_codes])
+
+
+def warm_up(limit=None):
+    """预先载入最近创建的二维码（一次查询），返回载入数量"""
+    limit = limit if limit is not None else getattr(settings, 'SURVEY_SHORT_CODE_WARMUP_LIMIT', 10000)
+    rows = QRCode.objects.order_by('-created_at').values_list(
+        'short_code', 'pk', 'survey_id', 'survey__require_wechat'
+    )[:limit]
+    # 错开过期时间，避免所有记录同时过期后集中回源
+    now = time.monotonic()
+    ttl = _local_ttl()
+    count = 0
+    for index, (short_code, qrcode_id, survey_id, require_wechat) in enumerate(rows):
+        _remember(short_code, ShortCodeTarget(qrcode_id, str(survey_id), require_wechat),
+                  now + ttl * (1 + (index % 10) / 10))
+        count += 1
+    return count
+
+
+def clear_local():
+    """清空本进程的解析表"""
+    with _lock:
+        _local.clear()
@@ -0,0 +1,124 @@
+# survey/services/spool.py
+"""
+问卷提交本地缓冲队列（write-behind）
+
+高峰期提交先追加到本地SQLite（WAL模式，synchronous=FULL）中，立即返回response_id，
+再由 drain_submission_spool 管理命令批量写入数据库。
+
+写入数据库成功后才从队列删除记录；若进程在两步之间崩溃，重启后会重放这一批，
+已写入的回答按ID跳过，因此重放是安全的。无法写入数据库的记录移入死信文件，不会阻塞队列。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+
+class SubmissionSpool:
+    """基于SQLite WAL日志的追加式提交队列"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS submission_spool ('
+                ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' response_id TEXT NOT NULL UNIQUE,'
+                ' payload TEXT NOT NULL,'
+                ' enqueued_at REAL NOT NULL'
+                ')'
+            )
+            self._local.conn = conn
+        return conn
+
+    def append(self, response_id, payload):
+        """追加一条提交记录（提交返回即已持久化到磁盘）"""
+        self._connect().execute(
+            'INSERT INTO submission_spool (response_id, payload, enqueued_at) VALUES (?, ?, ?)',
+            (str(response_id), json.dumps(payload, ensure_ascii=False), time.time())
+        )
+
+    def fetch(self, limit):
+        """按入队顺序读取一批待写入的记录"""
+        rows = self._connect().execute(
+            'SELECT seq, response_id, payload, enqueued_at FROM submission_spool ORDER BY seq LIMIT ?',
+            (limit,)
+        ).fetchall()
+        return [
+            {'seq': seq, 'response_id': response_id, 'payload': json.loads(payload), 'enqueued_at': enqueued_at}
+            for seq, response_id, payload, enqueued_at in rows
+        ]
+
+    def remove(self, seqs):
+        """删除已写入数据库的记录"""
+        if not seqs:
+            return
+        placeholders = ','.join('?' * len(seqs))
+        self._connect().execute(f'DELETE FROM submission_spool WHERE seq IN ({placeholders})', list(seqs))
+
+    def stats(self):
+        """队列深度和写入延迟（最早一条记录的等待秒数）"""
+        depth, oldest = self._connect().execute(
+            'SELECT COUNT(*), MIN(enqueued_at) FROM submission_spool'
+        ).fetchone()
+        return {
+            'depth': depth,
+            'lag': time.time() - oldest if oldest is not None else 0.0,
+        }
+
+
+def write_dead_letters(path, failures):
+    """
+    将无法写入数据库的记录追加到死信文件（JSON Lines，每行一条记录及错误信息）
+
+    failures: [(队列记录, 错误信息), ...]
+    """
+    if not failures:
+        return
+    directory = os.path.dirname(str(path))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for entry, error in failures:
+            f.write(json.dumps({
+                'response_id': entry['response_id'],
+                'payload': entry['payload'],
+                'enqueued_at': entry['enqueued_at'],
+                'failed_at': time.time(),
+                'error': error,
+            }, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def is_spool_enabled():
+    """是否启用提交缓冲队列"""
+    return getattr(settings, 'SURVEY_SUBMIT_SPOOL', False)
+
+
+def get_spool():
+    """获取进程内共享的队列实例"""
+    global _spool
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = SubmissionSpool(settings.SURVEY_SPOOL_PATH)
+    return _spool
@@ -0,0 +1,182 @@
+# survey/services/statistics.py
+"""
+问卷统计计算
+
+在数据库中完成分组统计（GROUP BY / JSON表函数展开选择答案），只统计该问卷的回答，
+返回结构与 admin/survey/statistics.html 模板使用的一致。
+数据库不支持JSON展开时，退回到按批读取答案、在Python中用 Counter 计数。
+"""
+from collections import Counter
+
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from ..models import Question, Answer, Response
+
+
+CHOICE_QUESTION_TYPES = (
+    Question.QUESTION_TYPE_SINGLE_CHOICE,
+    Question.QUESTION_TYPE_MULTIPLE_CHOICE,
+)
+RATING_VALUES = ['1', '2', '3', '4', '5']
+TEXT_SAMPLE_SIZE = 10
+
+# 按数据库类型展开 answer_choice（JSON数组）并分组计数的SQL
+CHOICE_COUNT_SQL = {
+    'sqlite': (
+        'SELECT a.question_id, j.value, COUNT(*) '
+        'FROM {answer} a '
+        'INNER JOIN {response} r ON r.id = a.response_id, '
+        'json_each(a.answer_choice) j '
+        'WHERE r.survey_id = %s AND a.question_id IN ({placeholders}) '
+        'GROUP BY a.question_id, j.value'
+    ),
+    'mysql': (
+        'SELECT a.question_id, j.value, COUNT(*) '
+        'FROM {answer} a '
+        'INNER JOIN {response} r ON r.id = a.response_id '
+        "INNER JOIN JSON_TABLE(a.answer_choice, '$[*]' COLUMNS (value VARCHAR(255) PATH '$')) j "
+        'WHERE r.survey_id = %s AND a.question_id IN ({placeholders}) '
+        'GROUP BY a.question_id, j.value'
+    ),
+    'postgresql': (
+        'SELECT a.question_id, j.value, COUNT(*) '
+        'FROM {answer} a '
+        'INNER JOIN {response} r ON r.id = a.response_id '
+        'CROSS JOIN LATERAL jsonb_array_elements_text(a.answer_choice) AS j(value) '
+        'WHERE r.survey_id = %s AND a.question_id IN ({placeholders}) '
+        'GROUP BY a.question_id, j.value'
+    ),
+}
+
+
+def count_answers(survey):
+    """统计问卷中每个问题的回答数量，返回 {问题ID: 数量}"""
+    return dict(
+        Answer.objects.filter(response__survey=survey)
+        .order_by()
+        .values('question_id')
+        .annotate(count=Count('id'))
+        .values_list('question_id', 'count')
+    )
+
+
+def count_choices(survey, question_ids):
+    """统计选择题/评分题各选项值的次数，返回 {(问题ID, 选项值): 数量}"""
+    if not question_ids:
+        return {}
+
+    sql = CHOICE_COUNT_SQL.get(connection.vendor)
+    if sql is not None:
+        sql = sql.format(
+            answer=Answer._meta.db_table,
+            response=Response._meta.db_table,
+            placeholders=', '.join(['%s'] * len(question_ids)),
+        )
+        survey_id = Response._meta.get_field('survey').get_db_prep_value(survey.pk, connection)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [survey_id, *question_ids])
+                return {
+                    (question_id, str(value)): count
+                    for question_id, value, count in cursor.fetchall()
+                }
+        except DatabaseError:
+            # 例如 MySQL 5.7 不支持 JSON_TABLE，退回到Python计数
+            pass
+
+    return count_choices_in_python(survey, question_ids)
+
+
+def count_choices_in_python(survey, question_ids, chunk_size=2000):
+    """按批读取答案并在Python中计数（不支持JSON展开的数据库使用）"""
+    counter = Counter()
+    answers = Answer.objects.filter(
+        response__survey=survey, question_id__in=question_ids
+    ).order_by().values_list('question_id', 'answer_choice')
+    for question_id, choices in answers.iterator(chunk_size=chunk_size):
+        if not isinstance(choices, list):
+            choices = [choices]
+        counter.update((question_id, str(choice)) for choice in choices)
+    return dict(counter)
+
+
+def sample_text_answers(survey, question_ids, size=TEXT_SAMPLE_SIZE):
+    """每个文本题取前 size 个回答（窗口函数一次查询），返回 {问题ID: [文本, ...]}"""
+    if not question_ids:
+        return {}
+
+    rows = Answer.objects.filter(
+        response__survey=survey, question_id__in=question_ids
+    ).order_by().annotate(
+        row_number=Window(RowNumber(), partition_by=F('question_id'), order_by=F('created_at').asc())
+    ).filter(row_number__lte=size).values_list('question_id', 'row_number', 'answer_text')
+
+    samples = {}
+    for question_id, _, text in sorted(rows):
+        samples.setdefault(question_id, []).append(text)
+    return samples
+
+
+def build_survey_statistics(survey):
+    """计算问卷中每个问题的统计数据（查询数量与问题数量、回答数量无关）"""
+    survey_questions = survey.survey_questions.select_related('question').prefetch_related(
+        'question__options'
+    ).order_by('order')
+    questions = [sq.question for sq in survey_questions]
+
+    answer_counts = count_answers(survey)
+    choice_counts = count_choices(survey, [
+        question.id for question in questions
+        if question.question_type in CHOICE_QUESTION_TYPES or question.question_type == Question.QUESTION_TYPE_RATING
+    ])
+    text_samples = sample_text_answers(survey, [
+        question.id for question in questions
+        if question.question_type == Question.QUESTION_TYPE_TEXT
+    ])
+
+    questions_stats = []
+    for question in questions:
+        answer_count = answer_counts.get(question.id, 0)
+        total = answer_count or 1
+        stats = {
+            'question': question,
+            'answer_count': answer_count,
+            'type': question.question_type,
+            'data': {},
+            'options': []
+        }
+
+        if question.question_type in CHOICE_QUESTION_TYPES:
+            # 选择题统计
+            options = list(question.options.all())
+            option_stats = {}
+            for option in options:
+                count = choice_counts.get((question.id, option.value), 0)
+                option_stats[option.value] = {
+                    'label': option.label,
+                    'count': count,
+                    'percentage': (count / total) * 100
+                }
+            stats['data'] = option_stats
+            stats['options'] = [{'value': option.value, 'label': option.label} for option in options]
+
+        elif question.question_type == Question.QUESTION_TYPE_RATING:
+            # 评分题统计
+            ratings = {}
+            for rating in RATING_VALUES:
+                count = choice_counts.get((question.id, rating), 0)
+                ratings[rating] = {'count': count, 'percentage': (count / total) * 100}
+            stats['data'] = ratings
+
+        elif question.question_type == Question.QUESTION_TYPE_TEXT:
+            # 文本题统计
+            stats['data'] = [
+                text[:100] + ('...' if len(text) > 100 else '')
+                for text in text_samples.get(question.id, [])
+            ]
+
+        questions_stats.append(stats)
+
+    return questions_stats
@@ -0,0 +1,225 @@
+# survey/services/submission.py
+"""
+问卷提交服务
+
+基于问卷编译快照在内存中完成答案校验，然后在一个事务内写入
+Response 和全部 Answer（bulk_create），每次提交的查询数量与问题数量无关。
+启用提交缓冲队列时，校验通过的提交先写入本地队列，再由后台命令批量入库。
+"""
+import logging
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Survey, Question, Response, Answer
+from .aggregates import update_question_aggregates
+from .spool import is_spool_enabled, get_spool
+
+
+logger = logging.getLogger(__name__)
+
+# 数据库连接中断、锁等待超时等暂时性错误，与具体记录无关，整批稍后重试
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+CHOICE_QUESTION_TYPES = (
+    Question.QUESTION_TYPE_SINGLE_CHOICE,
+    Question.QUESTION_TYPE_MULTIPLE_CHOICE,
+)
+
+# 评分题固定为1-5分（与填写页面保持一致）
+RATING_VALUES = {'1', '2', '3', '4', '5'}
+
+
+def collect_form_answers(compiled, data):
+    """从表单数据（QueryDict）中提取答案，字段名格式为 question_<问卷问题ID>"""
+    answers = []
+    for item in compiled.questions:
+        answer_key = f"question_{item['id']}"
+        if answer_key not in data:
+            continue
+
+        question = item['question']
+        question_type = question['question_type']
+        if question_type == Question.QUESTION_TYPE_TEXT:
+            answer_text = data[answer_key].strip()
+            answer_choice = []
+        elif question_type in (Question.QUESTION_TYPE_SINGLE_CHOICE, Question.QUESTION_TYPE_RATING):
+            answer_text = ''
+            answer_choice = [data[answer_key]] if data[answer_key] else []
+        else:
+            answer_text = ''
+            answer_choice = [value for value in data.getlist(answer_key) if value]
+
+        # 未填写的选填题不保存答案
+        if not answer_text and not answer_choice:
+            continue
+
+        answers.append({
+            'question_id': question['id'],
+            'answer_text': answer_text,
+            'answer_choice': answer_choice,
+        })
+    return answers
+
+
+def validate_answers(compiled, answers):
+    """在内存中校验答案，校验失败抛出 ValidationError"""
+    questions = {item['question']['id']: item for item in compiled.questions}
+    answered = set()
+
+    for answer in answers:
+        item = questions.get(answer['question_id'])
+        if item is None:
+            raise ValidationError(f"问题 {answer['question_id']} 不属于该问卷")
+        if answer['question_id'] in answered:
+            raise ValidationError(f"问题 {answer['question_id']} 重复回答")
+        answered.add(answer['question_id'])
+
+        question = item['question']
+        if not answer['answer_text'] and not answer['answer_choice']:
+            raise ValidationError(f"问题“{question['text'][:30]}”必须提供答案文本或选择答案")
+
+        choices = answer['answer_choice']
+        if not isinstance(choices, list):
+            choices = [choices]
+
+        if question['question_type'] in CHOICE_QUESTION_TYPES:
+            valid_values = {option['value'] for option in question['options']}
+            for choice in choices:
+                if choice not in valid_values:
+                    raise ValidationError(f"选项 '{choice}' 不在有效选项范围内")
+            if question['question_type'] == Question.QUESTION_TYPE_SINGLE_CHOICE and len(choices) > 1:
+                raise ValidationError(f"问题“{question['text'][:30]}”只能选择一个选项")
+        elif question['question_type'] == Question.QUESTION_TYPE_RATING:
+            if len(choices) != 1 or str(choices[0]) not in RATING_VALUES:
+                raise ValidationError(f"问题“{question['text'][:30]}”的评分无效")
+
+    for item in compiled.questions:
+        if item['is_required'] and item['question']['id'] not in answered:
+            raise ValidationError(f"请回答必填问题：{item['question']['text'][:30]}")
+
+
+def create_submission(survey, response_fields, answers):
+    """在一个事务内写入回答记录和全部答案（答案需已校验）"""
+    with transaction.atomic():
+        response = Response.objects.create(survey=survey, **response_fields)
+        Answer.objects.bulk_create([
+            Answer(
+                response=response,
+                question_id=answer['question_id'],
+                answer_text=answer['answer_text'],
+                answer_choice=answer['answer_choice'],
+            )
+            for answer in answers
+        ])
+        update_question_aggregates({survey.pk: answers})
+    return response
+
+
+def submit_survey(survey, response_fields, answers):
+    """
+    保存一次提交（答案需已校验），返回response_id
+
+    启用缓冲队列时只追加到本地队列并立即返回，否则直接写入数据库。
+    response_fields 只能包含可JSON序列化的字段值（如 respondent_id）。
+    """
+    if is_spool_enabled():
+        response_id = uuid.uuid4()
+        get_spool().append(response_id, {
+            'survey_id': str(survey.pk),
+            'response': response_fields,
+            'answers': answers,
+            'submitted_at': timezone.now().isoformat(),
+        })
+        return response_id
+
+    return create_submission(survey, response_fields, answers).id
+
+
+def persist_spooled_submissions(entries):
+    """
+    将缓冲队列中的一批提交写入数据库，返回新写入的回答数
+
+    已存在的回答（崩溃后重放）、已删除的问卷和问题会被跳过。
+    """
+    payloads = {entry['response_id']: entry['payload'] for entry in entries}
+    existing_ids = {
+        str(pk) for pk in Response.objects.filter(pk__in=list(payloads)).values_list('pk', flat=True)
+    }
+    survey_ids = {
+        str(pk) for pk in Survey.objects.filter(
+            pk__in={payload['survey_id'] for payload in payloads.values()}
+        ).values_list('pk', flat=True)
+    }
+    question_ids = set(Question.objects.filter(
+        pk__in={answer['question_id'] for payload in payloads.values() for answer in payload['answers']}
+    ).values_list('pk', flat=True))
+
+    responses = []
+    submit_times = []
+    answers = []
+    survey_answers = {}
+    for response_id, payload in payloads.items():
+        if response_id in existing_ids or payload['survey_id'] not in survey_ids:
+            continue
+        valid_answers = [answer for answer in payload['answers'] if answer['question_id'] in question_ids]
+        response = Response(
+            id=uuid.UUID(response_id),
+            survey_id=payload['survey_id'],
+            **payload['response']
+        )
+        responses.append(response)
+        submit_times.append(parse_datetime(payload['submitted_at']))
+        answers.extend(
+            Answer(
+                response=response,
+                question_id=answer['question_id'],
+                answer_text=answer['answer_text'],
+                answer_choice=answer['answer_choice'],
+            )
+            for answer in valid_answers
+        )
+        survey_answers.setdefault(payload['survey_id'], []).extend(valid_answers)
+
+    if not responses:
+        return 0
+
+    with transaction.atomic():
+        Response.objects.bulk_create(responses)
+        # submit_time 为 auto_now_add，插入时会被设为当前时间，这里恢复为实际提交时间
+        for response, submit_time in zip(responses, submit_times):
+            response.submit_time = submit_time
+        Response.objects.bulk_update(responses, ['submit_time'])
+        Answer.objects.bulk_create(answers)
+        update_question_aggregates(survey_answers)
+
+    return len(responses)
+
+
+def persist_spooled_batch(entries):
+    """
+    写入一批缓冲提交，返回 (新写入的回答数, [(无法写入的记录, 错误信息), ...])
+
+    整批写入失败时逐条重新写入，找出导致失败的记录，其余记录照常写入；
+    暂时性数据库错误直接抛出，由调用方稍后重试整批。
+    """
+    try:
+        return persist_spooled_submissions(entries), []
+    except TRANSIENT_DB_ERRORS:
+        raise
+    except Exception:
+        logger.warning('批量写入缓冲提交失败，逐条重试', exc_info=True)
+
+    created = 0
+    failures = []
+    for entry in entries:
+        try:
+            created += persist_spooled_submissions([entry])
+        except TRANSIENT_DB_ERRORS:
+            raise
+        except Exception as e:
+            failures.append((entry, f'{type(e).__name__}: {e}'))
+    return created, failures
@@ -0,0 +1,138 @@
+# survey/services/submit_limiter.py
+"""
+每人提交次数限制
+
+按 (问卷, 提交者) 计数，提交者依次取登录用户、微信OpenID、会话标识；
+OpenID 只取微信授权后保存在会话中的值，不使用客户端提交的 wechat_openid（可任意伪造）。
+计数优先保存在共享缓存中：键不存在时用数据库中的回答数初始化（cache.add 只有一个请求成功），
+之后每次提交原子 incr 后检查是否超限，超限或保存失败时 decr 归还名额。
+缓存不在进程间共享（本地内存缓存）或缓存出错时使用 SubmissionCounter 表：
+唯一约束保证每个提交者只有一行，条件UPDATE（count < 限制）原子地占用名额。
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F
+
+from ..models import Response, SubmissionCounter
+
+
+logger = logging.getLogger(__name__)
+
+SUBMIT_LIMIT_KEY_PREFIX = 'survey:submit_limit'
+
+# 提交者类型对应的 Response 字段（初始化计数时统计已有回答）
+IDENTITY_FIELDS = {
+    'user': 'respondent_id',
+    'openid': 'wechat_openid',
+    'session': 'session_key',
+}
+
+
+def get_submit_identity(request):
+    """获取提交者 (类型, 标识)，无法识别时返回None"""
+    if request.user.is_authenticated:
+        return ('user', str(request.user.pk))
+    wechat_openid = request.session.get('wechat_user_info', {}).get('openid')
+    if wechat_openid:
+        return ('openid', wechat_openid)
+    if request.session.session_key:
+        return ('session', request.session.session_key)
+    return None
+
+
+def _use_cache():
+    backend = getattr(settings, 'SURVEY_SUBMIT_LIMIT_BACKEND', 'auto')
+    if backend == 'auto':
+        # 本地内存缓存每个进程各有一份，不能用于跨进程计数
+        return not isinstance(caches['default'], (LocMemCache, DummyCache))
+    return backend == 'cache'
+
+
+class SubmitLimiter:
+    """一次提交的名额占用"""
+
+    def __init__(self, survey, identity):
+        self.survey = survey
+        self.identity = identity
+        self.limit = survey.limit_per_user
+        self._backend = None
+
+    @property
+    def enabled(self):
+        return self.limit > 0 and self.identity is not None
+
+    def _get_key(self):
+        kind, value = self.identity
+        return f'{SUBMIT_LIMIT_KEY_PREFIX}:{self.survey.pk}:{kind}:{value}'
+
+    def _count_responses(self):
+        kind, value = self.identity
+        return Response.objects.filter(survey=self.survey, **{IDENTITY_FIELDS[kind]: value}).count()
+
+    def acquire(self):
+        """占用一次提交名额，返回是否允许提交（未设置限制或无法识别提交者时总是允许）"""
+        if not self.enabled:
+            return True
+        if _use_cache():
+            try:
+                allowed = self._acquire_cached()
+                self._backend = 'cache' if allowed else None
+                return allowed
+            except Exception:
+                logger.exception('缓存提交计数失败，改用数据库计数')
+        allowed = self._acquire_db()
+        self._backend = 'db' if allowed else None
+        return allowed
+
+    def release(self):
+        """归还已占用的名额（保存提交失败时调用）"""
+        backend, self._backend = self._backend, None
+        if backend == 'cache':
+            try:
+                cache.decr(self._get_key())
+            except ValueError:
+                # 计数已过期，下次提交时会按数据库重新初始化
+                pass
+            except Exception:
+                logger.exception('归还提交名额失败')
+        elif backend == 'db':
+            SubmissionCounter.objects.filter(
+                survey=self.survey, identity=self._get_db_identity(), count__gt=0
+            ).update(count=F('count') - 1)
+
+    def _acquire_cached(self):
+        key = self._get_key()
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            cache.add(key, self._count_responses(), getattr(settings, 'SURVEY_SUBMIT_LIMIT_TIMEOUT', 86400))
+            count = cache.incr(key)
+        if count > self.limit:
+            cache.decr(key)
+            return False
+        return True
+
+    def _get_db_identity(self):
+        return ':'.join(self.identity)
+
+    def _try_increment(self, identity):
+        return SubmissionCounter.objects.filter(
+            survey=self.survey, identity=identity, count__lt=self.limit
+        ).update(count=F('count') + 1)
+
+    def _acquire_db(self):
+        identity = self._get_db_identity()
+        if self._try_increment(identity):
+            return True
+        if SubmissionCounter.objects.filter(survey=self.survey, identity=identity).exists():
+            return False
+        # 首次提交：按已有回答数创建计数行（并发时唯一约束保证只有一行）
+        SubmissionCounter.objects.bulk_create(
+            [SubmissionCounter(survey=self.survey, identity=identity, count=self._count_responses())],
+            ignore_conflicts=True
+        )
+        return bool(self._try_increment(identity))
@@ -0,0 +1,90 @@
+# survey/services/submit_tokens.py
+"""
+提交令牌（幂等提交）
+
+填写页为每次打开页面签发一个提交令牌，客户端也可以自行生成（请求头 X-Submit-Token 或表单字段 submit_token）。
+处理提交前先用 cache.add 占用令牌（值为处理中标记），保存成功后记录 response_id。
+网络重试等重复提交会直接返回原来的 response_id，不再写入数据库；
+原请求仍在处理中时立即返回（视图返回409，客户端稍后重试），不在 worker 中等待。
+校验失败等未保存的情况会释放令牌，修改后可以再次提交。
+多进程部署需要使用共享缓存（如 Redis），否则只能识别同一进程内的重复提交。
+"""
+import re
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+SUBMIT_TOKEN_KEY_PREFIX = 'survey:submit_token'
+SUBMIT_TOKEN_HEADER = 'HTTP_X_SUBMIT_TOKEN'
+SUBMIT_TOKEN_FIELD = 'submit_token'
+
+PENDING = '__pending__'
+
+_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def issue_submit_token():
+    """签发新的提交令牌"""
+    return secrets.token_urlsafe(16)
+
+
+def get_submit_token(request, data=None):
+    """从请求头或表单字段中获取提交令牌，格式无效时返回None"""
+    token = request.META.get(SUBMIT_TOKEN_HEADER)
+    if not token:
+        data = data if data is not None else request.POST
+        token = data.get(SUBMIT_TOKEN_FIELD)
+    if token and _TOKEN_PATTERN.match(token):
+        return token
+    return None
+
+
+class SubmitTokenGuard:
+    """一次提交对令牌的占用"""
+
+    def __init__(self, survey_id, token):
+        self.survey_id = survey_id
+        self.token = token
+        # 重复提交时为原提交的 response_id
+        self.response_id = None
+        self._claimed = False
+
+    def _get_key(self):
+        return f'{SUBMIT_TOKEN_KEY_PREFIX}:{self.survey_id}:{self.token}'
+
+    def claim(self):
+        """
+        占用令牌，返回是否需要处理本次提交（没有令牌时总是需要处理）
+
+        返回False时：response_id 不为空表示重复提交，为空表示原请求仍在处理中
+        """
+        if not self.token:
+            return True
+        key = self._get_key()
+        if cache.add(key, PENDING, getattr(settings, 'SURVEY_SUBMIT_TOKEN_PENDING_TIMEOUT', 60)):
+            self._claimed = True
+            return True
+
+        value = cache.get(key)
+        if value is None:
+            # 原请求已失败并释放令牌，重新占用
+            if cache.add(key, PENDING, getattr(settings, 'SURVEY_SUBMIT_TOKEN_PENDING_TIMEOUT', 60)):
+                self._claimed = True
+                return True
+        elif value != PENDING:
+            self.response_id = value
+        return False
+
+    def complete(self, response_id):
+        """提交保存成功，记录 response_id"""
+        if self._claimed:
+            cache.set(self._get_key(), str(response_id), getattr(settings, 'SURVEY_SUBMIT_TOKEN_TIMEOUT', 86400))
+            self._claimed = False
+
+    def abandon(self):
+        """提交未保存，释放令牌"""
+        if self._claimed:
+            cache.delete(self._get_key())
+            self._claimed = False
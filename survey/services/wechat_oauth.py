@@ -0,0 +1,182 @@
+# survey/services/wechat_oauth.py
+"""
+微信网页授权客户端
+
+进程内共享一个 requests.Session，通过连接池保持到 api.weixin.qq.com 的长连接，
+每次请求都设置连接/读取超时；只在建立连接失败时重试一次
+（授权 code 只能使用一次，读取超时后不能重发换取 access_token 的请求）。
+接口地址可通过 WECHAT_API_BASE_URL 指向本地模拟服务（见 wechat_stub）。
+
+用户信息按 openid/unionid 保存在进程内的 LRU 缓存中（有数量上限和有效期），
+近期授权过的用户只需换取 access_token，不再请求 /sns/userinfo。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+
+class WeChatOAuthError(Exception):
+    """微信授权接口调用失败"""
+
+
+class ProfileCache:
+    """微信用户信息缓存（LRU，超过 max_size 时淘汰最久未使用的记录，记录 ttl 秒后过期）"""
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            profile, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return profile
+
+    def set(self, keys, profile):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key in keys:
+                self._entries[key] = (profile, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _profile_keys(openid, unionid):
+    keys = [f'openid:{openid}']
+    if unionid:
+        keys.append(f'unionid:{unionid}')
+    return keys
+
+
+class WeChatOAuthClient:
+    """微信网页授权接口客户端（线程安全，可在多个请求间共享）"""
+
+    def __init__(self, base_url, app_id, app_secret, timeout=(3.05, 5), pool_size=10, profile_cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.timeout = timeout
+        self.profile_cache = profile_cache
+
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=1, connect=1, read=0, status=0, other=0),
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _get(self, path, params):
+        try:
+            response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+            data = response.json()
+        except requests.RequestException as e:
+            # 异常信息中的URL包含 secret，不保留原始异常
+            raise WeChatOAuthError(f'请求微信接口失败：{type(e).__name__}') from None
+        except ValueError:
+            raise WeChatOAuthError('微信接口返回的不是有效的JSON') from None
+        if data.get('errcode'):
+            raise WeChatOAuthError(f"微信接口返回错误 {data.get('errcode')}：{data.get('errmsg', '')}")
+        return data
+
+    def exchange_code(self, code):
+        """用授权 code 换取网页授权 access_token，返回包含 access_token、openid（可能有 unionid）的字典"""
+        data = self._get('/sns/oauth2/access_token', {
+            'appid': self.app_id,
+            'secret': self.app_secret,
+            'code': code,
+            'grant_type': 'authorization_code',
+        })
+        if 'access_token' not in data or 'openid' not in data:
+            raise WeChatOAuthError('微信接口未返回 access_token')
+        return data
+
+    def get_user_info(self, access_token, openid):
+        """获取用户信息（需要 snsapi_userinfo 授权）"""
+        return self._get('/sns/userinfo', {
+            'access_token': access_token,
+            'openid': openid,
+            'lang': 'zh_CN',
+        })
+
+    def fetch_user(self, code):
+        """完成一次授权，返回 {'openid', 'nickname', 'headimgurl', 'unionid'}（缓存命中时不请求用户信息）"""
+        token_data = self.exchange_code(code)
+        openid = token_data['openid']
+        unionid = token_data.get('unionid', '')
+
+        if self.profile_cache is not None:
+            for key in _profile_keys(openid, unionid):
+                profile = self.profile_cache.get(key)
+                if profile is not None:
+                    return {**profile, 'openid': openid, 'unionid': unionid or profile['unionid']}
+
+        user_data = self.get_user_info(token_data['access_token'], openid)
+        user = {
+            'openid': user_data.get('openid') or openid,
+            'nickname': user_data.get('nickname'),
+            'headimgurl': user_data.get('headimgurl'),
+            'unionid': user_data.get('unionid') or unionid,
+        }
+        if self.profile_cache is not None:
+            self.profile_cache.set(_profile_keys(user['openid'], user['unionid']), user)
+        return user
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_wechat_client():
+    """获取进程内共享的授权客户端"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = WeChatOAuthClient(
+                    getattr(settings, 'WECHAT_API_BASE_URL', 'https://api.weixin.qq.com'),
+                    settings.WECHAT_APP_ID,
+                    settings.WECHAT_APP_SECRET,
+                    timeout=getattr(settings, 'WECHAT_HTTP_TIMEOUT', (3.05, 5)),
+                    pool_size=getattr(settings, 'WECHAT_HTTP_POOL_SIZE', 10),
+                    profile_cache=ProfileCache(
+                        getattr(settings, 'WECHAT_PROFILE_CACHE_SIZE', 10000),
+                        getattr(settings, 'WECHAT_PROFILE_CACHE_TTL', 3600),
+                    ),
+                )
+    return _client
+
+
+def reset_wechat_client():
+    """关闭并丢弃共享客户端（修改接口地址等配置后调用）"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
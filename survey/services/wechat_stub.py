@@ -0,0 +1,107 @@
+# survey/services/wechat_stub.py
+"""
+微信网页授权接口的本地模拟服务
+
+实现 /sns/oauth2/access_token 和 /sns/userinfo，按授权 code 生成固定的 openid/unionid，
+可设置响应延迟以模拟微信接口变慢。用于本地联调和测试：
+将 WECHAT_API_BASE_URL 设置为 WeChatStubServer.url（或运行 wechat_oauth_stub 命令）。
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _stub_ids(code):
+    digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+    return f'stub_openid_{digest[:16]}', f'stub_unionid_{digest[:16]}'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if url.path == '/sns/oauth2/access_token':
+            code = params.get('code', '')
+            if not code or code in self.server.used_codes:
+                data = {'errcode': 40163 if code else 40029, 'errmsg': 'invalid code'}
+            else:
+                self.server.used_codes.add(code)
+                openid, unionid = _stub_ids(code)
+                data = {
+                    'access_token': f'stub_token_{openid}',
+                    'expires_in': 7200,
+                    'refresh_token': f'stub_refresh_{openid}',
+                    'openid': openid,
+                    'scope': 'snsapi_userinfo',
+                    'unionid': unionid,
+                }
+        elif url.path == '/sns/userinfo':
+            openid = params.get('openid', '')
+            if params.get('access_token') != f'stub_token_{openid}':
+                data = {'errcode': 40001, 'errmsg': 'invalid credential'}
+            else:
+                self.server.userinfo_count += 1
+                data = {
+                    'openid': openid,
+                    'nickname': f'用户{openid[-4:]}',
+                    'headimgurl': '',
+                    'unionid': f"stub_unionid_{openid[-16:]}",
+                }
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class WeChatStubServer(ThreadingHTTPServer):
+    """模拟微信授权接口的HTTP服务"""
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, verbose=False):
+        super().__init__((host, port), _StubHandler)
+        self.delay = delay
+        self.verbose = verbose
+        self.used_codes = set()
+        # 获取用户信息的次数（便于测试用户信息缓存）
+        self.userinfo_count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """在后台线程中运行，返回自身"""
+        self._thread = threading.Thread(target=self.serve_forever, name='wechat-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # 客户端超时断开后写回响应会失败，不打印堆栈
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
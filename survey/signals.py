@@ -0,0 +1,112 @@
+# survey/signals.py
+"""
+模型信号处理
+
+问卷结构（问卷问题、问题、选项、分类）变更时刷新所属问卷的 updated_at，
+使问卷编译快照按新版本重建；二维码、问卷变更时清除短代码解析记录；
+删除回答或答案时从问题统计中扣减。
+"""
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Survey, SurveyQuestion, Question, Option, Category, QRCode, Response, Answer
+from .services.aggregates import remove_answers_from_aggregates
+from .services.compiled_survey import invalidate_compiled_survey
+from .services.short_code_resolver import invalidate_short_codes
+
+
+def touch_surveys(condition):
+    """刷新符合条件的问卷更新时间（使用update，不会再次触发信号）"""
+    Survey.objects.filter(condition).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Survey)
+@receiver(post_delete, sender=Survey)
+def survey_changed(sender, instance, raw=False, **kwargs):
+    # 使用 update_fields 保存时 updated_at 可能未变化，直接删除当前版本快照
+    if not raw:
+        invalidate_compiled_survey(instance)
+        invalidate_short_codes(survey_ids=[instance.pk])
+
+
+@receiver(post_save, sender=SurveyQuestion)
+@receiver(post_delete, sender=SurveyQuestion)
+def survey_question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_surveys(Q(pk=instance.survey_id))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_surveys(Q(survey_questions__question_id=instance.pk))
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def option_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_surveys(Q(survey_questions__question_id=instance.question_id))
+
+
+# 分类删除时关联字段会被置空，需在删除前找到受影响的问卷
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch_surveys(
+            Q(survey_questions__category_id=instance.pk) |
+            Q(survey_questions__question__category_id=instance.pk)
+        )
+
+
+@receiver(post_save, sender=QRCode)
+@receiver(post_delete, sender=QRCode)
+def qrcode_changed(sender, instance, raw=False, **kwargs):
+    # 按二维码ID清除，短代码被修改时旧短代码也会失效
+    if not raw:
+        invalidate_short_codes(short_codes=[instance.short_code], qrcode_ids=[instance.pk])
+
+
+def _origin_model(origin):
+    """删除操作的发起对象（模型实例或查询集）对应的模型"""
+    if isinstance(origin, QuerySet):
+        return origin.model
+    return type(origin) if origin is not None else None
+
+
+def _remove_from_aggregates(origin, answers):
+    """扣减统计；批量删除（查询集）时每次删除只对整个查询集统计一次"""
+    if isinstance(origin, QuerySet):
+        if getattr(origin, '_aggregates_removed', False):
+            return
+        origin._aggregates_removed = True
+    remove_answers_from_aggregates(answers)
+
+
+# 删除前答案仍在数据库中；删除问卷时汇总行随之级联删除，无需扣减
+@receiver(pre_delete, sender=Response)
+def response_deleting(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Survey:
+        return
+    if isinstance(origin, QuerySet):
+        answers = Answer.objects.filter(response__in=origin.values('pk'))
+    else:
+        answers = instance.answers.all()
+    _remove_from_aggregates(origin, answers)
+
+
+# 只处理单独删除答案的情况，随回答删除的答案已由 response_deleting 扣减，
+# 随问题删除的答案其汇总行也会级联删除
+@receiver(pre_delete, sender=Answer)
+def answer_deleting(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is not Answer:
+        return
+    if isinstance(origin, QuerySet):
+        answers = Answer.objects.filter(pk__in=origin.values('pk'))
+    else:
+        answers = Answer.objects.filter(pk=instance.pk)
+    _remove_from_aggregates(origin, answers)
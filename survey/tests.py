@@ -1,3 +1,1233 @@
-from django.test import TestCase
+import atexit
+import csv
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, OperationalError, connection
+from django.http import QueryDict
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Survey, Question, Option, SurveyQuestion, Response, Answer, Category, QuestionAggregate, ChoiceAggregate,
+    QRCode, ScanEvent, ScanRollup, SubmissionCounter,
+)
+from .services import qrcode_batch, spool as spool_module
+from .services.aggregates import build_survey_aggregates, diff_survey_aggregates
+from .services.compiled_survey import get_compiled_survey, get_snapshot_key
+from .services.exporters import ResponseExporter, stream_csv, stream_jsonl, write_columnar, write_xlsx
+from .services.page_cache import get_page_key
+from .services.qrcode_images import DEFAULT_STYLE, normalize_style
+from .services.question_import import import_questions
+from .services.scan_analytics import rollup_scan_events
+from .services.scan_counter import ScanCounter
+from .services.short_code_resolver import clear_local, resolve_short_code, warm_up
+from .services.spool import SubmissionSpool
+from .services.statistics import build_survey_statistics, count_choices, count_choices_in_python
+from .services.submission import collect_form_answers, create_submission
+from .services.submit_limiter import SubmitLimiter
+from .services.submit_tokens import PENDING, SubmitTokenGuard
+from .services.wechat_oauth import ProfileCache, WeChatOAuthClient, WeChatOAuthError, reset_wechat_client
+from .services.wechat_stub import WeChatStubServer
+from .utils.short_codes import QRCODE_ALPHABET, ShortCodeAllocator, allocate_qrcode_short_codes
+from .views.wechat import AsyncWeChatCallbackView
+
+
+def create_survey(user, title='满意度调查', **kwargs):
+    """创建包含单选、多选、评分、文本（选填）四道题的问卷"""
+    survey = Survey.objects.create(title=title, created_by=user, **kwargs)
+    category = Category.objects.get_or_create(name='基本信息', slug='basic')[0]
+    for order, (question_type, is_required) in enumerate([
+        (Question.QUESTION_TYPE_SINGLE_CHOICE, True),
+        (Question.QUESTION_TYPE_MULTIPLE_CHOICE, True),
+        (Question.QUESTION_TYPE_RATING, True),
+        (Question.QUESTION_TYPE_TEXT, False),
+    ]):
+        question = Question.objects.create(
+            text=f'{title}问题{order}', question_type=question_type, category=category, created_by=user
+        )
+        if question.is_choice_question:
+            Option.objects.bulk_create([
+                Option(question=question, value=value, label=f'选项{value}', order=index)
+                for index, value in enumerate(['a', 'b', 'c'])
+            ])
+        SurveyQuestion.objects.create(survey=survey, question=question, order=order, is_required=is_required)
+    survey.refresh_from_db()
+    return survey
+
+
+def form_data(survey, **overrides):
+    """生成一份有效的问卷表单数据"""
+    data = {}
+    for item in survey.survey_questions.select_related('question').order_by('order'):
+        value = {
+            Question.QUESTION_TYPE_SINGLE_CHOICE: 'a',
+            Question.QUESTION_TYPE_MULTIPLE_CHOICE: ['a', 'c'],
+            Question.QUESTION_TYPE_RATING: '4',
+            Question.QUESTION_TYPE_TEXT: '很好',
+        }[item.question.question_type]
+        data[f'question_{item.id}'] = overrides.get(item.question.question_type, value)
+    return data
+
+
+def create_response(survey, session_key='', **overrides):
+    """不经过视图直接保存一份回答"""
+    data = QueryDict(mutable=True)
+    for key, value in form_data(survey, **overrides).items():
+        data.setlist(key, value if isinstance(value, list) else [value])
+    answers = collect_form_answers(get_compiled_survey(survey), data)
+    return create_submission(survey, {'session_key': session_key}, answers)
+
+
+def create_scan_counter(test, **kwargs):
+    """创建独立的扫描计数缓冲，测试结束时只停止后台线程，不在测试数据库销毁后写入"""
+    counter = ScanCounter(**kwargs)
+
+    def stop():
+        atexit.unregister(counter.stop)
+        counter._stopped.set()
+        counter._wakeup.set()
+        if counter._thread is not None:
+            counter._thread.join(5)
+
+    test.addCleanup(stop)
+    return counter
+
+
+class CompiledSurveyTests(TestCase):
+    """问卷编译快照"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_is_cached(self):
+        compiled = get_compiled_survey(self.survey)
+        self.assertEqual(len(compiled), 4)
+        self.assertEqual(compiled.categories, [{'id': compiled.questions[0]['category']['id'], 'name': '基本信息'}])
+        self.assertEqual(
+            [option['value'] for option in compiled.questions[0]['question']['options']], ['a', 'b', 'c']
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(get_compiled_survey(self.survey).questions, compiled.questions)
+
+    def test_structure_change_bumps_version(self):
+        old_key = get_snapshot_key(self.survey)
+        get_compiled_survey(self.survey)
+        question = self.survey.survey_questions.order_by('order')[0].question
+        Option.objects.create(question=question, value='d', label='选项d', order=3)
+
+        self.survey.refresh_from_db()
+        self.assertNotEqual(get_snapshot_key(self.survey), old_key)
+        options = get_compiled_survey(self.survey).questions[0]['question']['options']
+        self.assertEqual([option['value'] for option in options], ['a', 'b', 'c', 'd'])
+
+    def test_detail_page_renders_questions(self):
+        response = self.client.get(reverse('survey-detail', args=[self.survey.pk]))
+        self.assertEqual(response.status_code, 200)
+        for item in get_compiled_survey(self.survey).questions:
+            self.assertContains(response, item['question']['text'])
+
+
+class PageCacheTests(TestCase):
+    """问卷填写页整页缓存"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_is_cached_and_placeholders_filled(self):
+        url = reverse('survey-detail', args=[self.survey.pk])
+        first = self.client.get(url).content.decode()
+        self.assertIsNotNone(cache.get(get_page_key(self.survey, False)))
+        second = self.client.get(url).content.decode()
+
+        for html in (first, second):
+            self.assertNotIn('__SURVEY_', html)
+        # 每次请求的提交令牌不同
+        self.assertNotEqual(first, second)
+        self.assertIsNone(cache.get(get_page_key(self.survey, True)))
+
+    def test_wechat_page_cached_separately(self):
+        url = reverse('survey-detail', args=[self.survey.pk])
+        self.client.get(url, HTTP_USER_AGENT='Mozilla/5.0 MicroMessenger/8.0')
+        self.assertIsNotNone(cache.get(get_page_key(self.survey, True)))
+        self.assertIsNone(cache.get(get_page_key(self.survey, False)))
+
+    def test_structure_change_renders_new_page(self):
+        url = reverse('survey-detail', args=[self.survey.pk])
+        self.client.get(url)
+        question = self.survey.survey_questions.order_by('order')[0].question
+        question.text = '修改后的问题'
+        question.save()
+        self.assertContains(self.client.get(url), '修改后的问题')
+
+
+class SubmitSurveyTests(TestCase):
+    """问卷提交校验与写入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('submit-survey', args=[self.survey.pk])
+
+    def test_submit_writes_response_and_answers(self):
+        response = self.client.post(self.url, form_data(self.survey))
+        self.assertEqual(response.status_code, 200)
+        saved = Response.objects.get(pk=response.json()['response_id'])
+        self.assertEqual(
+            sorted(saved.answers.values_list('question__question_type', 'answer_choice', 'answer_text')),
+            sorted([
+                ('multiple_choice', ['a', 'c'], ''),
+                ('rating', ['4'], ''),
+                ('single_choice', ['a'], ''),
+                ('text', [], '很好'),
+            ])
+        )
+
+    def test_invalid_answers_are_rejected(self):
+        for overrides in ({'single_choice': 'x'}, {'single_choice': ''}, {'rating': '9'}):
+            response = self.client.post(self.url, form_data(self.survey, **overrides))
+            self.assertEqual(response.status_code, 400, overrides)
+        self.assertFalse(Response.objects.exists())
+
+    def test_optional_question_can_be_skipped(self):
+        response = self.client.post(self.url, form_data(self.survey, text=''))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_completion_time_is_bounded(self):
+        for value, expected in (('inf', 0), ('-inf', 0), ('nan', 0), ('abc', 0), ('-5', 0), ('1e9', 86400), ('42.7', 42)):
+            response = self.client.post(self.url, {**form_data(self.survey), 'completion_time': value})
+            self.assertEqual(response.status_code, 200, value)
+            self.assertEqual(Response.objects.get(pk=response.json()['response_id']).completion_time, expected, value)
+
+
+class QuestionAggregateTests(TestCase):
+    """问题统计汇总的增量维护、删除扣减和重建"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, **overrides):
+        response = self.client.post(
+            reverse('submit-survey', args=[self.survey.pk]), form_data(self.survey, **overrides)
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['response_id']
+
+    def get_stats(self):
+        stats = self.client.get(reverse('survey-stats', args=[self.survey.pk])).json()
+        return {item['question_type']: item for item in stats['question_stats']}
+
+    def assert_consistent(self):
+        self.assertEqual(diff_survey_aggregates(self.survey, build_survey_aggregates(self.survey)), [])
+
+    def test_submissions_are_counted(self):
+        self.submit()
+        self.submit(single_choice='b', multiple_choice=['a'], rating='5', text='')
+        stats = self.get_stats()
+        self.assertEqual(stats['single_choice']['total_answers'], 2)
+        self.assertEqual(stats['single_choice']['options'], {'a': 1, 'b': 1})
+        self.assertEqual(stats['multiple_choice']['options'], {'a': 2, 'c': 1})
+        self.assertEqual(stats['rating']['ratings'], {'4': 1, '5': 1})
+        self.assertEqual(stats['text']['total_answers'], 1)
+        self.assert_consistent()
+
+    def test_deleting_response_decrements_counts(self):
+        first = self.submit()
+        self.submit(single_choice='b')
+        Response.objects.get(pk=first).delete()
+        stats = self.get_stats()
+        self.assertEqual(stats['single_choice']['total_answers'], 1)
+        self.assertEqual(stats['single_choice']['options'], {'b': 1})
+        self.assert_consistent()
+
+    def test_bulk_delete_decrements_once(self):
+        deleted = [self.submit() for _ in range(3)]
+        self.submit(single_choice='c')
+        Response.objects.filter(pk__in=deleted).delete()
+        self.assertEqual(self.get_stats()['single_choice']['options'], {'c': 1})
+        self.assert_consistent()
+
+    def test_deleting_single_answer_decrements_counts(self):
+        self.submit()
+        Answer.objects.get(question__question_type='rating').delete()
+        stats = self.get_stats()
+        self.assertEqual(stats['rating']['total_answers'], 0)
+        self.assertEqual(stats['rating']['ratings'], {})
+        self.assertEqual(stats['single_choice']['total_answers'], 1)
+        self.assert_consistent()
+
+    def test_rebuild_check_and_repair(self):
+        self.submit()
+        ChoiceAggregate.objects.filter(value='a').update(count=10)
+
+        output = io.StringIO()
+        call_command('rebuild_survey_aggregates', check=True, stdout=output)
+        self.assertIn('不一致', output.getvalue())
+
+        call_command('rebuild_survey_aggregates', stdout=io.StringIO())
+        self.assert_consistent()
+        self.assertEqual(self.get_stats()['single_choice']['options'], {'a': 1})
+        self.assertEqual(QuestionAggregate.objects.filter(survey=self.survey).count(), 4)
+
+class SurveyStatisticsTests(TestCase):
+    """后台问卷统计（数据库分组计算）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+        cls.other_survey = create_survey(cls.admin, title='其他问卷')
+        create_response(cls.survey)
+        create_response(cls.survey, single_choice='b', multiple_choice=['b', 'c'], rating='5', text='一般')
+        create_response(cls.survey, rating='5', text='')
+        create_response(cls.other_survey)
+
+    def test_statistics(self):
+        stats = {item['type']: item for item in build_survey_statistics(self.survey)}
+        self.assertEqual(stats['single_choice']['answer_count'], 3)
+        self.assertEqual(
+            {value: item['count'] for value, item in stats['single_choice']['data'].items()},
+            {'a': 2, 'b': 1, 'c': 0}
+        )
+        self.assertEqual(
+            {value: item['count'] for value, item in stats['multiple_choice']['data'].items()},
+            {'a': 2, 'b': 1, 'c': 3}
+        )
+        self.assertEqual(stats['rating']['data']['5'], {'count': 2, 'percentage': 2 / 3 * 100})
+        self.assertEqual(sorted(stats['text']['data']), ['一般', '很好'])
+
+    def test_database_counts_match_python_fallback(self):
+        question_ids = list(self.survey.survey_questions.values_list('question_id', flat=True))
+        self.assertEqual(count_choices(self.survey, question_ids), count_choices_in_python(self.survey, question_ids))
+
+    def test_query_count_does_not_depend_on_answers(self):
+        # 问题、选项、回答数、选项计数（含保存点）、文本样本
+        with self.assertNumQueries(7):
+            build_survey_statistics(self.survey)
+        for _ in range(5):
+            create_response(self.survey)
+        with self.assertNumQueries(7):
+            build_survey_statistics(self.survey)
+
+    def test_admin_statistics_page(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:survey_statistics', args=[self.survey.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '选项a')
+
+class ResponseExportTests(TestCase):
+    """回答导出（CSV、Excel、JSON Lines）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+        cls.responses = [
+            create_response(cls.survey),
+            create_response(cls.survey, single_choice='b', multiple_choice=['b'], text=''),
+            create_response(cls.survey, rating='1'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def read_csv(self, exporter):
+        return list(csv.reader(io.StringIO(''.join(stream_csv(exporter)).lstrip('\ufeff'))))
+
+    def test_csv_rows(self):
+        rows = self.read_csv(ResponseExporter(self.survey, chunk_size=1))
+        self.assertEqual(len(rows[0]), 6 + 4)
+        self.assertEqual([row[0] for row in rows[1:]], [str(response.pk) for response in self.responses])
+        self.assertEqual(rows[1][6:], ['选项a', '选项a; 选项c', '4', '很好'])
+        self.assertEqual(rows[2][6:], ['选项b', '选项b', '4', ''])
+
+    def test_jsonl_rows(self):
+        exporter = ResponseExporter(self.survey)
+        records = [json.loads(line) for line in stream_jsonl(exporter)]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(list(records[0]), exporter.headers)
+        self.assertEqual(records[2][exporter.headers[8]], '1')
+
+    @skipUnless(importlib.util.find_spec('openpyxl'), '需要 openpyxl')
+    def test_xlsx_rows(self):
+        from openpyxl import load_workbook
+
+        output = io.BytesIO()
+        write_xlsx(ResponseExporter(self.survey), output)
+        output.seek(0)
+        rows = list(load_workbook(output, read_only=True).active.values)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][6], '选项a')
+
+    def test_admin_csv_action_streams(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:survey_survey_changelist'), {
+            'action': 'export_responses_csv',
+            '_selected_action': [self.survey.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(len(list(csv.reader(io.StringIO(content)))), 4)
+
+@skipUnless(importlib.util.find_spec('pyarrow'), '需要 pyarrow')
+class ColumnarExportTests(TestCase):
+    """Parquet/Feather 导出和增量导出水位"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+        create_response(cls.survey)
+        create_response(cls.survey, single_choice='c', multiple_choice=['b'], rating='2', text='')
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = directory
+
+    def test_parquet_column_types(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.directory, 'responses.parquet')
+        count, watermark = write_columnar(ResponseExporter(self.survey, chunk_size=1), path, 'parquet')
+        self.assertEqual(count, 2)
+        self.assertEqual(watermark, Response.objects.order_by('created_at').last().created_at)
+
+        table = pq.read_table(path)
+        single, multiple, rating, text = table.column_names[4:]
+        self.assertTrue(pa.types.is_dictionary(table.schema.field(single).type))
+        self.assertEqual(table.column(single).to_pylist(), ['选项a', '选项c'])
+        self.assertEqual(table.column(multiple).to_pylist(), [['选项a', '选项c'], ['选项b']])
+        self.assertEqual(table.column(rating).to_pylist(), [4, 2])
+        self.assertEqual(table.column(text).to_pylist(), ['很好', None])
+
+    def test_feather_roundtrip(self):
+        import pyarrow.feather as feather
+
+        path = os.path.join(self.directory, 'responses.feather')
+        write_columnar(ResponseExporter(self.survey), path, 'feather')
+        self.assertEqual(feather.read_table(path).num_rows, 2)
+
+    @override_settings(SURVEY_EXPORT_SETTLE_SECONDS=0)
+    def test_command_incremental_export(self):
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.directory, 'all.parquet')
+        output = io.StringIO()
+        call_command('export_survey_responses', str(self.survey.pk), format='parquet', output=path, stdout=output)
+        since = output.getvalue().split('--since ')[1].split()[0]
+
+        new = create_response(self.survey)
+        path = os.path.join(self.directory, 'new.parquet')
+        call_command(
+            'export_survey_responses', str(self.survey.pk), format='parquet', output=path, since=since,
+            stdout=io.StringIO()
+        )
+        self.assertEqual(pq.read_table(path).column('response_id').to_pylist(), [str(new.pk)])
+
+class SubmissionSpoolTests(TestCase):
+    """提交缓冲队列及写入命令"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.spool_path = os.path.join(directory, 'submissions.sqlite3')
+        self.dead_letter_path = os.path.join(directory, 'dead_letter.jsonl')
+        settings_override = override_settings(
+            SURVEY_SUBMIT_SPOOL=True,
+            SURVEY_SPOOL_PATH=self.spool_path,
+            SURVEY_SPOOL_DEAD_LETTER_PATH=self.dead_letter_path,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.object(spool_module, '_spool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submit(self):
+        response = self.client.post(reverse('submit-survey', args=[self.survey.pk]), form_data(self.survey))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['response_id']
+
+    def drain(self):
+        call_command('drain_submission_spool', once=True, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_submit_is_spooled_then_drained(self):
+        response_id = self.submit()
+        self.assertFalse(Response.objects.exists())
+        self.assertEqual(SubmissionSpool(self.spool_path).stats()['depth'], 1)
+
+        self.drain()
+        saved = Response.objects.get(pk=response_id)
+        self.assertEqual(saved.answers.count(), 4)
+        self.assertLessEqual(saved.submit_time, saved.created_at)
+        self.assertEqual(SubmissionSpool(self.spool_path).stats()['depth'], 0)
+
+        # 重放同一批次不会重复写入
+        SubmissionSpool(self.spool_path).append(response_id, {
+            'survey_id': str(self.survey.pk), 'response': {}, 'answers': [],
+            'submitted_at': timezone.now().isoformat(),
+        })
+        self.drain()
+        self.assertEqual(Response.objects.count(), 1)
+
+    def test_incremental_export_includes_late_drained_responses(self):
+        spooled_id = self.submit()
+        # 队列写入前，另一个回答已直接入库并被导出
+        with override_settings(SURVEY_SUBMIT_SPOOL=False):
+            direct_id = self.submit()
+        exporter = ResponseExporter(self.survey)
+        self.assertEqual([str(row['id']) for row, _ in exporter.iter_records()], [direct_id])
+
+        self.drain()
+        spooled = Response.objects.get(pk=spooled_id)
+        self.assertLess(spooled.submit_time, Response.objects.get(pk=direct_id).submit_time)
+        records = ResponseExporter(self.survey, since=exporter.watermark).iter_records()
+        self.assertEqual([str(row['id']) for row, _ in records], [spooled_id])
+
+    def test_failing_entry_moves_to_dead_letter(self):
+        good_id = self.submit()
+        SubmissionSpool(self.spool_path).append('00000000-0000-0000-0000-000000000001', {
+            'survey_id': str(self.survey.pk),
+            'response': {'unknown_field': 1},
+            'answers': [],
+            'submitted_at': timezone.now().isoformat(),
+        })
+
+        with self.assertLogs('survey.services.submission', 'WARNING'):
+            self.drain()
+        self.assertTrue(Response.objects.filter(pk=good_id).exists())
+        self.assertEqual(SubmissionSpool(self.spool_path).stats()['depth'], 0)
+        with open(self.dead_letter_path, encoding='utf-8') as f:
+            dead_letters = [json.loads(line) for line in f]
+        self.assertEqual([item['response_id'] for item in dead_letters], ['00000000-0000-0000-0000-000000000001'])
+        self.assertIn('TypeError', dead_letters[0]['error'])
+
+    def test_transient_error_keeps_batch(self):
+        self.submit()
+        with mock.patch(
+            'survey.services.submission.persist_spooled_submissions', side_effect=OperationalError('gone away')
+        ):
+            with self.assertRaises(CommandError):
+                self.drain()
+        self.assertEqual(SubmissionSpool(self.spool_path).stats()['depth'], 1)
+        self.assertFalse(os.path.exists(self.dead_letter_path))
+
+class QuestionImportTests(TestCase):
+    """问题库批量导入：按批写入，出错的行单独记录"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def upload(self, rows):
+        content = '问题文本,问题类型,分类,选项\n' + ''.join(f'{",".join(row)}\n' for row in rows)
+        return SimpleUploadedFile('questions.csv', content.encode('utf-8-sig'))
+
+    def test_imports_questions_options_and_categories(self):
+        result = import_questions(self.upload([
+            ('你的性别', '单选题', '基本信息', '男;女'),
+            ('你的建议', '文本题', '', ''),
+            ('', '文本题', '', ''),
+        ]), self.admin, batch_size=2)
+        self.assertEqual(result.created_count, 2)
+        self.assertEqual(result.error_messages(), ['第4行导入失败: 问题文本不能为空'])
+        question = Question.objects.get(text='你的性别')
+        self.assertEqual(question.category.name, '基本信息')
+        self.assertEqual(list(question.options.values_list('label', flat=True)), ['男', '女'])
+
+    def test_category_slug_conflict_is_row_error(self):
+        Category.objects.create(name='个人资料', slug='联系方式')
+        result = import_questions(self.upload([
+            ('你的性别', '单选题', '联系方式', '男;女'),
+            ('你的建议', '文本题', '个人资料', ''),
+        ]), self.admin)
+        self.assertEqual(result.created_count, 1)
+        self.assertEqual(result.errors[0][0], 2)
+        self.assertIn('分类标识', result.errors[0][1])
+        self.assertFalse(Question.objects.filter(text='你的性别').exists())
+        self.assertFalse(Question.objects.filter(category__isnull=True).exists())
+
+    def test_database_error_only_fails_bad_row(self):
+        bulk_create = Option.objects.bulk_create
+
+        def failing_bulk_create(objs, *args, **kwargs):
+            if any(option.label == '坏' for option in objs):
+                raise DatabaseError('选项写入失败')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Option.objects, 'bulk_create', side_effect=failing_bulk_create):
+            result = import_questions(self.upload([
+                ('问题一', '单选题', '', '好;坏'),
+                ('问题二', '单选题', '', '是;否'),
+                ('问题三', '文本题', '', ''),
+            ]), self.admin)
+        self.assertEqual(result.created_count, 2)
+        self.assertEqual(result.error_messages(), ['第2行导入失败: 选项写入失败'])
+        self.assertEqual(
+            sorted(Question.objects.values_list('text', flat=True)), ['问题三', '问题二']
+        )
+        self.assertEqual(Option.objects.count(), 2)
+
+
+    def test_bulk_insert_without_returned_pks(self):
+        # MySQL 不返回批量插入的主键：语句数量不随选择题数量增加
+        query_counts = []
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            for count in (2, 6):
+                rows = [(f'问题{count}', '单选题', '基本信息', f'是{i};否{i}') for i in range(count)]
+                with CaptureQueriesContext(connection) as queries:
+                    result = import_questions(self.upload(rows), self.admin)
+                self.assertEqual(result.created_count, count)
+                query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+        for question in Question.objects.filter(text='问题6').order_by('pk'):
+            self.assertEqual(len(question.options.all()), 2)
+        self.assertEqual(
+            list(Question.objects.filter(text='问题6').order_by('pk').values_list('options__label', flat=True)[::2]),
+            [f'是{i}' for i in range(6)]
+        )
+
+class QRCodeImageTests(TestCase):
+    """二维码图片：样式只能取固定的可选值，磁盘缓存按二维码限制数量"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+        cls.qrcode = QRCode.objects.create(survey=cls.survey, name='前台', short_code='front01')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_normalize_style(self):
+        self.assertEqual(normalize_style({}), DEFAULT_STYLE)
+        style = normalize_style({
+            'fill_color': '00F', 'back_color': 'White', 'version': '40', 'box_size': '13',
+            'border': '100', 'error_correction': 'q',
+        })
+        self.assertEqual(style, {
+            'version': 10, 'error_correction': 'Q', 'box_size': 12, 'border': 8,
+            'fill_color': '#0000ff', 'back_color': '#ffffff',
+        })
+        # 调色板以外的颜色使用默认值
+        style = normalize_style({'fill_color': '#123456', 'back_color': 'pink', 'box_size': 'big'})
+        self.assertEqual(
+            (style['fill_color'], style['back_color'], style['box_size']), ('#000000', '#ffffff', 10)
+        )
+
+    def test_image_is_cached_with_etag(self):
+        url = reverse('qrcode-image', args=[self.qrcode.short_code])
+        with override_settings(SURVEY_QRCODE_CACHE_DIR=self.directory):
+            response = self.client.get(url, {'fill_color': 'blue'})
+            self.assertEqual(response['Content-Type'], 'image/png')
+            self.assertEqual(len(os.listdir(os.path.join(self.directory, 'front01'))), 1)
+            response = self.client.get(url, {'fill_color': 'blue'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('qrcode-image', args=['missing'])).status_code, 404)
+
+    def test_disk_cache_is_capped_per_code(self):
+        url = reverse('qrcode-image', args=[self.qrcode.short_code])
+        with override_settings(SURVEY_QRCODE_CACHE_DIR=self.directory, SURVEY_QRCODE_DISK_CACHE_LIMIT=3):
+            for border in (0, 1, 2, 4, 6):
+                self.assertEqual(self.client.get(url, {'border': border}).status_code, 200)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'front01'))), 3)
+
+
+class ScanCounterTests(TestCase):
+    """扫描计数缓冲：扫描只累加进程内计数，由后台线程批量写入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+        cls.qrcode = QRCode.objects.create(survey=cls.survey, name='前台', short_code='front01')
+
+    def test_threshold_wakes_background_thread(self):
+        counter = create_scan_counter(self, flush_interval=60, flush_threshold=3)
+        flushed = threading.Event()
+        flush_threads = []
+
+        def flush():
+            flush_threads.append(threading.current_thread().name)
+            flushed.set()
+
+        with mock.patch.object(counter, 'flush', side_effect=flush):
+            for _ in range(3):
+                counter.record_scan(self.qrcode.pk, 'front01')
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(flush_threads, ['scan-counter-flush'])
+
+    def test_flush_writes_counts_and_events(self):
+        counter = create_scan_counter(self, flush_interval=60, flush_threshold=1000)
+        counter.record_scan(self.qrcode.pk, 'front01', is_wechat=True, ip_bucket='10.0.0.0/24')
+        counter.record_scan(self.qrcode.pk, 'front01')
+        counter.increment(self.qrcode.pk, 3)
+        self.assertEqual(counter.get_live_count(self.qrcode), 5)
+
+        self.assertEqual(counter.flush(), 5)
+        self.qrcode.refresh_from_db()
+        self.assertEqual(self.qrcode.scan_count, 5)
+        self.assertEqual(counter.pending(self.qrcode.pk), 0)
+        self.assertEqual(counter.get_live_count(self.qrcode), 5)
+        self.assertEqual(
+            sorted(self.qrcode.scan_events.values_list('is_wechat', 'ip_bucket')),
+            [(False, ''), (True, '10.0.0.0/24')]
+        )
+
+    def test_failed_flush_keeps_counts(self):
+        counter = create_scan_counter(self, flush_interval=60, flush_threshold=1000)
+        counter.increment(self.qrcode.pk, 2)
+        with mock.patch.object(QRCode.objects, 'filter', side_effect=OperationalError), \
+                self.assertLogs('survey.services.scan_counter', 'ERROR'):
+            self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter.pending(self.qrcode.pk), 2)
+
+
+class ScanEventTests(TestCase):
+    """扫描记录：跳转请求只写入进程内缓冲，汇总按分钟/小时/天"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+        cls.qrcode = QRCode.objects.create(survey=cls.survey, name='前台', short_code='front01')
+
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.addCleanup(clear_local)
+
+    def test_redirect_does_not_write_scan_events(self):
+        counter = create_scan_counter(self, flush_interval=60, flush_threshold=1)
+        url = reverse('qrcode-redirect', args=['front01'])
+        with mock.patch('survey.views.qrcode.scan_counter', counter), \
+                mock.patch.object(counter, 'flush') as flush, \
+                mock.patch.object(ScanEvent.objects, 'bulk_create') as bulk_create:
+            response = self.client.get(url, HTTP_USER_AGENT='MicroMessenger', REMOTE_ADDR='192.168.1.20')
+            self.assertRedirects(response, reverse('survey-detail', args=[self.survey.pk]), fetch_redirect_response=False)
+            bulk_create.assert_not_called()
+        self.assertEqual(counter.pending(self.qrcode.pk), 1)
+        self.assertEqual(list(counter._events)[0][3:], (True, '192.168.1.0/24'))
+
+    def test_pending_events_are_bounded(self):
+        counter = create_scan_counter(self, flush_interval=60, flush_threshold=1000, max_pending_events=2)
+        for ip_bucket in ('1.1.1.0/24', '2.2.2.0/24', '3.3.3.0/24'):
+            counter.record_scan(self.qrcode.pk, 'front01', ip_bucket=ip_bucket)
+        self.assertEqual(counter.flush(), 3)
+        self.assertEqual(
+            sorted(ScanEvent.objects.values_list('ip_bucket', flat=True)), ['2.2.2.0/24', '3.3.3.0/24']
+        )
+
+    def test_rollup_scan_events(self):
+        start = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        ScanEvent.objects.bulk_create([
+            ScanEvent(qrcode=self.qrcode, short_code='front01', scanned_at=start + offset, is_wechat=is_wechat)
+            for offset, is_wechat in [
+                (timedelta(seconds=5), True),
+                (timedelta(seconds=40), False),
+                (timedelta(minutes=1), True),
+                (timedelta(hours=1), False),
+            ]
+        ])
+        self.assertEqual(rollup_scan_events(since=start), {'minute': 3, 'hour': 2, 'day': 1})
+
+        def rollups(granularity):
+            return list(ScanRollup.objects.filter(granularity=granularity).order_by('bucket_start').values_list(
+                'scan_count', 'wechat_count'
+            ))
+
+        self.assertEqual(rollups('minute'), [(2, 1), (1, 1), (1, 0)])
+        self.assertEqual(rollups('hour'), [(3, 2), (1, 0)])
+        self.assertEqual(rollups('day'), [(4, 2)])
+
+        # 重复汇总同一时间段结果不变
+        snapshot = list(ScanRollup.objects.order_by('pk').values_list(
+            'pk', 'granularity', 'bucket_start', 'scan_count', 'wechat_count'
+        ))
+        self.assertEqual(rollup_scan_events(since=start), {'minute': 3, 'hour': 2, 'day': 1})
+        rollup_scan_events()
+        self.assertEqual(list(ScanRollup.objects.order_by('pk').values_list(
+            'pk', 'granularity', 'bucket_start', 'scan_count', 'wechat_count'
+        )), snapshot)
+
+    def test_rollup_upsert_without_conflict_target(self):
+        ScanEvent.objects.create(qrcode=self.qrcode, short_code='front01', scanned_at=timezone.now())
+        # MySQL 不支持 unique_fields，按唯一索引更新
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(ScanRollup.objects, 'bulk_create') as bulk_create:
+            rollup_scan_events()
+        self.assertEqual(bulk_create.call_count, 3)
+        for call in bulk_create.call_args_list:
+            self.assertTrue(call.kwargs['update_conflicts'])
+            self.assertNotIn('unique_fields', call.kwargs)
+
+
+class ShortCodeResolverTests(TestCase):
+    """短代码解析表：命中时不查询数据库，二维码、问卷变更时失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+        cls.qrcode = QRCode.objects.create(survey=cls.survey, name='前台', short_code='front01')
+
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.addCleanup(clear_local)
+
+    def test_resolve_is_cached_locally_and_shared(self):
+        with self.assertNumQueries(1):
+            target = resolve_short_code('front01')
+        self.assertEqual(target, (self.qrcode.pk, str(self.survey.pk), False))
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_short_code('front01'), target)
+        # 其他进程（本地表为空）从共享缓存读取
+        clear_local()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_short_code('front01'), target)
+
+    def test_missing_short_code_is_not_cached(self):
+        self.assertIsNone(resolve_short_code('missing'))
+        QRCode.objects.create(survey=self.survey, name='后门', short_code='missing')
+        self.assertIsNotNone(resolve_short_code('missing'))
+
+    def test_changes_invalidate(self):
+        resolve_short_code('front01')
+        self.survey.require_wechat = True
+        self.survey.save()
+        self.assertTrue(resolve_short_code('front01').require_wechat)
+
+        self.qrcode.delete()
+        self.assertIsNone(resolve_short_code('front01'))
+
+    def test_warm_up(self):
+        self.assertEqual(warm_up(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_short_code('front01').qrcode_id, self.qrcode.pk)
+
+
+class QRCodeBatchTests(TestCase):
+    """批量生成二维码：后台在请求线程中渲染，管理命令使用 spawn 进程池"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+
+    def test_admin_zip_renders_in_thread(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:survey_generate_qrcodes', args=[self.survey.pk])
+        with mock.patch.object(qrcode_batch, 'ProcessPoolExecutor') as executor:
+            response = self.client.post(url, {'count': 3, 'prefix': '门店', 'output_format': 'zip'})
+            content = b''.join(response.streaming_content)
+        executor.assert_not_called()
+
+        short_codes = sorted(QRCode.objects.filter(survey=self.survey).values_list('short_code', flat=True))
+        self.assertEqual(len(short_codes), 3)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(sorted(archive.namelist()), [f'{code}.png' for code in short_codes])
+        self.assertEqual(
+            sorted(QRCode.objects.values_list('name', flat=True)), ['门店-0001', '门店-0002', '门店-0003']
+        )
+
+    def test_command_uses_spawn_pool(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'qrcodes.zip')
+        call_command(
+            'generate_qrcodes', str(self.survey.pk), count=3, workers=2, output=path, stdout=io.StringIO()
+        )
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+            self.assertEqual(archive.read(archive.namelist()[0])[:8], b'\x89PNG\r\n\x1a\n')
+
+
+class ShortCodeAllocatorTests(TestCase):
+    """短代码分配器：序号置换后编码，不重复且剔除已存在的代码"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = create_survey(cls.admin)
+
+    def test_codes_are_unique_fixed_length(self):
+        allocator = ShortCodeAllocator('test', QRCODE_ALPHABET, 3)
+        codes = allocator.allocate(500) + allocator.allocate(500)
+        self.assertEqual(len(set(codes)), 1000)
+        self.assertTrue(all(len(code) == 3 and set(code) <= set(QRCODE_ALPHABET) for code in codes))
+
+    def test_exhausted_capacity(self):
+        allocator = ShortCodeAllocator('test', 'ab', 2, prefix='x')
+        self.assertEqual(sorted(allocator.allocate(4)), ['xaa', 'xab', 'xba', 'xbb'])
+        with self.assertRaises(ValueError):
+            allocator.allocate(1)
+
+    def test_existing_qrcode_short_codes_are_skipped(self):
+        first = ShortCodeAllocator('qrcode', QRCODE_ALPHABET, 8).encode(
+            ShortCodeAllocator('qrcode', QRCODE_ALPHABET, 8).permute(0)
+        )
+        QRCode.objects.create(survey=self.survey, name='旧代码', short_code=first)
+        codes = allocate_qrcode_short_codes(3)
+        self.assertEqual(len(set(codes)), 3)
+        self.assertNotIn(first, codes)
+
+    def test_api_assigns_short_code(self):
+        self.client.force_login(self.admin)
+        response = self.client.post('/api/qrcodes/', {'survey_id': str(self.survey.pk), 'name': '前台'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(QRCode.objects.get(name='前台').short_code), 8)
+
+
+class SubmitLimiterTests(TestCase):
+    """每人提交次数限制：按登录用户、会话中的微信OpenID或会话计数"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user, limit_per_user=2)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('submit-survey', args=[self.survey.pk])
+
+    def login_wechat(self, client, openid):
+        session = client.session
+        session['wechat_user_info'] = {'openid': openid}
+        session.save()
+
+    @override_settings(SURVEY_SUBMIT_LIMIT_BACKEND='cache')
+    def test_client_supplied_openid_is_ignored(self):
+        session = self.client.session
+        session.save()
+        statuses = [
+            self.client.post(self.url, {**form_data(self.survey), 'wechat_openid': f'forged-{index}'}).status_code
+            for index in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 403])
+
+    @override_settings(SURVEY_SUBMIT_LIMIT_BACKEND='db')
+    def test_session_openid_is_shared_across_sessions(self):
+        statuses = []
+        for _ in range(3):
+            self.client.logout()
+            self.login_wechat(self.client, 'openid-1')
+            statuses.append(self.client.post(self.url, form_data(self.survey)).status_code)
+        self.assertEqual(statuses, [200, 200, 403])
+        self.assertEqual(SubmissionCounter.objects.get().identity, 'openid:openid-1')
+
+    def assert_limit(self):
+        # 已有一份回答，限制2次时只能再占用一次名额
+        Response.objects.create(survey=self.survey, wechat_openid='openid-1')
+        limiter = SubmitLimiter(self.survey, ('openid', 'openid-1'))
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(SubmitLimiter(self.survey, ('openid', 'openid-1')).acquire())
+        # 保存失败时归还名额
+        limiter.release()
+        self.assertTrue(SubmitLimiter(self.survey, ('openid', 'openid-1')).acquire())
+        self.assertTrue(SubmitLimiter(self.survey, ('openid', 'openid-2')).acquire())
+        self.assertTrue(SubmitLimiter(self.survey, None).acquire())
+
+    @override_settings(SURVEY_SUBMIT_LIMIT_BACKEND='cache')
+    def test_cache_backend(self):
+        self.assert_limit()
+        self.assertFalse(SubmissionCounter.objects.exists())
+
+    @override_settings(SURVEY_SUBMIT_LIMIT_BACKEND='db')
+    def test_db_backend(self):
+        self.assert_limit()
+        self.assertEqual(
+            sorted(SubmissionCounter.objects.values_list('identity', 'count')),
+            [('openid:openid-1', 2), ('openid:openid-2', 1)]
+        )
+
+    @override_settings(SURVEY_SUBMIT_LIMIT_BACKEND='cache')
+    def test_cache_error_falls_back_to_db(self):
+        with mock.patch.object(cache, 'incr', side_effect=ConnectionError), \
+                self.assertLogs('survey.services.submit_limiter', 'ERROR'):
+            self.assertTrue(SubmitLimiter(self.survey, ('session', 'abc')).acquire())
+        self.assertEqual(SubmissionCounter.objects.get().count, 1)
+
+
+class SubmitTokenTests(TestCase):
+    """提交令牌：重复提交返回原结果，处理中的令牌立即返回409，未保存时释放令牌"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.survey = create_survey(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('submit-survey', args=[self.survey.pk])
+        self.token = 'token-0123456789'
+
+    def submit(self, data=None, **overrides):
+        data = data or form_data(self.survey, **overrides)
+        return self.client.post(self.url, data, HTTP_X_SUBMIT_TOKEN=self.token)
+
+    def test_replay_returns_original_response(self):
+        first = self.submit()
+        self.assertEqual(first.status_code, 200)
+        data = form_data(self.survey, text='改了')
+        with self.assertNumQueries(0):
+            replay = self.submit(data)
+        self.assertEqual(replay.json()['response_id'], first.json()['response_id'])
+        self.assertEqual(Response.objects.count(), 1)
+
+    def test_in_flight_token_returns_409(self):
+        cache.set(SubmitTokenGuard(str(self.survey.pk), self.token)._get_key(), PENDING)
+        response = self.submit()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Response.objects.exists())
+
+    def test_unsaved_submission_releases_token(self):
+        self.assertEqual(self.submit(single_choice='x').status_code, 400)
+        self.assertEqual(self.submit().status_code, 200)
+
+        self.token = 'token-abcdefghij'
+        with mock.patch('survey.views.survey.submit_survey', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self.submit()
+        self.assertEqual(self.submit().status_code, 200)
+        self.assertEqual(Response.objects.count(), 2)
+
+
+class WeChatOAuthTests(TestCase):
+    """微信网页授权：使用本地模拟服务测试客户端和授权回调"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = WeChatStubServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def setUp(self):
+        self.stub.delay = 0.0
+        reset_wechat_client()
+        self.addCleanup(reset_wechat_client)
+        settings_override = override_settings(
+            WECHAT_API_BASE_URL=self.stub.url, WECHAT_APP_ID='wx-test', WECHAT_APP_SECRET='top-secret'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_client(self, **kwargs):
+        client = WeChatOAuthClient(self.stub.url, 'wx-test', 'top-secret', **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_fetch_user(self):
+        user = self.create_client().fetch_user('code-fetch')
+        self.assertTrue(user['openid'].startswith('stub_openid_'))
+        self.assertTrue(user['unionid'].startswith('stub_unionid_'))
+        self.assertEqual(user['nickname'], f"用户{user['openid'][-4:]}")
+
+    def test_errors_do_not_leak_secret(self):
+        client = self.create_client(timeout=(1, 0.2))
+        client.fetch_user('code-once')
+        with self.assertRaisesMessage(WeChatOAuthError, '40163'):
+            client.fetch_user('code-once')
+
+        self.stub.delay = 0.5
+        with self.assertRaises(WeChatOAuthError) as context:
+            client.fetch_user('code-slow')
+        self.assertTrue(str(context.exception).startswith('请求微信接口失败'))
+        self.assertNotIn('top-secret', str(context.exception))
+
+    def test_callback_saves_user_in_session(self):
+        survey_url = '/survey/00000000-0000-0000-0000-000000000000/'
+        response = self.client.get(reverse('wechat-callback'), {'code': 'code-callback', 'state': survey_url})
+        self.assertRedirects(response, survey_url, fetch_redirect_response=False)
+        self.assertTrue(self.client.session['wechat_user_info']['openid'].startswith('stub_openid_'))
+
+    def test_callback_failure_and_external_state(self):
+        self.stub.used_codes.add('code-reused')
+        with self.assertLogs('survey.views.wechat', 'WARNING'):
+            response = self.client.get(
+                reverse('wechat-callback'), {'code': 'code-reused', 'state': 'https://evil.example.com/'}
+            )
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertNotIn('wechat_user_info', self.client.session)
+
+    async def test_async_callback(self):
+        request = AsyncRequestFactory().get(reverse('wechat-callback'), {'code': 'code-async', 'state': '/'})
+        request.session = SessionStore()
+        response = await AsyncWeChatCallbackView.as_view()(request)
+        self.assertEqual(response.status_code, 302)
+        user_info = await request.session.aget('wechat_user_info')
+        self.assertTrue(user_info['openid'].startswith('stub_openid_'))
+
+
+class ProfileCacheTests(TestCase):
+    """微信用户信息缓存：命中时不再请求用户信息，LRU淘汰和过期"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = WeChatStubServer().start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def setUp(self):
+        self.stub.used_codes.clear()
+        self.profile_cache = ProfileCache()
+        self.client_ = WeChatOAuthClient(self.stub.url, 'wx-test', 'top-secret', profile_cache=self.profile_cache)
+        self.addCleanup(self.client_.close)
+
+    def test_cached_profile_skips_userinfo(self):
+        first = self.client_.fetch_user('code-cache')
+        userinfo_count = self.stub.userinfo_count
+        # 模拟同一用户再次授权（模拟服务按 code 生成 openid）
+        self.stub.used_codes.clear()
+        self.assertEqual(self.client_.fetch_user('code-cache'), first)
+        self.assertEqual(self.stub.userinfo_count, userinfo_count)
+
+    def test_unionid_key_hits_cache(self):
+        user = WeChatOAuthClient(self.stub.url, 'wx-test', 'top-secret').fetch_user('code-union')
+        self.profile_cache.set(
+            [f"unionid:{user['unionid']}"],
+            {'openid': 'other_openid', 'nickname': '缓存用户', 'headimgurl': '', 'unionid': user['unionid']},
+        )
+        self.stub.used_codes.clear()
+        userinfo_count = self.stub.userinfo_count
+
+        cached = self.client_.fetch_user('code-union')
+        self.assertEqual(self.stub.userinfo_count, userinfo_count)
+        self.assertEqual((cached['openid'], cached['nickname']), (user['openid'], '缓存用户'))
+
+    def test_lru_eviction_and_ttl(self):
+        profile_cache = ProfileCache(max_size=2, ttl=60)
+        profile_cache.set(['a'], {'nickname': 'A'})
+        profile_cache.set(['b'], {'nickname': 'B'})
+        profile_cache.get('a')
+        profile_cache.set(['c'], {'nickname': 'C'})
+        self.assertIsNone(profile_cache.get('b'))
+        self.assertEqual(profile_cache.get('a'), {'nickname': 'A'})
+
+        expired = time.monotonic() + 61
+        with mock.patch('survey.services.wechat_oauth.time.monotonic', return_value=expired):
+            self.assertIsNone(profile_cache.get('a'))
+        self.assertEqual(len(profile_cache), 1)
+
+    def test_unionid_saved_on_response(self):
+        survey = create_survey(User.objects.create_user('owner'))
+        reset_wechat_client()
+        self.addCleanup(reset_wechat_client)
+        with override_settings(WECHAT_API_BASE_URL=self.stub.url):
+            self.client.get(reverse('wechat-callback'), {'code': 'code-submit'})
+        unionid = self.client.session['wechat_user_info']['unionid']
+
+        response = self.client.post(
+            reverse('submit-survey', args=[survey.pk]), form_data(survey),
+            HTTP_USER_AGENT='Mozilla/5.0 MicroMessenger/8.0',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Response.objects.get(pk=response.json()['response_id']).wechat_unionid, unionid)
+
+
+class AdminChangelistQueryTests(TestCase):
+    """后台回答、答案列表的查询数量不随每页行数增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.survey = Survey.objects.create(title='满意度调查', created_by=cls.admin)
+        cls.questions = []
+        for index in range(3):
+            question = Question.objects.create(
+                text=f'问题{index}', question_type='single_choice', created_by=cls.admin
+            )
+            Option.objects.bulk_create([
+                Option(question=question, value=value, label=f'选项{value}', order=order)
+                for order, value in enumerate(['a', 'b', 'c'])
+            ])
+            SurveyQuestion.objects.create(survey=cls.survey, question=question, order=index)
+            cls.questions.append(question)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_responses(self, count):
+        for index in range(count):
+            response = Response.objects.create(
+                survey=self.survey,
+                respondent=self.admin if index % 2 else None,
+                session_key=f'session-{index}'
+            )
+            Answer.objects.bulk_create([
+                Answer(response=response, question=question, answer_choice=['b'])
+                for question in self.questions
+            ])
+
+    def test_response_changelist(self):
+        self.create_responses(30)
+        # 会话、用户、问卷筛选项、分页计数、当前页数据各一次，会话保存三次
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('admin:survey_response_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row._answer_count for row in response.context['cl'].result_list], [3] * 30)
+
+    def test_answer_changelist(self):
+        self.create_responses(30)
+        # 比回答列表多一次选项预加载
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('admin:survey_answer_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<td class="field-answer_preview">选项b</td>', count=90)
+
+    @override_settings(SURVEY_ADMIN_COUNT_LIMIT=50)
+    def test_changelist_count_is_capped(self):
+        self.create_responses(30)
+        response = self.client.get(reverse('admin:survey_answer_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 50)
+        response = self.client.get(reverse('admin:survey_response_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 30)
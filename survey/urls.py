@@ -1,4 +1,5 @@
 # survey/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -21,7 +22,9 @@ urlpatterns = [
     
     # 微信相关
     path('wechat/auth/', views.WeChatAuthView.as_view(), name='wechat-auth'),
-    path('wechat/callback/', views.WeChatCallbackView.as_view(), name='wechat-callback'),
+    path('wechat/callback/', (
+        views.AsyncWeChatCallbackView if settings.WECHAT_ASYNC_CALLBACK else views.WeChatCallbackView
+    ).as_view(), name='wechat-callback'),
     
     # 统计
     path('api/survey/<uuid:survey_id>/stats/', views.survey_statistics, name='survey-stats'),
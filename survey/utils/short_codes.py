@@ -0,0 +1,112 @@
+# survey/utils/short_codes.py
+"""
+短代码分配器（二维码短代码、RPI授权码共用）
+
+从数据库序列中一次预留一批连续序号，每个序号经过以 SECRET_KEY 为密钥的
+Feistel 置换（cycle-walking 保证结果落在编码空间内）后按字母表编码为定长短代码。
+置换是一一映射，同一序列分配出的短代码互不重复且看起来是随机的；
+只有历史上随机生成的旧代码可能冲突，每批只需一次 IN 查询剔除。
+"""
+import hashlib
+import hmac
+import string
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+
+QRCODE_ALPHABET = string.ascii_lowercase + string.digits
+AUTH_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+FEISTEL_ROUNDS = 4
+
+# 每批预留的最大数量（同时是冲突检查 IN 查询的大小）
+ALLOCATE_BATCH_SIZE = 2000
+
+
+def reserve_sequence(name, count):
+    """从序列中预留 count 个连续序号，返回 range"""
+    from ..models import CodeSequence
+
+    with transaction.atomic():
+        CodeSequence.objects.bulk_create([CodeSequence(name=name)], ignore_conflicts=True)
+        # 先UPDATE再读取，行锁保证并发预留的区间不重叠
+        CodeSequence.objects.filter(name=name).update(next_value=F('next_value') + count)
+        end = CodeSequence.objects.filter(name=name).values_list('next_value', flat=True).get()
+    return range(end - count, end)
+
+
+class ShortCodeAllocator:
+    """按序列分配定长短代码"""
+
+    def __init__(self, name, alphabet=QRCODE_ALPHABET, length=8, prefix=''):
+        if length <= 0:
+            raise ValueError('短代码长度必须大于0')
+        self.alphabet = alphabet
+        self.length = length
+        self.prefix = prefix
+        self.sequence_name = f'{name}:{length}:{prefix}'
+        self.capacity = len(alphabet) ** length
+
+        # 置换域取不小于容量的 2^(2k)，左右两半各 k 位
+        bits = max((self.capacity - 1).bit_length(), 2)
+        self._half_bits = (bits + 1) // 2
+        self._mask = (1 << self._half_bits) - 1
+        self._key = hashlib.sha256(f'{settings.SECRET_KEY}:{self.sequence_name}'.encode('utf-8')).digest()
+
+    def _round(self, round_index, value):
+        digest = hmac.new(self._key, f'{round_index}:{value}'.encode('ascii'), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self._mask
+
+    def _feistel(self, value):
+        left, right = value >> self._half_bits, value & self._mask
+        for round_index in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ self._round(round_index, right)
+        return (left << self._half_bits) | right
+
+    def permute(self, value):
+        """将序号一一映射到 [0, capacity) 中的另一个数"""
+        value = self._feistel(value)
+        while value >= self.capacity:
+            value = self._feistel(value)
+        return value
+
+    def encode(self, value):
+        """编码为定长短代码"""
+        base = len(self.alphabet)
+        chars = []
+        for _ in range(self.length):
+            value, remainder = divmod(value, base)
+            chars.append(self.alphabet[remainder])
+        return self.prefix + ''.join(reversed(chars))
+
+    def allocate(self, count, exists=None):
+        """
+        分配 count 个短代码
+
+        exists: 可选，接收一批短代码、返回其中已存在的短代码集合（每批最多
+        ALLOCATE_BATCH_SIZE 个，调用一次），用于剔除与历史随机代码的冲突
+        """
+        codes = []
+        while len(codes) < count:
+            needed = min(count - len(codes), ALLOCATE_BATCH_SIZE)
+            values = reserve_sequence(self.sequence_name, needed)
+            if values.stop > self.capacity:
+                raise ValueError('短代码已用尽，请增加长度或更换前缀')
+            batch = [self.encode(self.permute(value)) for value in values]
+            if exists is not None:
+                existing = exists(batch)
+                batch = [code for code in batch if code not in existing]
+            codes.extend(batch)
+        return codes
+
+
+def allocate_qrcode_short_codes(count, length=8):
+    """分配二维码短代码"""
+    from ..models import QRCode
+
+    def exists(codes):
+        return set(QRCode.objects.filter(short_code__in=codes).values_list('short_code', flat=True))
+
+    return ShortCodeAllocator('qrcode', QRCODE_ALPHABET, length).allocate(count, exists)
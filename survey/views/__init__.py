@@ -3,4 +3,4 @@
 from .api import SurveyViewSet, QRCodeViewSet, survey_statistics
 from .survey import SurveyDetailView, SubmitSurveyView
 from .qrcode import QRCodeRedirectView, QRCodeImageView
-from .wechat import WeChatAuthView, WeChatCallbackView
+from .wechat import WeChatAuthView, WeChatCallbackView, AsyncWeChatCallbackView
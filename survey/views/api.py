@@ -1,17 +1,21 @@
 # survey/views/api.py
 import time
-from datetime import datetime
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
 from django.db.models import Q
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from ..models import Survey, Question, Response, Answer, QRCode
+from ..models import Survey, Question, QRCode, QuestionAggregate, ChoiceAggregate
 from ..serializers import SurveySerializer, ResponseSerializer, QRCodeSerializer
+from ..services.compiled_survey import get_compiled_survey
+from ..services.submission import validate_answers, submit_survey
+from ..services.submit_limiter import SubmitLimiter, get_submit_identity
+from ..utils.short_codes import allocate_qrcode_short_codes
 
 class SurveyViewSet(viewsets.ModelViewSet):
     """问卷API"""
@@ -24,7 +28,7 @@ class SurveyViewSet(viewsets.ModelViewSet):
         queryset = Survey.objects.filter(is_active=True)
         
         # 时间过滤
-        now = datetime.now()
+        now = timezone.now()
         queryset = queryset.filter(
             Q(start_date__isnull=True) | Q(start_date__lte=now),
             Q(end_date__isnull=True) | Q(end_date__gte=now)
@@ -46,26 +50,56 @@ class SurveyViewSet(viewsets.ModelViewSet):
         
         serializer = ResponseSerializer(data=request.data)
         if serializer.is_valid():
-            # 添加额外信息
-            response_data = serializer.validated_data
-            response_data['survey'] = survey
-            response_data['ip_address'] = self._get_client_ip(request)
-            response_data['user_agent'] = request.META.get('HTTP_USER_AGENT', '')
+            validated_data = serializer.validated_data
+            answers = [
+                {
+                    'question_id': answer['question_id'],
+                    'answer_text': answer.get('answer_text', ''),
+                    'answer_choice': answer.get('answer_choice', []),
+                }
+                for answer in validated_data['answers']
+            ]
+            
+            # 基于编译快照在内存中校验答案
+            try:
+                validate_answers(get_compiled_survey(survey), answers)
+            except ValidationError as e:
+                return Response({'error': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # 添加额外信息（包括微信扫码信息）
+            response_fields = {
+                'session_key': request.session.session_key or '',
+                'ip_address': self._get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                'completion_time': validated_data.get('completion_time', 0),
+                'wechat_openid': request.data.get('wechat_openid', ''),
+                'wechat_unionid': request.data.get('wechat_unionid', ''),
+                'wechat_nickname': request.data.get('wechat_nickname', ''),
+            }
             
             # 如果有用户登录，关联用户
             if request.user.is_authenticated:
-                response_data['respondent'] = request.user
+                response_fields['respondent_id'] = request.user.pk
             
-            response = serializer.save()
+            # 检查并占用提交名额（每人提交限制）
+            limiter = SubmitLimiter(survey, get_submit_identity(request))
+            if not limiter.acquire():
+                return Response(
+                    {'error': '已达到该问卷的提交次数限制'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
             
-            # 生成微信扫码记录
-            if 'wechat_openid' in request.data:
-                self._record_wechat_info(response, request.data)
+            # 保存回答（启用缓冲队列时先写入本地队列）
+            try:
+                response_id = submit_survey(survey, response_fields, answers)
+            except Exception:
+                limiter.release()
+                raise
             
             return Response({
                 'success': True,
                 'message': '问卷提交成功',
-                'response_id': str(response.id)
+                'response_id': str(response_id)
             })
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -73,7 +107,7 @@ class SurveyViewSet(viewsets.ModelViewSet):
     def _can_submit(self, survey, request):
         """检查是否可以提交问卷"""
         # 检查时间
-        now = datetime.now()
+        now = timezone.now()
         if survey.start_date and survey.start_date > now:
             return False
         if survey.end_date and survey.end_date < now:
@@ -85,26 +119,7 @@ class SurveyViewSet(viewsets.ModelViewSet):
             if 'micromessenger' not in user_agent:
                 return False
         
-        # 检查提交限制
-        if survey.limit_per_user > 0:
-            if request.user.is_authenticated:
-                count = Response.objects.filter(
-                    survey=survey,
-                    respondent=request.user
-                ).count()
-                if count >= survey.limit_per_user:
-                    return False
-            else:
-                # 匿名用户检查session
-                session_key = request.session.session_key
-                if session_key:
-                    count = Response.objects.filter(
-                        survey=survey,
-                        session_key=session_key
-                    ).count()
-                    if count >= survey.limit_per_user:
-                        return False
-        
+        # 每人提交限制在校验答案后由 SubmitLimiter 检查
         return True
     
     def _get_client_ip(self, request):
@@ -115,13 +130,6 @@ class SurveyViewSet(viewsets.ModelViewSet):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
-    
-    def _record_wechat_info(self, response, data):
-        """记录微信信息"""
-        response.wechat_openid = data.get('wechat_openid', '')
-        response.wechat_unionid = data.get('wechat_unionid', '')
-        response.wechat_nickname = data.get('wechat_nickname', '')
-        response.save()
 
 class QRCodeViewSet(viewsets.ModelViewSet):
     """二维码API"""
@@ -136,10 +144,8 @@ class QRCodeViewSet(viewsets.ModelViewSet):
         
         survey = get_object_or_404(Survey, id=survey_id)
         
-        # 生成短代码
-        import random
-        import string
-        short_code = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+        # 生成短代码（共享分配器保证不重复）
+        short_code = allocate_qrcode_short_codes(1)[0]
         
         qrcode_obj = QRCode.objects.create(
             survey=survey,
@@ -152,33 +158,37 @@ class QRCodeViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 def survey_statistics(request, survey_id):
-    """获取问卷统计"""
+    """获取问卷统计（读取提交时增量维护的问题统计汇总）"""
     survey = get_object_or_404(Survey, id=survey_id)
     
     # 基本统计
     total_responses = survey.responses.count()
     
     # 问题统计
+    answer_counts = dict(
+        QuestionAggregate.objects.filter(survey=survey).values_list('question_id', 'answer_count')
+    )
+    value_counts = {}
+    for question_id, value, count in ChoiceAggregate.objects.filter(
+        survey=survey, count__gt=0
+    ).order_by('value').values_list('question_id', 'value', 'count'):
+        value_counts.setdefault(question_id, {})[value] = count
     question_stats = []
-    for survey_question in survey.survey_questions.all():
-        question = survey_question.question
-        answers = Answer.objects.filter(question=question)
-        
+    for item in get_compiled_survey(survey).questions:
+        question = item['question']
         stats = {
-            'question_id': str(question.id),
-            'question_text': question.text,
-            'question_type': question.question_type,
-            'total_answers': answers.count(),
+            'question_id': str(question['id']),
+            'question_text': question['text'],
+            'question_type': question['question_type'],
+            'total_answers': answer_counts.get(question['id'], 0),
         }
         
-        if question.question_type in ['single_choice', 'multiple_choice']:
+        if question['question_type'] in ['single_choice', 'multiple_choice']:
             # 选项统计
-            option_counts = {}
-            for answer in answers:
-                for choice in answer.answer_choice:
-                    option_counts[choice] = option_counts.get(choice, 0) + 1
-            
-            stats['options'] = option_counts
+            stats['options'] = value_counts.get(question['id'], {})
+        elif question['question_type'] == 'rating':
+            # 评分分布
+            stats['ratings'] = value_counts.get(question['id'], {})
         
         question_stats.append(stats)
     
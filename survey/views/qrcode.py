@@ -1,87 +1,84 @@
 # survey/views/qrcode.py
-import qrcode
-import io
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.views import View
 from ..models import QRCode, Survey
+from ..services.qrcode_images import normalize_style, get_image_digest, get_qrcode_image
+from ..services.scan_counter import scan_counter, get_ip_bucket
+from ..services.short_code_resolver import resolve_short_code
 
 class QRCodeRedirectView(View):
     """二维码跳转视图"""
     
     def get(self, request, short_code):
-        qrcode_obj = get_object_or_404(QRCode, short_code=short_code)
+        # 短代码解析表命中时不访问数据库
+        target = resolve_short_code(short_code)
+        if target is None:
+            raise Http404('二维码不存在')
         
-        # 增加扫描计数
-        qrcode_obj.scan_count += 1
-        qrcode_obj.save()
+        # 增加扫描计数并记录扫描（进程内缓冲，批量写入数据库）
+        is_wechat = self._is_wechat_browser(request)
+        scan_counter.record_scan(
+            target.qrcode_id,
+            short_code,
+            is_wechat=is_wechat,
+            ip_bucket=get_ip_bucket(self._get_client_ip(request))
+        )
         
         # 检查问卷是否要求必须在微信中打开
-        if qrcode_obj.survey.require_wechat:
-            # 检查微信环境
-            is_wechat = self._is_wechat_browser(request)
-            
-            if is_wechat:
-                # 微信内直接跳转到问卷
-                return redirect('survey-detail', pk=str(qrcode_obj.survey.id))
-            else:
-                # 非微信环境显示提示页面
-                return render(request, 'survey/wechat_required.html', {
-                    'survey': qrcode_obj.survey,
-                    'qrcode': qrcode_obj,
-                    'redirect_url': request.build_absolute_uri(
-                        f'/survey/{qrcode_obj.survey.id}/'
-                    )
-                })
-        else:
-            # 问卷不要求必须在微信中打开，直接跳转到问卷
-            return redirect('survey-detail', pk=str(qrcode_obj.survey.id))
+        if target.require_wechat and not is_wechat:
+            # 非微信环境显示提示页面
+            qrcode_obj = get_object_or_404(QRCode.objects.select_related('survey'), pk=target.qrcode_id)
+            return render(request, 'survey/wechat_required.html', {
+                'survey': qrcode_obj.survey,
+                'qrcode': qrcode_obj,
+                'redirect_url': request.build_absolute_uri(
+                    f'/survey/{qrcode_obj.survey.id}/'
+                )
+            })
+        
+        # 微信内或问卷不要求必须在微信中打开，直接跳转到问卷
+        return redirect('survey-detail', pk=target.survey_id)
     
     def _is_wechat_browser(self, request):
         user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
         return 'micromessenger' in user_agent
+    
+    def _get_client_ip(self, request):
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip = x_forwarded_for.split(',')[0]
+        else:
+            ip = request.META.get('REMOTE_ADDR')
+        return ip
 
 class QRCodeImageView(View):
-    """生成二维码图片，支持自定义样式"""
+    """生成二维码图片，支持自定义样式（图片带缓存，支持条件请求）"""
+    
+    # 图片内容只由链接和样式决定，可长期缓存
+    CACHE_MAX_AGE = 30 * 24 * 3600
     
     def get(self, request, short_code):
-        qrcode_obj = get_object_or_404(QRCode, short_code=short_code)
+        created_at = QRCode.objects.filter(short_code=short_code).values_list('created_at', flat=True).first()
+        if created_at is None:
+            raise Http404('二维码不存在')
         
         # 构建问卷URL
         survey_url = request.build_absolute_uri(
             f'/qrcode/{short_code}/redirect/'
         )
         
-        # 获取样式参数
-        version = int(request.GET.get('version', 1))
-        error_correction = request.GET.get('error_correction', 'L')
-        box_size = int(request.GET.get('box_size', 10))
-        border = int(request.GET.get('border', 4))
-        fill_color = request.GET.get('fill_color', 'black')
-        back_color = request.GET.get('back_color', 'white')
-        
-        # 映射纠错级别
-        error_correction_map = {
-            'L': qrcode.constants.ERROR_CORRECT_L,
-            'M': qrcode.constants.ERROR_CORRECT_M,
-            'Q': qrcode.constants.ERROR_CORRECT_Q,
-            'H': qrcode.constants.ERROR_CORRECT_H
-        }
-        
-        # 生成二维码
-        qr = qrcode.QRCode(
-            version=version,
-            error_correction=error_correction_map.get(error_correction, qrcode.constants.ERROR_CORRECT_L),
-            box_size=box_size,
-            border=border,
-        )
-        qr.add_data(survey_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color=fill_color, back_color=back_color)
-        
-        # 保存到响应
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
+        # 获取样式参数（规范化并限制范围）
+        style = normalize_style(request.GET)
+        digest = get_image_digest(survey_url, style)
+        etag = f'"{digest}"'
         
-        return HttpResponse(buffer.getvalue(), content_type="image/png")
+        response = get_conditional_response(request, etag=etag, last_modified=int(created_at.timestamp()))
+        if response is None:
+            response = HttpResponse(get_qrcode_image(short_code, survey_url, style, digest), content_type="image/png")
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(created_at.timestamp())
+        patch_cache_control(response, public=True, max_age=self.CACHE_MAX_AGE)
+        return response
@@ -2,11 +2,22 @@
 import time
 from datetime import datetime
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
+from django.middleware.csrf import get_token
+from django.core.exceptions import ValidationError
+from django.template.loader import render_to_string
 from django.views import View
 from django.views.generic import DetailView
 from django.utils import timezone
-from ..models import Survey, Question, Response, Answer
+from ..models import Survey, Question
+from ..services.compiled_survey import get_compiled_survey
+from ..services.submission import collect_form_answers, validate_answers, submit_survey
+from ..services.submit_limiter import SubmitLimiter, get_submit_identity
+from ..services.submit_tokens import SubmitTokenGuard, get_submit_token, issue_submit_token
+from ..services.page_cache import (
+    CSRF_TOKEN_PLACEHOLDER, START_TIME_PLACEHOLDER, SUBMIT_TOKEN_PLACEHOLDER,
+    get_cached_page, set_cached_page, fill_page,
+)
 
 class SurveyDetailView(DetailView):
     """问卷详情页"""
@@ -18,33 +29,28 @@ class SurveyDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         
         # 检查是否微信浏览器
-        user_agent = self.request.META.get('HTTP_USER_AGENT', '').lower()
-        context['is_wechat'] = 'micromessenger' in user_agent
+        context['is_wechat'] = self._is_wechat_browser(self.request)
         
-        # 记录访问开始时间（用于计算填写时长）
-        self.request.session[f'survey_start_{self.object.id}'] = timezone.now().timestamp()
-        
-        # 从中间表获取问卷的问题
-        survey_questions = self.object.survey_questions.all().order_by('order')
-        
-        # 确保问题被正确序列化
-        context['questions'] = survey_questions
+        # 从编译快照获取问卷的问题（包含选项和分类，缓存命中时不查询数据库）
+        compiled = get_compiled_survey(self.object)
+        context['questions'] = compiled.questions
         
         # 获取问卷中所有的分类（去重）
-        categories = []
-        category_ids = set()
-        for sq in survey_questions:
-            category = sq.category
-            if category and category.id not in category_ids:
-                category_ids.add(category.id)
-                categories.append(category)
+        categories = compiled.categories
         context['categories'] = categories
         
         # 添加调试信息
         if self.request.GET.get('debug'):
             context['debug'] = True
-            context['questions_count'] = survey_questions.count()
-            context['questions_list'] = list(survey_questions.values('id', 'question__text', 'question__question_type'))
+            context['questions_count'] = len(compiled)
+            context['questions_list'] = [
+                {
+                    'id': item['id'],
+                    'question__text': item['question']['text'],
+                    'question__question_type': item['question']['question_type'],
+                }
+                for item in compiled.questions
+            ]
             context['categories_list'] = list(categories)
         
         return context
@@ -71,14 +77,68 @@ class SurveyDetailView(DetailView):
                 'survey': self.object
             })
         
-        context = self.get_context_data(object=self.object)
-        return self.render_to_response(context)
+        # 记录访问开始时间（用于计算填写时长）
+        start_time = now.timestamp()
+        request.session[f'survey_start_{self.object.id}'] = start_time
+        
+        # 调试模式不使用页面缓存
+        if request.GET.get('debug'):
+            context = self.get_context_data(object=self.object)
+            context['survey_start_time'] = int(start_time)
+            context['submit_token'] = issue_submit_token()
+            return self.render_to_response(context)
+        
+        # 页面按问卷版本和微信/非微信缓存，CSRF令牌和开始时间以占位符形式写入
+        is_wechat = self._is_wechat_browser(request)
+        html = get_cached_page(self.object, is_wechat)
+        if html is None:
+            context = self.get_context_data(object=self.object)
+            context['csrf_token'] = CSRF_TOKEN_PLACEHOLDER
+            context['survey_start_time'] = START_TIME_PLACEHOLDER
+            context['submit_token'] = SUBMIT_TOKEN_PLACEHOLDER
+            html = render_to_string(self.template_name, context)
+            set_cached_page(self.object, is_wechat, html)
+        
+        return HttpResponse(fill_page(html, get_token(request), start_time, issue_submit_token()))
+    
+    def _is_wechat_browser(self, request):
+        user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
+        return 'micromessenger' in user_agent
 
 class SubmitSurveyView(View):
     """提交问卷（处理微信数据）"""
     
     def post(self, request, survey_id):
-        survey = get_object_or_404(Survey, id=survey_id)
+        # 同一提交令牌的重复提交（如网络重试）直接返回原来的结果，不查询数据库
+        guard = SubmitTokenGuard(survey_id, get_submit_token(request))
+        if not guard.claim():
+            if guard.response_id:
+                return JsonResponse({
+                    'success': True,
+                    'message': '提交成功',
+                    'response_id': guard.response_id
+                })
+            return JsonResponse({
+                'success': False,
+                'error': '提交正在处理中，请稍后重试'
+            }, status=409)
+        
+        try:
+            survey = get_object_or_404(Survey, id=survey_id)
+            response, response_id = self._submit(request, survey)
+        except Exception:
+            guard.abandon()
+            raise
+        
+        if response_id is None:
+            guard.abandon()
+        else:
+            guard.complete(response_id)
+        return response
+    
+    def _submit(self, request, survey):
+        """校验并保存提交，返回 (响应, response_id)，未保存时 response_id 为None"""
+        survey_id = survey.id
         
         # 验证数据
         data = request.POST.copy()
@@ -94,31 +154,43 @@ class SubmitSurveyView(View):
             wechat_info = request.session.get('wechat_user_info', {})
             data.update({
                 'wechat_openid': wechat_info.get('openid', ''),
+                'wechat_unionid': wechat_info.get('unionid', ''),
                 'wechat_nickname': wechat_info.get('nickname', '')
             })
         
-        # 保存回答
-        response = Response.objects.create(
-            survey=survey,
-            session_key=request.session.session_key,
-            ip_address=self._get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            wechat_openid=data.get('wechat_openid', ''),
-            wechat_nickname=data.get('wechat_nickname', ''),
-            completion_time=data.get('completion_time', 0)
-        )
-        
-        # 保存每个问题的答案
-        for survey_question in survey.survey_questions.all():
-            question = survey_question.question
-            answer_key = f'question_{survey_question.id}'
-            if answer_key in data:
-                Answer.objects.create(
-                    response=response,
-                    question=question,
-                    answer_text=data[answer_key] if question.question_type == 'text' else '',
-                    answer_choice=[data[answer_key]] if question.question_type in ['single_choice', 'rating'] else data.getlist(answer_key)
-                )
+        # 基于编译快照在内存中提取并校验全部答案
+        compiled = get_compiled_survey(survey)
+        answers = collect_form_answers(compiled, data)
+        try:
+            validate_answers(compiled, answers)
+        except ValidationError as e:
+            return JsonResponse({
+                'success': False,
+                'error': '; '.join(e.messages)
+            }, status=400), None
+        
+        # 检查并占用提交名额（每人提交限制）
+        limiter = SubmitLimiter(survey, get_submit_identity(request))
+        if not limiter.acquire():
+            return JsonResponse({
+                'success': False,
+                'error': '您已达到该问卷的提交次数限制'
+            }, status=403), None
+        
+        # 保存回答和全部答案（启用缓冲队列时先写入本地队列）
+        try:
+            response_id = submit_survey(survey, {
+                'session_key': request.session.session_key or '',
+                'ip_address': self._get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                'wechat_openid': data.get('wechat_openid', ''),
+                'wechat_unionid': data.get('wechat_unionid', ''),
+                'wechat_nickname': data.get('wechat_nickname', ''),
+                'completion_time': self._parse_completion_time(data.get('completion_time', 0)),
+            }, answers)
+        except Exception:
+            limiter.release()
+            raise
         
         # 清除session中的开始时间
         if f'survey_start_{survey_id}' in request.session:
@@ -127,13 +199,21 @@ class SubmitSurveyView(View):
         return JsonResponse({
             'success': True,
             'message': '提交成功',
-            'response_id': str(response.id)
-        })
+            'response_id': str(response_id)
+        }), response_id
     
     def _is_wechat_browser(self, request):
         user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
         return 'micromessenger' in user_agent
     
+    def _parse_completion_time(self, value):
+        """解析完成用时，限制在0到24小时之间"""
+        try:
+            completion_time = int(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return 0
+        return min(max(completion_time, 0), 86400)
+    
     def _get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
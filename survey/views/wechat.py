@@ -1,9 +1,17 @@
 # survey/views/wechat.py
+import logging
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.http import HttpResponse, JsonResponse
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
 from django.conf import settings
 
+from ..services.wechat_oauth import WeChatOAuthError, get_wechat_client
+
+logger = logging.getLogger(__name__)
+
 class WeChatAuthView(View):
     """微信授权（如果需要获取用户信息）"""
     
@@ -25,6 +33,20 @@ class WeChatAuthView(View):
         
         return redirect(auth_url)
 
+def _get_redirect_url(request, state):
+    """授权完成后的跳转地址，只允许本站地址"""
+    if state and url_has_allowed_host_and_scheme(state, allowed_hosts={request.get_host()}):
+        return state
+    return '/'
+
+def _get_session_user_info(user):
+    return {
+        'openid': user['openid'],
+        'nickname': user['nickname'],
+        'headimgurl': user['headimgurl'],
+        'unionid': user['unionid'],
+    }
+
 class WeChatCallbackView(View):
     """微信授权回调"""
     
@@ -35,42 +57,37 @@ class WeChatCallbackView(View):
         if not code:
             return redirect('/')
         
-        # 获取access_token
-        app_id = settings.WECHAT_APP_ID
-        app_secret = settings.WECHAT_APP_SECRET
-        
-        import requests
+        # 通过共享连接池换取access_token并获取用户信息（带超时）
+        try:
+            user = get_wechat_client().fetch_user(code)
+        except WeChatOAuthError as e:
+            logger.warning('微信授权失败：%s', e)
+        else:
+            # 保存到session
+            request.session['wechat_user_info'] = _get_session_user_info(user)
         
-        # 获取access_token
-        token_url = "https://api.weixin.qq.com/sns/oauth2/access_token"
-        token_params = {
-            'appid': app_id,
-            'secret': app_secret,
-            'code': code,
-            'grant_type': 'authorization_code'
-        }
+        return redirect(_get_redirect_url(request, state))
+
+class AsyncWeChatCallbackView(View):
+    """
+    微信授权回调（异步视图）
+    
+    使用ASGI部署时，等待微信接口期间不占用工作线程；
+    请求仍通过共享连接池在线程池中发出。设置 WECHAT_ASYNC_CALLBACK = True 启用。
+    """
+    
+    async def get(self, request):
+        code = request.GET.get('code')
+        state = request.GET.get('state', '/')
         
-        response = requests.get(token_url, params=token_params)
-        token_data = response.json()
+        if not code:
+            return redirect('/')
         
-        if 'access_token' in token_data:
-            # 获取用户信息
-            user_info_url = "https://api.weixin.qq.com/sns/userinfo"
-            user_params = {
-                'access_token': token_data['access_token'],
-                'openid': token_data['openid'],
-                'lang': 'zh_CN'
-            }
-            
-            user_response = requests.get(user_info_url, params=user_params)
-            user_data = user_response.json()
-            
-            # 保存到session
-            request.session['wechat_user_info'] = {
-                'openid': user_data.get('openid'),
-                'nickname': user_data.get('nickname'),
-                'headimgurl': user_data.get('headimgurl'),
-                'unionid': user_data.get('unionid', '')
-            }
+        try:
+            user = await sync_to_async(get_wechat_client().fetch_user, thread_sensitive=False)(code)
+        except WeChatOAuthError as e:
+            logger.warning('微信授权失败：%s', e)
+        else:
+            await request.session.aset('wechat_user_info', _get_session_user_info(user))
         
-        return redirect(state)
+        return redirect(_get_redirect_url(request, state))
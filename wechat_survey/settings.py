@@ -31,6 +31,8 @@ env = environ.Env(
     DB_PASSWORD=(str, 'your-strong-db-password'),
     DB_HOST=(str, 'localhost'),
     DB_PORT=(str, '3306'),
+    # 缓存配置
+    CACHE_URL=(str, 'locmemcache://'),
 )
 
 # 从环境变量指定的.env文件加载配置，默认使用.env
@@ -136,6 +138,14 @@ if env('DATABASE_URL', default=None):
     }
 
 
+# 缓存配置
+# 默认使用进程内缓存（开发环境），多进程部署时建议配置为Redis/Memcached，例如：
+#   CACHE_URL=rediscache://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -179,6 +189,19 @@ pymysql.install_as_MySQLdb()
 WECHAT_APP_ID = env('WECHAT_APP_ID')
 WECHAT_APP_SECRET = env('WECHAT_APP_SECRET')
 
+# 微信接口地址（本地联调可指向 python manage.py wechat_oauth_stub 启动的模拟服务）、
+# 请求超时（连接, 读取，秒）、连接池大小
+WECHAT_API_BASE_URL = env('WECHAT_API_BASE_URL', default='https://api.weixin.qq.com')
+WECHAT_HTTP_TIMEOUT = (3.05, 5)
+WECHAT_HTTP_POOL_SIZE = 10
+
+# 微信用户信息进程内缓存：最多保存的用户数、有效期（秒）
+WECHAT_PROFILE_CACHE_SIZE = 10000
+WECHAT_PROFILE_CACHE_TTL = 3600
+
+# 使用ASGI部署时可启用异步授权回调视图，等待微信接口期间不占用工作线程
+WECHAT_ASYNC_CALLBACK = env.bool('WECHAT_ASYNC_CALLBACK', default=False)
+
 # 静态文件配置
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -197,6 +220,58 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 
+# 问卷编译快照缓存时间（秒），快照按 Survey.updated_at 自动失效
+SURVEY_SNAPSHOT_TIMEOUT = 3600
+
+# 问卷填写页整页缓存时间（秒），页面按问卷版本和微信/非微信分别缓存
+SURVEY_PAGE_CACHE_TIMEOUT = 600
+
+# 问卷提交缓冲队列（write-behind）
+# 启用后提交先写入本地队列并立即返回，需运行 python manage.py drain_submission_spool 批量入库
+SURVEY_SUBMIT_SPOOL = env.bool('SURVEY_SUBMIT_SPOOL', default=False)
+SURVEY_SPOOL_PATH = env('SURVEY_SPOOL_PATH', default=os.path.join(BASE_DIR, 'spool', 'submissions.sqlite3'))
+# 无法写入数据库的提交（如问题已删除导致约束错误）移入死信文件（JSON Lines），不阻塞后续提交
+SURVEY_SPOOL_DEAD_LETTER_PATH = env(
+    'SURVEY_SPOOL_DEAD_LETTER_PATH', default=os.path.join(BASE_DIR, 'spool', 'dead_letter.jsonl')
+)
+
+# 命令行增量导出只导出入库超过该秒数的回答，避免仍在事务中的回答被水位跳过
+SURVEY_EXPORT_SETTLE_SECONDS = 60
+
+# 二维码图片缓存：内存缓存时间（秒）和磁盘缓存目录（图片内容只由链接和样式决定，不会变化）
+SURVEY_QRCODE_CACHE_TIMEOUT = 86400
+SURVEY_QRCODE_CACHE_DIR = os.path.join(MEDIA_ROOT, 'qrcodes')
+# 每个二维码最多保留的磁盘缓存图片数，超出时删除最久未使用的图片
+SURVEY_QRCODE_DISK_CACHE_LIMIT = 32
+
+# 二维码扫描计数缓冲：每隔多少秒或累计多少次扫描写入一次数据库
+SURVEY_SCAN_FLUSH_INTERVAL = 5.0
+SURVEY_SCAN_FLUSH_THRESHOLD = 100
+
+# 二维码短代码解析表：进程内记录有效期（秒）、是否同时使用共享缓存、worker启动时预载入的数量
+SURVEY_SHORT_CODE_LOCAL_TTL = 60
+SURVEY_SHORT_CODE_SHARED_CACHE = True
+SURVEY_SHORT_CODE_CACHE_TIMEOUT = 3600
+SURVEY_SHORT_CODE_WARMUP_LIMIT = 10000
+
+# 每人提交限制的计数方式：'cache' 使用共享缓存原子计数，'db' 使用 SubmissionCounter 表，
+# 'auto' 在缓存为本地内存缓存（不在进程间共享）时使用数据库，否则使用缓存；缓存计数的有效期（秒）
+SURVEY_SUBMIT_LIMIT_BACKEND = env('SURVEY_SUBMIT_LIMIT_BACKEND', default='auto')
+SURVEY_SUBMIT_LIMIT_TIMEOUT = 86400
+
+# 提交令牌（幂等提交）：成功提交的记录保留时间、处理中标记的过期时间（秒）
+SURVEY_SUBMIT_TOKEN_TIMEOUT = 86400
+SURVEY_SUBMIT_TOKEN_PENDING_TIMEOUT = 60
+
+# 后台回答、答案列表分页时最多统计的记录数，避免对大表做全表 COUNT(*)（0 表示不限制）
+SURVEY_ADMIN_COUNT_LIMIT = 10000
+
+# RPI测试问题列表缓存时间（秒），问题变更时自动清除
+RPI_QUESTION_CACHE_TIMEOUT = 3600
+
+# RPI评分方案在进程内缓存的时间（秒），本进程修改评分方案时立即清除
+RPI_SCORING_CACHE_TTL = 300
+
 # 会话配置（用于记录问卷状态）
 SESSION_COOKIE_AGE = 86400  # 24小时
 SESSION_SAVE_EVERY_REQUEST = True
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wechat_survey.settings')
 
 application = get_wsgi_application()
+
+# 预先载入二维码短代码解析表（uWSGI lazy-apps 下每个worker加载应用时执行）
+try:
+    from survey.services.short_code_resolver import warm_up
+    warm_up()
+except Exception:
+    # 数据库暂不可用时跳过，解析表会在请求时按需载入
+    pass